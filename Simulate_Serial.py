@@ -1,26 +1,30 @@
+import sys
 import time
 import random
 
+from serial_protocol import frame_line
+
 # Choose between: "OVERCROWDED", "AVERAGE", "EMPTY", "CROWDED", "SPARSE"
 MODE = "CROWDED"
 
-def generate_fake_sensor_data():
-    if MODE == "OVERCROWDED":
+def generate_fake_sensor_data(mode=None):
+    mode = mode or MODE
+    if mode == "OVERCROWDED":
         motion = random.choices([0, 1], weights=[0.1, 0.9])[0]
         sound = round(random.gauss(65, 4), 1)
         co2 = round(random.gauss(1100, 40), 1)
 
-    elif MODE == "EMPTY":
+    elif mode == "EMPTY":
         motion = random.choices([0, 1], weights=[0.9, 0.1])[0]
         sound = round(random.gauss(32, 2), 1)
         co2 = round(random.gauss(420, 10), 1)
 
-    elif MODE == "SPARSE":
+    elif mode == "SPARSE":
         motion = random.choices([0, 1], weights=[0.85, 0.15])[0]
         sound = round(random.gauss(40, 5), 1)
         co2 = round(random.gauss(500, 20), 1)
 
-    elif MODE == "CROWDED":
+    elif mode == "CROWDED":
         motion = random.choices([0, 1], weights=[0.3, 0.7])[0]
         sound = round(random.gauss(58, 4), 1)
         co2 = round(random.gauss(950, 40), 1)
@@ -37,7 +41,18 @@ def generate_fake_sensor_data():
     return f"M:{motion};S:{sound};C:{co2}"
 
 if __name__ == "__main__":
+    # Optional mode override: python Simulate_Serial.py SPARSE
+    # --framed adds the sequence number and checksum fields
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    if args:
+        MODE = args[0].upper()
+    framed = "--framed" in sys.argv
+
+    seq = 0
     while True:
         line = generate_fake_sensor_data()
+        if framed:
+            line = frame_line(line, seq, with_checksum=True)
+            seq += 1
         print(line, flush=True)
         time.sleep(1)
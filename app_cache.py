@@ -0,0 +1,118 @@
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+from spatial_index import RoomIndex
+
+# Process-wide cache for the dashboard's Firebase reads. Streamlit imports this
+# module once per server process, so every browser session shares the same
+# entries: Firebase load follows the TTLs below instead of the number of viewers.
+#
+# - TTLs are per data class: room metadata barely changes, live_data does.
+# - Single flight: when an entry expires, the first session reloads it and every
+#   other session asking for the same key waits for that one read, at most
+#   WAIT_TIMEOUT seconds; after that they get the expired value rather than hang
+#   behind a stuck read (and an error if there is none).
+# - invalidate() drops entries explicitly (e.g. after editing rooms/).
+#
+# Cached values are shared between sessions — treat them as read-only.
+
+TTLS = {
+    "rooms": 600.0,         # Static room metadata
+    "room_index": 600.0,    # Spatial index built from it
+    "live_data": 3.0,       # Current occupancy
+    "session_index": 30.0,  # Latest-session pointer per room
+    "rollups": 60.0,        # Closed history buckets, rebuilt once a minute
+    "forecasts": 30.0,      # Next-hour forecasts, rewritten once a minute by forecast.py
+    "summary": 5.0,         # Building/floor/type totals from occupancy_summary.py
+}
+DEFAULT_TTL = 10.0
+WAIT_TIMEOUT = 5.0          # Seconds a session waits for another session's load
+
+
+class DataCache:
+    def __init__(self, ttls=None, clock=time.monotonic, wait_timeout=WAIT_TIMEOUT):
+        self.ttls = dict(TTLS if ttls is None else ttls)
+        self.clock = clock
+        self.wait_timeout = wait_timeout
+        self.lock = threading.Lock()
+        self.entries = {}     # (data_class, key) -> (value, expires_at), kept after expiry
+        self.inflight = {}    # (data_class, key) -> Future of the running load
+        self.stats = {"hits": 0, "misses": 0, "loads": 0, "waits": 0, "errors": 0, "stale": 0}
+
+    def get(self, data_class, key, loader):
+        cache_key = (data_class, key)
+        with self.lock:
+            entry = self.entries.get(cache_key)
+            if entry is not None and entry[1] > self.clock():
+                self.stats["hits"] += 1
+                return entry[0]
+
+            self.stats["misses"] += 1
+            future = self.inflight.get(cache_key)
+            leader = future is None
+            if leader:
+                future = self.inflight[cache_key] = Future()
+            else:
+                self.stats["waits"] += 1
+
+        if not leader:
+            try:
+                return future.result(timeout=self.wait_timeout)
+            except FutureTimeout:
+                if entry is None:
+                    raise TimeoutError(f"Loading {data_class}/{key} took over {self.wait_timeout:.0f}s") from None
+                with self.lock:
+                    self.stats["stale"] += 1
+                return entry[0]
+
+        try:
+            value = loader()
+        except BaseException as e:
+            with self.lock:
+                self.stats["errors"] += 1
+                del self.inflight[cache_key]
+            future.set_exception(e)
+            raise
+
+        with self.lock:
+            self.stats["loads"] += 1
+            ttl = self.ttls.get(data_class, DEFAULT_TTL)
+            self.entries[cache_key] = (value, self.clock() + ttl)
+            del self.inflight[cache_key]
+        future.set_result(value)
+        return value
+
+    def invalidate(self, data_class=None, key=None):
+        with self.lock:
+            if data_class is None:
+                self.entries.clear()
+                return
+            for cache_key in list(self.entries):
+                if cache_key[0] == data_class and (key is None or cache_key[1] == key):
+                    del self.entries[cache_key]
+
+
+cache = DataCache()
+
+
+# --- Dashboard reads ---
+def get_rooms(database):
+    return cache.get("rooms", "rooms", lambda: database.reference("rooms").get() or {})
+
+
+def get_room_index(database):
+    return cache.get("room_index", "rooms", lambda: RoomIndex(get_rooms(database)))
+
+
+def get_live_data(database):
+    return cache.get("live_data", "live_data", lambda: database.reference("live_data").get() or {})
+
+
+def get_forecasts(database):
+    return cache.get("forecasts", "forecasts", lambda: database.reference("forecasts").get() or {})
+
+
+def get_summary(database):
+    return cache.get("summary", "summary", lambda: database.reference("summary").get() or {})
+
@@ -0,0 +1,197 @@
+import math
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import streamlit as st
+
+import instrumentation
+from rollup import CHART_WIDTH, PX_PER_POINT, RAW_INTERVAL, RESOLUTIONS, pick_resolution
+
+# History of the room that is open in the list: chart, session statistics and the
+# raw points. pandas and altair are imported in the render functions, so a rerun
+# with no room open never builds a DataFrame or loads altair.
+#
+# Comparison mode: the same window for up to MAX_COMPARE rooms, fetched in parallel
+# on a process-wide pool (one round trip of latency instead of one per room), then
+# resampled onto a common time grid and drawn as one chart with a line per room.
+
+HISTORY_WINDOWS = {
+    "Last 10 min": 10,
+    "Last 30 min": 30,
+    "Last 24 h": 24 * 60,
+    "Last 7 days": 7 * 24 * 60,
+    "All": None,            # Latest session, raw points
+}
+MAX_COMPARE = 6             # Rooms in one comparison chart, the open one included
+FETCH_WORKERS = 8           # Concurrent history reads, shared by every session
+
+_pool = ThreadPoolExecutor(max_workers=FETCH_WORKERS, thread_name_prefix="history")
+
+
+def fetch_points(history_store, room_id, window_minutes):
+    # Coarsest data that still fills the chart: raw points for short windows, rollups for long ones
+    # -> (points or None without any session, resolution or None for raw points)
+    resolution = pick_resolution(window_minutes * 60) if window_minutes else None
+    if resolution is None:
+        session_id, points = history_store.window(room_id, window_minutes)
+        return (points if session_id is not None else None), None
+    return history_store.rollup_window(room_id, resolution, window_minutes), resolution
+
+
+def fetch_many(history_store, room_ids, window_minutes, pool=_pool):
+    # fetch_points() for several rooms at once -> {room_id: (points or None, resolution)}
+    trace = instrumentation.current_trace()
+
+    def fetch(room_id):
+        with instrumentation.in_trace(trace):
+            return fetch_points(history_store, room_id, window_minutes)
+
+    return dict(zip(room_ids, pool.map(fetch, room_ids)))
+
+
+def grid_seconds(points_by_room, resolution):
+    # Common grid step: the rollup resolution, or raw points thinned to fit the chart
+    if resolution is not None:
+        return RESOLUTIONS[resolution]
+    stamps = [point["timestamp"] for points in points_by_room.values() for point in points[:1] + points[-1:]]
+    if not stamps:
+        return RAW_INTERVAL
+    span = (datetime.fromisoformat(max(stamps)) - datetime.fromisoformat(min(stamps))).total_seconds()
+    return max(RAW_INTERVAL, math.ceil(span / max(CHART_WIDTH // PX_PER_POINT, 1)))
+
+
+def aligned_frame(points_by_room, labels, step_seconds):
+    # -> DataFrame on one time grid, a crowdiness column per room, NaN where a room has no data.
+    # Bins start at the epoch, so every room's buckets line up.
+    import pandas as pd
+
+    columns = {}
+    for room_id, points in points_by_room.items():
+        if not points:
+            continue
+        series = pd.Series([point.get("crowdiness_index") for point in points],
+                           index=pd.to_datetime([point["timestamp"] for point in points]), dtype=float)
+        series = series[~series.index.duplicated(keep="last")].sort_index()
+        columns[labels[room_id]] = series.resample(f"{step_seconds}s", origin="epoch").mean()
+    frame = pd.DataFrame(columns)
+    frame.index.name = "time"
+    return frame
+
+
+def room_labels(room_ids, names):
+    # Chart series names: the room name, with the id where two rooms share a name
+    shown = [names.get(room_id, room_id) for room_id in room_ids]
+    return {room_id: name if shown.count(name) == 1 else f"{name} ({room_id})"
+            for room_id, name in zip(room_ids, shown)}
+
+
+def render_comparison(history_store, room_ids, names, window_minutes):
+    results = fetch_many(history_store, room_ids, window_minutes)
+    points_by_room = {room_id: points for room_id, (points, _) in results.items() if points}
+    missing = [names.get(room_id, room_id) for room_id in room_ids if room_id not in points_by_room]
+    if missing:
+        st.caption(f"No data in this range for: {', '.join(missing)}")
+    if not points_by_room:
+        st.warning("⚠️ No session data found for these rooms in the selected time range.")
+        return
+
+    trace = instrumentation.current_trace()
+    if trace is not None:
+        trace.section("chart")
+    import altair as alt
+
+    resolution = results[room_ids[0]][1]
+    step = grid_seconds(points_by_room, resolution)
+    labels = room_labels(room_ids, names)
+    frame = aligned_frame(points_by_room, labels, step)
+    st.caption(f"Aligned to {step // 60} min intervals." if step % 60 == 0 else f"Aligned to {step} s intervals.")
+
+    st.markdown("<a name='session-statistics'></a>", unsafe_allow_html=True)
+    st.markdown("### 📈 Session Statistics")
+    st.dataframe([
+        {"Room": label, "Min": f"{frame[label].min():.0%}", "Max": f"{frame[label].max():.0%}",
+         "Avg": f"{frame[label].mean():.0%}", "Points": len(points_by_room[room_id])}
+        for room_id, label in labels.items() if room_id in points_by_room
+    ], hide_index=True, use_container_width=True)
+
+    long = frame.reset_index().melt("time", var_name="Room", value_name="crowdiness").dropna()
+    chart = alt.Chart(long).mark_line(point=True).encode(
+        x=alt.X("time:T", title="Time"),
+        y=alt.Y("crowdiness:Q", title="Crowdiness", axis=alt.Axis(format=".0%")),
+        color=alt.Color("Room:N", title="Room"),
+        tooltip=[
+            alt.Tooltip("Room:N"),
+            alt.Tooltip("time:T", title="Time", format="%a %H:%M:%S"),
+            alt.Tooltip("crowdiness:Q", title="Crowdiness", format=".0%"),
+        ]
+    ).properties(width=700, height=300)
+
+    st.altair_chart(chart, use_container_width=True)
+
+    with st.expander("📂 Raw Historical Data", expanded=False):
+        st.dataframe(frame)
+
+
+def render_history(history_store, room, names):
+    # names: {room_id: display name} of the rooms that can be compared
+    st.markdown("<a name='raw-historical-data'></a>", unsafe_allow_html=True)
+    st.markdown("### ⏳ Crowdiness Over Time")
+
+    # Select Box (filter) — decides how much history is fetched
+    time_filter = st.selectbox("⏱️ Show Data From", list(HISTORY_WINDOWS))
+    compare = st.multiselect("🆚 Compare with", [room_id for room_id in names if room_id != room['id']],
+                             format_func=lambda room_id: names[room_id], max_selections=MAX_COMPARE - 1,
+                             key="compare_rooms")
+    if compare:
+        render_comparison(history_store, [room['id']] + compare, names, HISTORY_WINDOWS[time_filter])
+        return
+
+    points, resolution = fetch_points(history_store, room['id'], HISTORY_WINDOWS[time_filter])
+
+    if points is None:
+        st.warning("⚠️ No session history available.")
+        return
+    if not points:
+        st.warning("⚠️ No session data found for this room in the selected time range.")
+        return
+
+    trace = instrumentation.current_trace()
+    if trace is not None:
+        trace.section("chart")
+    import altair as alt
+    import pandas as pd
+
+    df = pd.DataFrame(points)
+    df["timestamp"] = pd.to_datetime(df["timestamp"])
+    df["time_label"] = df["timestamp"].dt.strftime("%H:%M:%S" if resolution is None else "%a %H:%M")
+    if resolution is not None:
+        st.caption(f"Averaged over {resolution} intervals.")
+
+    df = df.sort_values("timestamp")
+    df["smoothed"] = df["crowdiness_index"].rolling(window=3, min_periods=1).mean()
+
+    df["crowdiness_percent"] = df["crowdiness_index"]
+    df["smoothed_percent"] = df["smoothed"]
+
+    # Session Stats
+    st.markdown("<a name='session-statistics'></a>", unsafe_allow_html=True)
+    st.markdown("### 📈 Session Statistics")
+    col1, col2, col3 = st.columns(3)
+    col1.metric("📉 Min", f"{df['crowdiness_index'].min():.0%}")
+    col2.metric("📈 Max", f"{df['crowdiness_index'].max():.0%}")
+    col3.metric("📊 Avg", f"{df['crowdiness_index'].mean():.0%}")
+
+    chart = alt.Chart(df).mark_line(point=True).encode(
+        x=alt.X("time_label:N", title="Time"),
+        y=alt.Y("crowdiness_percent:Q", title="Crowdiness", axis=alt.Axis(format=".0%")),
+        tooltip=[
+            alt.Tooltip("time_label:N", title="Time"),
+            alt.Tooltip("crowdiness_percent:Q", title="Crowdiness", format=".1f"),
+            alt.Tooltip("smoothed_percent:Q", title="Smoothed", format=".1f")
+        ]
+    ).properties(width=700, height=300)
+
+    st.altair_chart(chart, use_container_width=True)
+
+    with st.expander("📂 Raw Historical Data", expanded=False):
+        st.dataframe(df[["timestamp", "motion_rate", "avg_sound", "avg_co2", "crowdiness_index"]])
@@ -0,0 +1,67 @@
+import os
+
+import streamlit as st
+
+import instrumentation
+
+# Smaller dashboard sections: the campus overview from occupancy_summary.py and the
+# rerun breakdown shown with SPACESCOUT_DEBUG=1. Tables are handed to st.dataframe as lists
+# of dicts, so neither section needs pandas of its own.
+
+
+# --- Campus Overview (one precomputed document, see occupancy_summary.py) ---
+def overview_rows(summary):
+    rows = []
+    for building_key, building in sorted(summary.get("buildings", {}).items()):
+        floors = summary.get("floors", {}).get(building_key, {})
+        for level in [building] + sorted(floors.values(), key=lambda f: f["name"]):
+            rows.append({
+                "Building": building["name"],
+                "Floor": "All" if level is building else level["name"],
+                "People": level["people"],
+                "Free Seats": level["free_seats"],
+                "Occupancy": f"{level['occupancy']:.0%}" if level.get("occupancy") is not None else "–",
+                "Offline Rooms": level["offline"],
+            })
+    return rows
+
+
+def render_overview(summary):
+    campus = summary.get("campus")
+    if not campus:
+        return
+    st.markdown("#### 🏢 Campus Overview")
+    col1, col2, col3 = st.columns(3)
+    col1.metric("👥 Estimated People", f"{campus['people']} / {campus['capacity']}")
+    col2.metric("🪑 Free Seats", campus["free_seats"])
+    col3.metric("📡 Rooms Online", f"{campus['online']} / {campus['rooms']}")
+
+    with st.expander("Buildings & Floors", expanded=False):
+        st.dataframe(overview_rows(summary), hide_index=True, use_container_width=True)
+
+
+# --- Debug Panel ---
+def render_debug_panel(trace):
+    with st.sidebar.expander("🛠️ Rerun Breakdown", expanded=True):
+        st.markdown(
+            f"**{trace.total_ms:.0f} ms** total — database: {trace.db['calls']} calls, "
+            f"{trace.db['ms']:.0f} ms, {trace.db['read_bytes'] / 1024:.1f} KB read"
+        )
+        breakdown = [dict(row, share=row["share"] * 100) for row in trace.breakdown()]
+        st.dataframe(breakdown, hide_index=True, column_config={
+            "share": st.column_config.ProgressColumn("share", format="%.0f%%", min_value=0, max_value=100),
+        })
+        if trace.db_by_node:
+            st.dataframe(
+                [{"call": call, "count": n, "ms": round(ms, 1), "bytes": nbytes}
+                 for call, (n, ms, nbytes) in sorted(trace.db_by_node.items())],
+                hide_index=True,
+            )
+        if st.button("🔬 Profile next rerun", key="profile_next"):
+            st.session_state.profile_next_rerun = True
+            st.rerun()
+        if st.session_state.get("profile_report"):
+            st.code(st.session_state.profile_report, language=None)
+        port = os.environ.get(instrumentation.METRICS_PORT_ENV)
+        if port:
+            st.caption(f"Prometheus metrics: http://127.0.0.1:{port}/metrics")
@@ -0,0 +1,172 @@
+from datetime import datetime
+
+import streamlit as st
+
+import assets
+import instrumentation
+from forecast import at_arrival
+from occupancy_summary import is_online
+
+# The room list of the dashboard: entries with distance and crowdiness on arrival,
+# the sort, and the rows with their details. The list and sort are plain functions
+# so benchmark.py times exactly what the page runs.
+
+EXACT_DISTANCE_ROOMS = 25  # Rooms at the top of the list that get an exact geodesic distance
+WALKING_KM_PER_MIN = 5.0 / 60  # Walking speed used for the arrival time
+
+
+# --- Color Codes ---
+def get_crowdiness_color(value):
+    if value == -1:
+        return "⚫"
+    elif value < 0.3:
+        return "🟢"
+    elif value < 0.6:
+        return "🟠"
+    else:
+        return "🔴"
+
+
+def get_status_bar(value):
+    if value < 0.3:
+        return "🟩 Low"
+    elif value < 0.6:
+        return "🟧 Medium"
+    else:
+        return "🟥 High"
+
+
+# --- Build room list with metadata ---
+def set_arrival(room, forecasts):
+    # Crowdiness expected when the user gets there, from the room's forecast
+    room["arrival_min"] = room["distance"] / WALKING_KM_PER_MIN
+    if room["crowdiness"] == -1:
+        room["arrival_crowdiness"] = -1
+    else:
+        room["arrival_crowdiness"] = at_arrival(forecasts.get(room["id"]), room["crowdiness"], room["arrival_min"])
+
+
+def build_room_entries(rooms_data, live_data, forecasts, room_index, user_latlng, now=None):
+    # Distances to every room come from one vectorized haversine pass over the cached index
+    distances_km = room_index.distances_km(*user_latlng)
+    # A room whose last live value is older than OFFLINE_AFTER shows as offline, like
+    # in the campus overview (occupancy_summary.py)
+    now = now or datetime.now()
+    room_entries = []
+    for room_id, dist_km in zip(room_index.ids, distances_km):
+        room = rooms_data.get(room_id, {})
+        coords = room.get("location", {})
+        live = live_data.get(room_id)
+
+        entry = {
+            "id": room_id,
+            "name": room.get("room_name", room_id),
+            "lat": coords.get("lat"),
+            "lng": coords.get("lng"),
+            "crowdiness": live["crowdiness_index"] if is_online(live, now) else -1,
+            "distance": round(float(dist_km), 2)
+        }
+        set_arrival(entry, forecasts)
+        room_entries.append(entry)
+    return room_entries
+
+
+# --- Sort by crowdiness on arrival then distance ---
+def room_sort_key(x):
+    return (x['arrival_crowdiness'] if x['arrival_crowdiness'] != -1 else 999, x['distance'])
+
+
+def geodesic_km(a, b):
+    # geopy is only needed for the top of the list, so it loads on the first sort
+    from geopy.distance import geodesic
+
+    return geodesic(a, b).km
+
+
+def sort_rooms(room_entries, forecasts, user_latlng):
+    room_entries.sort(key=room_sort_key)
+
+    # Exact geodesic distance only for the rooms at the top of the list
+    with instrumentation.span("geodesic"):
+        for room in room_entries[:EXACT_DISTANCE_ROOMS]:
+            room["distance"] = round(geodesic_km(user_latlng, [room["lat"], room["lng"]]), 2)
+            set_arrival(room, forecasts)
+    room_entries[:EXACT_DISTANCE_ROOMS] = sorted(room_entries[:EXACT_DISTANCE_ROOMS], key=room_sort_key)
+    return room_entries
+
+
+# --- Room rows ---
+def room_row_html(room):
+    color_emoji = get_crowdiness_color(room['crowdiness'])
+    crowdiness_label = f"{color_emoji} {room['crowdiness']:.0%}" if room['crowdiness'] != -1 else "⚫ Offline"
+    if room['crowdiness'] != -1 and round(room['arrival_crowdiness'], 2) != round(room['crowdiness'], 2):
+        crowdiness_label += (f" → {get_crowdiness_color(room['arrival_crowdiness'])} {room['arrival_crowdiness']:.0%}"
+                             f" on arrival (~{room['arrival_min']:.0f} min)")
+    row_style = "color: grey;" if room['crowdiness'] == -1 else ""
+    return (
+        f"<div style='display: flex; justify-content: space-between; align-items: center; {row_style}'>"
+        f"<span><strong>{room['name']}</strong> — {room['distance']} km — Crowdiness: {crowdiness_label}</span>"
+        f"</div>"
+    )
+
+
+def render_room_details(room, room_meta, forecasts):
+    # Room Image
+    image_path = assets.room_image(room['id'])
+    if image_path:
+        st.image(image_path, caption=f"{room['name']}", use_column_width=True)
+    else:
+        st.info("📸 Room image not available.")
+
+    # Capacity + Estimated People
+    if "capacity" in room_meta:
+        capacity = room_meta["capacity"]
+        if room["crowdiness"] != -1:
+            est_people = int(capacity * room["crowdiness"])
+            st.metric("👥 Estimated People Inside", f"{est_people} / {capacity}")
+        else:
+            st.markdown(f"👥 Capacity: **{capacity}** — Room is currently offline.")
+
+    # Details
+    st.markdown(f"**Current Crowdiness Level:** {get_status_bar(room['crowdiness'])}")
+    room_forecast = forecasts.get(room["id"], {}).get("crowdiness_index")
+    if room_forecast and room["crowdiness"] != -1:
+        st.markdown("🔮 **Next hour:** " + " &nbsp; ".join(
+            f"+{key[:-1]} min {get_crowdiness_color(value)} {value:.0%}"
+            for key, value in sorted(room_forecast.items(), key=lambda item: int(item[0][:-1]))
+        ))
+
+    # --- Room Meta Info ---
+    building = room_meta.get("building", "Unknown Building")
+    floor = room_meta.get("floor", "Unknown Floor")
+    rtype = room_meta.get("type", "Unknown Type")
+    st.markdown(f"🏢 **Building**: {building} &nbsp;&nbsp; 🧭 **Floor**: {floor} &nbsp;&nbsp; 🪑 **Type**: {rtype}")
+
+    st.markdown("---")
+
+
+def render_room_rows(room_entries, rooms_data, forecasts):
+    st.subheader("📡 Real-Time Room Radar")
+    st.markdown("Pick a room to scout 👇")
+
+    if "room_info_expanded" not in st.session_state:
+        st.session_state.room_info_expanded = {}
+
+    for room in room_entries:
+        with st.container():
+            cols = st.columns([6, 1])
+            with cols[0]:
+                st.markdown(room_row_html(room), unsafe_allow_html=True)
+            with cols[1]:
+                if st.button("🔍 View", key=f"view_{room['id']}"):
+                    if st.session_state.room_info_expanded.get(room['id']):
+                        # Collapse the currently open room
+                        st.session_state.room_info_expanded = {}
+                    else:
+                        # Collapse all and expand only this one
+                        st.session_state.room_info_expanded = {room['id']: True}
+                        st.session_state.selected_room_id = room['id']
+
+            # Show room details if selected
+            if st.session_state.room_info_expanded.get(room['id']):
+                render_room_details(room, rooms_data[room["id"]], forecasts)
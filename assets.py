@@ -0,0 +1,110 @@
+import base64
+import io
+import os
+from functools import lru_cache
+
+# Static assets for the dashboard, prepared once per server process instead of on
+# every rerun. The background is downscaled, recompressed and base64-encoded into
+# its CSS a single time; room photos get display-width thumbnails written to
+# CACHE_DIR and reused until the source image changes. Pillow is imported only
+# when an image has to be (re)encoded; cached thumbnails are served without it.
+
+RESOURCES_DIR = "resources"
+CACHE_DIR = os.path.join(RESOURCES_DIR, ".cache")
+BACKGROUND_MAX_WIDTH = 1600
+BACKGROUND_QUALITY = 70
+THUMBNAIL_WIDTH = 700        # Display width of room photos in the centered layout
+THUMBNAIL_QUALITY = 80
+
+BACKGROUND_CSS = """
+    <style>
+    .stApp {{
+        background: linear-gradient(rgba(0,0,0,0.65), rgba(0,0,0,0.65)),
+                    url("data:{mime};base64,{encoded}") center bottom / contain no-repeat fixed;
+    }}
+
+    .main .block-container {{
+        background-color: rgba(0, 0, 0, 0.3);
+        padding: 1rem;
+        border-radius: 12px;
+    }}
+    </style>
+    """
+
+
+def _encode(img, quality):
+    # WebP where Pillow supports it, JPEG otherwise -> (bytes, mime type, extension)
+    buffer = io.BytesIO()
+    try:
+        img.save(buffer, format="WEBP", quality=quality, method=4)
+        return buffer.getvalue(), "image/webp", "webp"
+    except (OSError, KeyError, ValueError):
+        buffer = io.BytesIO()
+        img.convert("RGB").save(buffer, format="JPEG", quality=quality, optimize=True, progressive=True)
+        return buffer.getvalue(), "image/jpeg", "jpg"
+
+
+def _resize(img, max_width):
+    from PIL import Image
+
+    if img.width <= max_width:
+        return img
+    height = round(img.height * max_width / img.width)
+    return img.resize((max_width, height), Image.LANCZOS)
+
+
+@lru_cache(maxsize=4)
+def _background_css(img_path, mtime):
+    from PIL import Image
+
+    with Image.open(img_path) as img:
+        img = _resize(img.convert("RGB"), BACKGROUND_MAX_WIDTH)
+        data, mime, _ = _encode(img, BACKGROUND_QUALITY)
+    return BACKGROUND_CSS.format(mime=mime, encoded=base64.b64encode(data).decode())
+
+
+def background_css(img_path):
+    # The mtime is part of the cache key, so replacing the file is picked up
+    return _background_css(img_path, os.path.getmtime(img_path))
+
+
+@lru_cache(maxsize=1024)
+def _thumbnail(image_path, mtime, width):
+    name = os.path.splitext(os.path.basename(image_path))[0]
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    for ext in ("webp", "jpg"):
+        cached = os.path.join(CACHE_DIR, f"{name}_{width}.{ext}")
+        if os.path.exists(cached) and os.path.getmtime(cached) >= mtime:
+            return cached
+
+    from PIL import Image
+
+    with Image.open(image_path) as img:
+        img = _resize(img.convert("RGB"), width)
+        data, _, ext = _encode(img, THUMBNAIL_QUALITY)
+    cached = os.path.join(CACHE_DIR, f"{name}_{width}.{ext}")
+    tmp_path = cached + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, cached)
+    return cached
+
+
+def room_image(room_id, width=THUMBNAIL_WIDTH):
+    # Path of the display-size thumbnail for resources/{room_id}.jpg, or None
+    image_path = os.path.join(RESOURCES_DIR, f"{room_id}.jpg")
+    if not os.path.exists(image_path):
+        return None
+    try:
+        return _thumbnail(image_path, os.path.getmtime(image_path), width)
+    except OSError:
+        # Unwritable cache dir or unreadable image: fall back to the original file
+        return image_path
+
+
+def warm_up(room_ids, background_path=os.path.join(RESOURCES_DIR, "Background.png")):
+    # Prepare everything at server start so the first visitor doesn't pay for it
+    if os.path.exists(background_path):
+        background_css(background_path)
+    for room_id in room_ids:
+        room_image(room_id)
@@ -0,0 +1,737 @@
+import argparse
+import ast
+import asyncio
+import contextlib
+import io
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+import storage
+from Simulate_Serial import generate_fake_sensor_data
+from serial_protocol import FrameParser, frame_line, parse_line
+
+# Benchmark harness for the whole path: serial parsing -> prediction -> ingest into
+# a database -> dashboard rerun. Everything runs locally: local_db stands in for
+# Firebase and Simulate_Serial.py generates the sensor lines.
+#
+#   python benchmark.py                              # all suites -> benchmark_results.json
+#   python benchmark.py --suite parse predict --quick
+#   python benchmark.py --baseline old.json          # exit 1 on a regression
+#   python benchmark.py --suite imports              # exit 1 over the app's import budget
+#
+# Run it from the repository root: the "app" suite executes app.py through
+# Streamlit's AppTest with SPACESCOUT_DB=memory, which reads resources/ relative
+# to the working directory.
+#
+# Results are JSON: {"meta": {...}, "results": {suite: {...}}, "metrics": {name: value}}.
+# "metrics" is the flat view used for comparisons; names end in _per_s (higher is
+# better), _ms or _bytes (lower is better).
+
+MODEL_SOURCE = None         # models/ registry if published, else owl_model.pkl
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+RESULTS_PATH = "benchmark_results.json"
+MODES = ["EMPTY", "SPARSE", "AVERAGE", "CROWDED", "OVERCROWDED"]
+ROOM_COUNTS = [10, 100, 1000, 10000]
+DEFAULT_CENTER = [53.56548784525446, 9.984950800725397]
+REGRESSION_TOLERANCE = 0.2      # 20% worse than the baseline counts as a regression
+HISTORY_RTT = 0.05              # history: simulated round trip per database read, seconds
+IMPORT_BUDGET_MS = 1000         # Leading imports of app.py + app_*.py in a fresh interpreter
+# Must not be loaded by those imports; app.py brings them in where they are used
+LAZY_MODULES = ["matplotlib", "altair", "pandas", "PIL", "geopy", "folium", "streamlit_folium",
+                "sklearn", "joblib", "pyarrow", "http.server"]
+# The whole first run of the page in a fresh interpreter (AppTest, no room open). It
+# includes the map's imports: folium loads pandas and numpy, about a second cold.
+FIRST_RUN_BUDGET_MS = 4000
+FIRST_RUN_ROOMS = 50
+# Must not be loaded by that run either: only an open room or the debug panel needs them
+FIRST_RUN_LAZY_MODULES = ["matplotlib", "altair", "sklearn", "joblib", "http.server"]
+
+
+def best_of(fn, repeat):
+    # Fastest of `repeat` runs in seconds; the minimum is the least noisy estimate
+    best = math.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def percentiles(values):
+    if not values:
+        return {}
+    values = np.asarray(values) * 1000
+    return {
+        "p50_ms": round(float(np.percentile(values, 50)), 3),
+        "p95_ms": round(float(np.percentile(values, 95)), 3),
+        "p99_ms": round(float(np.percentile(values, 99)), 3),
+        "max_ms": round(float(values.max()), 3),
+    }
+
+
+def sample_lines(n):
+    return [generate_fake_sensor_data(MODES[i % len(MODES)]) for i in range(n)]
+
+
+# --- Parsing ---
+def bench_parse(args):
+    n = 20_000 if args.quick else 200_000
+    lines = sample_lines(n)
+    framed = [frame_line(line, i, with_checksum=True) for i, line in enumerate(lines)]
+    plain_bytes = ("\n".join(lines) + "\n").encode()
+    framed_bytes = ("\n".join(framed) + "\n").encode()
+
+    def feed(data):
+        return lambda: FrameParser().feed(data)
+
+    results = {"lines": n}
+    for name, fn in [
+        ("parse_line", lambda: [parse_line(line) for line in lines]),
+        ("parse_line_framed", lambda: [FrameParser().parse_line(line) for line in framed]),
+        ("feed_plain", feed(plain_bytes)),
+        ("feed_framed", feed(framed_bytes)),
+    ]:
+        results[f"{name}_samples_per_s"] = round(n / best_of(fn, args.repeat))
+    return results
+
+
+# --- Prediction ---
+def load_engine(model_source):
+    from model_registry import ModelHandle
+
+    try:
+        return ModelHandle(model_source).engine
+    except FileNotFoundError as e:
+        sys.exit(f"❌ No model found ({e}) — run train_model.py first or pass --model")
+
+
+def bench_predict(args):
+    engine = load_engine(args.model)
+    rng = np.random.default_rng(42)
+    results = {}
+
+    # predict_crowdiness() in the listeners is one predict_one() per aggregate
+    calls = 200 if args.quick else 2000
+    rows = [(rng.uniform(0, 1), rng.uniform(30, 75), rng.uniform(400, 1200)) for _ in range(calls)]
+    elapsed = best_of(lambda: [engine.predict_one(*row) for row in rows], args.repeat)
+    results["predict_one_per_s"] = round(calls / elapsed)
+    results["predict_one_ms"] = round(elapsed / calls * 1000, 4)
+
+    for batch in [10, 100, 1000, 10000]:
+        X = np.column_stack([
+            rng.uniform(0, 1, batch), rng.uniform(30, 75, batch), rng.uniform(400, 1200, batch),
+        ])
+        elapsed = best_of(lambda: engine.predict_batch(X), args.repeat)
+        results[f"batch_{batch}_per_s"] = round(batch / elapsed)
+    return results
+
+
+# --- End-to-end: sensor line -> live_data ---
+def bench_e2e(args):
+    import ingest_service
+    from firebase_writer import BatchedWriter
+    from local_db import LocalDatabase
+    from publish_policy import PublishPolicy
+
+    n_rooms = 20 if args.quick else 200
+    duration = 3.0 if args.quick else 10.0
+    rate = 1.0 / args.sample_interval
+
+    # Shorter than production so a run collects enough aggregation rounds
+    ingest_service.AGGREGATE_EVERY = args.aggregate_every
+    ingest_service.MIN_SAMPLES = 1
+
+    queues = {}
+    ingested = {}      # room -> [(pushed_at, ingested_at)]
+    aggregated = {}    # (room, point timestamp) -> write_point time
+    landed = {}        # (room, point timestamp) -> time the live_data update was applied
+
+    async def bench_chunks(source):
+        # Lines handed over by the producer below; the generator resumes only
+        # after the service has parsed the previous chunk
+        queue = queues[source["room"]]
+        while True:
+            pushed_at, data = await queue.get()
+            yield data
+            ingested[source["room"]].append((pushed_at, time.perf_counter()))
+
+    class TimedDatabase(LocalDatabase):
+        def update(self, parts, values):
+            super().update(parts, values)
+            now = time.perf_counter()
+            for path, value in values.items():
+                if path.startswith("live_data/") and isinstance(value, dict):
+                    landed[(path[len("live_data/"):], value.get("timestamp"))] = now
+
+    class TimedWriter(BatchedWriter):
+        def write_point(self, room_id, session_id, timestamp_key, data_point, live=True, session=True):
+            aggregated[(room_id, data_point["timestamp"])] = time.perf_counter()
+            super().write_point(room_id, session_id, timestamp_key, data_point, live, session)
+
+    ingest_service.SOURCES["bench"] = bench_chunks
+    room_ids = [f"room{i:04d}" for i in range(n_rooms)]
+    rooms = [{"room_id": room_id, "source": {"type": "bench", "room": room_id}} for room_id in room_ids]
+    database = TimedDatabase()
+    writer = TimedWriter(database, flush_interval=args.flush_interval)
+    engine = load_engine(args.model)
+
+    async def produce():
+        tick = 0
+        while True:
+            for i, room_id in enumerate(room_ids):
+                line = generate_fake_sensor_data(MODES[(i + tick) % len(MODES)])
+                queues[room_id].put_nowait((time.perf_counter(), line.encode() + b"\n"))
+            tick += 1
+            await asyncio.sleep(1.0 / rate)
+
+    async def run():
+        for room_id in room_ids:
+            queues[room_id] = asyncio.Queue()
+            ingested[room_id] = []
+        # Every point published, so each aggregation is a latency sample
+        policy = PublishPolicy(live_deadband=0, live_heartbeat=0, deadbands={}, keyframe_every=0)
+        service = ingest_service.IngestService(rooms, engine, writer, policy=policy)
+        tasks = [asyncio.create_task(service.run()), asyncio.create_task(produce())]
+        await asyncio.sleep(duration)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await service.shutdown()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        asyncio.run(run())
+
+    # A line reaches live_data with the first aggregation after it was parsed
+    line_latency, aggregate_to_live = [], []
+    points = {}
+    for (room_id, stamp), aggregated_at in aggregated.items():
+        if (room_id, stamp) in landed:
+            points.setdefault(room_id, []).append((aggregated_at, landed[(room_id, stamp)]))
+            aggregate_to_live.append(landed[(room_id, stamp)] - aggregated_at)
+    for room_id, room_points in points.items():
+        room_points.sort()
+        times = [p[0] for p in room_points]
+        for pushed_at, ingested_at in ingested[room_id]:
+            k = np.searchsorted(times, ingested_at)
+            if k < len(times):
+                line_latency.append(room_points[k][1] - pushed_at)
+
+    return {
+        "rooms": n_rooms,
+        "duration_s": duration,
+        "sample_interval_s": args.sample_interval,
+        "aggregate_every_s": args.aggregate_every,
+        "flush_interval_s": args.flush_interval,
+        "lines": sum(len(v) for v in ingested.values()),
+        "points": len(aggregate_to_live),
+        "line_to_live": percentiles(line_latency),
+        "aggregate_to_live": percentiles(aggregate_to_live),
+        "writer": {k: v for k, v in writer.stats.items() if k != "last_flush_ms"},
+        "database_ops": dict(database.ops),
+    }
+
+
+# --- History comparison: N rooms, one after another vs in parallel ---
+def bench_history(args):
+    import app_history
+    from history import HistoryStore, session_index_entry
+    from local_db import LocalDatabase
+
+    class SlowDatabase(LocalDatabase):
+        # Every read pays a network round trip, like Firebase does
+        def get(self, parts, shallow_only=False):
+            time.sleep(args.rtt)
+            return super().get(parts, shallow_only)
+
+        def query(self, parts, **params):
+            time.sleep(args.rtt)
+            return super().query(parts, **params)
+
+    rng = np.random.default_rng(5)
+    counts = [1, 2, app_history.MAX_COMPARE] if args.quick else list(range(1, app_history.MAX_COMPARE + 1))
+    now = datetime.now()
+    data = {"sessions": {}, "session_index": {}}
+    for i in range(max(counts)):
+        # 30 minutes at 10 s, each room at its own offset, read with the 30-minute (raw) window
+        room_id = f"room{i:05d}"
+        points = {}
+        for k in range(180):
+            at = now - timedelta(seconds=10 * k + i * 3)
+            points[at.strftime("%Y%m%d%H%M%S")] = {"crowdiness_index": round(float(rng.random()), 3),
+                                                  "timestamp": at.isoformat()}
+        data["sessions"][room_id] = {"s1": {"room_id": room_id, "started_at": now.isoformat(), "data": points}}
+        data["session_index"][room_id] = session_index_entry("s1", now.isoformat())
+    database = SlowDatabase(data)
+
+    minutes = app_history.HISTORY_WINDOWS["Last 30 min"]
+    results = {"rtt_ms": args.rtt * 1000}
+    for n in counts:
+        room_ids = [f"room{i:05d}" for i in range(n)]
+        # A fresh store per run: cold tails, so every room costs its pointer and range reads
+        sequential = best_of(lambda: [app_history.fetch_points(HistoryStore(database), room_id, minutes)
+                                      for room_id in room_ids], args.repeat)
+        parallel = best_of(lambda: app_history.fetch_many(HistoryStore(database), room_ids, minutes), args.repeat)
+        fetched = app_history.fetch_many(HistoryStore(database), room_ids, minutes)
+        points_by_room = {room_id: points for room_id, (points, _) in fetched.items()}
+        labels = {room_id: room_id for room_id in room_ids}
+        step = app_history.grid_seconds(points_by_room, None)
+        align = best_of(lambda: app_history.aligned_frame(points_by_room, labels, step), args.repeat)
+        results[str(n)] = {
+            "sequential_ms": round(sequential * 1000, 1),
+            "parallel_ms": round(parallel * 1000, 1),
+            "speedup": round(sequential / parallel, 2),
+            "align_ms": round(align * 1000, 2),
+            "grid_rows": len(app_history.aligned_frame(points_by_room, labels, step)),
+        }
+    return results
+
+
+# --- Spool: appends while the database is down, then the replay ---
+def bench_spool(args):
+    import shutil
+    import tempfile
+
+    from local_db import LocalDatabase
+    from spool import Spool, SpoolWriter
+
+    class FlakyDatabase(LocalDatabase):
+        down = True
+
+        def update(self, parts, values):
+            if self.down:
+                raise ConnectionError("database unreachable")
+            super().update(parts, values)
+
+    n = 2000 if args.quick else 20000
+    lines = sample_lines(n)
+    points = [{"crowdiness_index": round((i % 100) / 100, 2), "avg_co2": 400.0 + i % 50,
+               "timestamp": f"2025-01-01T00:00:{i % 60:02d}", "line": line} for i, line in enumerate(lines)]
+    results = {"records": n}
+    root = tempfile.mkdtemp(prefix="spool-bench-")
+    try:
+        # Append cost with grouped fsyncs vs one fsync per record. The uploader thread
+        # runs sync(force=False) in production; here it follows every append.
+        for name, fsync_batch in (("append", None), ("append_fsync_each", 1)):
+            directory = os.path.join(root, name)
+            spool = Spool(directory) if fsync_batch is None else Spool(directory, fsync_batch=fsync_batch)
+            count = n if fsync_batch is None else min(n, 500)
+            start = time.perf_counter()
+            for i in range(count):
+                key = (datetime(2025, 1, 1) + timedelta(seconds=i)).strftime("%Y%m%d%H%M%S")
+                spool.append({f"sessions/room{i % 50:03d}/s1/data/{key}": points[i]})
+                spool.sync(force=False)
+            spool.sync()
+            results[f"{name}_per_s"] = round(count / (time.perf_counter() - start))
+            results[f"{name}_fsyncs"] = spool.stats["fsyncs"]
+            spool.close()
+
+        # Outage: every upload fails, records pile up on disk
+        database = FlakyDatabase()
+        writer = SpoolWriter(database, Spool(os.path.join(root, "append")))
+        failed = writer.flush()
+        results["backlog_bytes"] = writer.spool.disk_bytes()
+
+        # Connectivity returns: drain the backlog
+        database.down = False
+        start = time.perf_counter()
+        while writer.pending() and writer.flush():
+            pass
+        elapsed = time.perf_counter() - start
+        stored = sum(len(session["s1"]["data"]) for session in database.reference("sessions").get().values())
+        writer.stop()
+        results.update({
+            "upload_failed_while_down": not failed,
+            "replay_per_s": round(n / elapsed),
+            "replayed": stored,
+            "lost": n - stored,
+            "left_on_disk_bytes": writer.spool.disk_bytes(),
+        })
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    return results
+
+
+# --- Dashboard rerun ---
+def synthetic_rooms(n, rng):
+    # Rooms scattered within ~2 km of the default center, 90% of them online and forecast
+    lats = DEFAULT_CENTER[0] + rng.normal(0, 0.01, n)
+    lngs = DEFAULT_CENTER[1] + rng.normal(0, 0.015, n)
+    rooms_data, live_data, forecasts = {}, {}, {}
+    for i in range(n):
+        room_id = f"room{i:05d}"
+        rooms_data[room_id] = {
+            "room_name": f"Room {i}",
+            "capacity": int(rng.integers(10, 200)),
+            "location": {"lat": float(lats[i]), "lng": float(lngs[i])},
+        }
+        if rng.random() < 0.9:
+            live_data[room_id] = {"crowdiness_index": round(float(rng.random()), 3), "timestamp": datetime.now().isoformat()}
+            forecasts[room_id] = {
+                "generated_at": datetime.now().isoformat(),
+                "crowdiness_index": {f"{h}m": round(float(rng.random()), 3) for h in (15, 30, 45, 60)},
+            }
+    return rooms_data, live_data, forecasts
+
+
+def dashboard_rerun(rooms_data, live_data, forecasts):
+    # The data/layout stages of one app.py rerun, outside Streamlit, with the same
+    # functions (app_rooms.py): index build (cached in the app, reported separately),
+    # room list with the crowdiness on arrival, sort with exact distances for the top
+    # of the list, the room rows and the map layer HTML.
+    # -> ({stage: seconds}, room row HTML, map HTML)
+    import app_rooms
+    import map_layer
+    from spatial_index import RoomIndex
+
+    stages = {}
+    start = time.perf_counter()
+    room_index = RoomIndex(rooms_data)
+    stages["index_build_ms"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    room_entries = app_rooms.build_room_entries(rooms_data, live_data, forecasts, room_index, DEFAULT_CENTER)
+    stages["room_list_ms"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    app_rooms.sort_rooms(room_entries, forecasts, DEFAULT_CENTER)
+    stages["sort_ms"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    rows = [app_rooms.room_row_html(room) for room in room_entries]
+    stages["room_rows_ms"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    layer_map = map_layer.base_map(DEFAULT_CENTER)
+    map_layer.room_layer(room_entries, DEFAULT_CENTER).add_to(layer_map)
+    layer_html = layer_map.get_root().render()
+    stages["map_layer_ms"] = time.perf_counter() - start
+    return stages, rows, layer_html
+
+
+def bench_dashboard(args):
+    import map_layer
+
+    rng = np.random.default_rng(7)
+    counts = [c for c in args.room_counts if not args.quick or c <= 1000]
+    base_html = len(map_layer.base_map(DEFAULT_CENTER).get_root().render().encode())
+    results = {"base_map_bytes": base_html}
+
+    for n in counts:
+        rooms_data, live_data, forecasts = synthetic_rooms(n, rng)
+        # Fastest time per stage over the repeats (the first run also warms templates)
+        best = {}
+        for _ in range(max(args.repeat, 2)):
+            stages, rows, layer_html = dashboard_rerun(rooms_data, live_data, forecasts)
+            for name, seconds in stages.items():
+                best[name] = min(best.get(name, math.inf), seconds)
+
+        stages = {name: round(seconds * 1000, 3) for name, seconds in best.items()}
+        results[str(n)] = {
+            **stages,
+            "rerun_ms": round(sum(v for k, v in stages.items() if k != "index_build_ms"), 3),
+            "room_rows_bytes": sum(len(row.encode()) for row in rows),
+            "map_layer_bytes": len(layer_html.encode()) - base_html,
+            "live_data_bytes": len(json.dumps(live_data).encode()),
+            "clustered": n > map_layer.CLUSTER_THRESHOLD,
+        }
+    return results
+
+
+def bench_app(args):
+    # The real app.py under Streamlit's AppTest, on the in-memory backend: first run
+    # (imports, caches, listener start) and warm reruns as the room count grows
+    os.environ.setdefault("STREAMLIT_LOGGER_LEVEL", "error")
+    try:
+        import streamlit as st
+        from streamlit.testing.v1 import AppTest
+    except ImportError:
+        return {"skipped": "streamlit is not installed"}
+
+    os.environ[storage.BACKEND_ENV] = "memory"
+    import app_cache
+    import local_db
+
+    rng = np.random.default_rng(11)
+    counts = [c for c in args.room_counts if not args.quick or c <= 100]
+    database = local_db.default_database
+    results = {}
+    for n in counts:
+        rooms_data, live_data, forecasts = synthetic_rooms(n, rng)
+        database.reference("rooms").set(rooms_data)
+        database.reference("live_data").set(live_data)
+        database.reference("forecasts").set(forecasts)
+        app_cache.cache.invalidate()
+        st.cache_resource.clear()
+
+        app = AppTest.from_file(APP_PATH, default_timeout=600)
+        start = time.perf_counter()
+        app.run()
+        first_run = time.perf_counter() - start
+        if app.exception:
+            results[str(n)] = {"error": app.exception[0].message}
+            continue
+        rerun = best_of(app.run, max(args.repeat, 2))
+        results[str(n)] = {
+            "first_run_ms": round(first_run * 1000, 1),
+            "rerun_ms": round(rerun * 1000, 1),
+            "elements": len(app.main.children) if hasattr(app.main, "children") else None,
+            "buttons": len(app.button),
+        }
+    return results
+
+
+def leading_imports(path):
+    # Modules imported at the top of a file, before its first other statement;
+    # imports placed further down app.py run later in the rerun and are not counted
+    with open(path) as f:
+        tree = ast.parse(f.read(), path)
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.level == 0:
+            modules.append(node.module)
+        elif not (isinstance(node, ast.Expr) and isinstance(node.value, ast.Constant)):
+            break
+    return modules
+
+
+def bench_imports(args):
+    # Cold-start cost of the dashboard: the leading imports of app.py and of the
+    # app_*.py modules it loads, each time in a fresh interpreter, then the whole
+    # first run of the page (first_run()). Over IMPORT_BUDGET_MS or
+    # FIRST_RUN_BUDGET_MS, or with a lazy module loaded, the run fails.
+    root = os.path.dirname(APP_PATH)
+    modules = []
+    for name in ["app.py"] + sorted(f for f in os.listdir(root) if f.startswith("app_") and f.endswith(".py")):
+        for module in leading_imports(os.path.join(root, name)):
+            if module not in modules:
+                modules.append(module)
+
+    script = (
+        "import json, sys, time\n"
+        "start = time.perf_counter()\n"
+        + "".join(f"import {module}\n" for module in modules)
+        + "elapsed = time.perf_counter() - start\n"
+        f"print(json.dumps({{'ms': elapsed * 1000, 'loaded': [m for m in {LAZY_MODULES!r} if m in sys.modules]}}))\n"
+    )
+
+    def run(*flags):
+        proc = subprocess.run([sys.executable, *flags, "-c", script], cwd=root, capture_output=True, text=True,
+                              timeout=300, env=dict(os.environ, STREAMLIT_LOGGER_LEVEL="error"))
+        if proc.returncode != 0:
+            raise RuntimeError(f"Importing the app modules failed:\n{proc.stderr[-2000:]}")
+        return json.loads(proc.stdout.strip().splitlines()[-1]), proc.stderr
+
+    # The first run also writes .pyc files; the fastest of the rest is the cold start
+    run()
+    times, loaded = [], []
+    for _ in range(max(args.repeat, 3)):
+        result, _ = run()
+        times.append(result["ms"])
+        loaded = result["loaded"]
+
+    # -X importtime: cumulative microseconds per module imported directly by the script
+    _, trace = run("-X", "importtime")
+    heaviest = {}
+    for line in trace.splitlines():
+        parts = line.split("|")
+        if line.startswith("import time:") and len(parts) == 3 and parts[1].strip().isdigit():
+            name = parts[2].rstrip()
+            if name.startswith(" ") and not name.startswith("  "):   # Not nested under another import
+                heaviest[name.strip()] = round(int(parts[1]) / 1000, 1)
+    heaviest = dict(sorted(heaviest.items(), key=lambda item: -item[1])[:10])
+
+    import_ms = min(times)
+    first = first_run(root)
+    failures = []
+    if import_ms > args.import_budget:
+        failures.append(f"leading imports take {import_ms:.0f} ms, budget {args.import_budget:.0f} ms")
+    if loaded:
+        failures.append(f"loaded at import time, should be lazy: {', '.join(loaded)}")
+    if first["error"]:
+        failures.append(f"first run failed: {first['error']}")
+    if first["first_run_ms"] > args.first_run_budget:
+        failures.append(f"first run takes {first['first_run_ms']:.0f} ms, budget {args.first_run_budget:.0f} ms")
+    if first["loaded"]:
+        failures.append(f"loaded by the first run, should be lazy: {', '.join(first['loaded'])}")
+    return {
+        "modules": modules,
+        "import_ms": round(import_ms, 1),
+        "budget_ms": args.import_budget,
+        "eager_lazy_modules": loaded,
+        "heaviest_ms": heaviest,
+        "first_run_ms": first["first_run_ms"],
+        "first_run_budget_ms": args.first_run_budget,
+        "until_room_list_ms": first["until_room_list_ms"],
+        "first_run_sections_ms": first["sections"],
+        "first_run_lazy_modules": first["loaded"],
+        "failures": failures,
+    }
+
+
+def first_run(root):
+    # The page's first run in a fresh interpreter: every import app.py reaches (the
+    # map's included), caches and the listener start. Streamlit itself is imported
+    # before the clock starts, the server has it loaded before any session arrives.
+    rooms = {f"room{i:03d}": {"room_name": f"Room {i}", "capacity": 50,
+                              "location": {"lat": DEFAULT_CENTER[0] + (i % 10 - 5) * 1e-3,
+                                           "lng": DEFAULT_CENTER[1] + (i // 10 - 2) * 1e-3}}
+             for i in range(FIRST_RUN_ROOMS)}
+    live = {room_id: {"crowdiness_index": (i % 10) / 10, "timestamp": datetime.now().isoformat()}
+            for i, room_id in enumerate(rooms)}
+    script = (
+        "import json, os, sys, time\n"
+        f"os.environ[{storage.BACKEND_ENV!r}] = 'memory'\n"
+        "from streamlit.testing.v1 import AppTest\n"
+        "import instrumentation, local_db\n"
+        f"local_db.default_database.reference('/').update({{'rooms': {rooms!r}, 'live_data': {live!r}}})\n"
+        "traces = []\n"
+        "start_rerun = instrumentation.start_rerun\n"
+        "instrumentation.start_rerun = lambda: traces.append(start_rerun()) or traces[-1]\n"
+        f"app = AppTest.from_file({APP_PATH!r}, default_timeout=300)\n"
+        "start = time.perf_counter()\n"
+        "app.run()\n"
+        "elapsed = time.perf_counter() - start\n"
+        "print(json.dumps({'ms': elapsed * 1000, 'spans': traces[0].spans if traces else [],\n"
+        "                  'error': app.exception[0].message if app.exception else None,\n"
+        f"                  'loaded': [m for m in {FIRST_RUN_LAZY_MODULES!r} if m in sys.modules]}}))\n"
+    )
+    proc = subprocess.run([sys.executable, "-c", script], cwd=root, capture_output=True, text=True, timeout=600,
+                          env=dict(os.environ, STREAMLIT_LOGGER_LEVEL="error"))
+    if proc.returncode != 0:
+        raise RuntimeError(f"The first run of app.py failed:\n{proc.stderr[-2000:]}")
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+
+    # Sections in page order; nested spans ("sort › geodesic") are part of their section
+    sections = {name: round(ms, 1) for name, ms in result["spans"] if "›" not in name}
+    names = list(sections)
+    shown = names[:names.index("room_rows") + 1] if "room_rows" in names else names
+    return {
+        "first_run_ms": round(result["ms"], 1),
+        "until_room_list_ms": round(sum(sections[name] for name in shown), 1),
+        "sections": sections,
+        "loaded": result["loaded"],
+        "error": result["error"],
+    }
+
+
+SUITES = {
+    "parse": bench_parse,
+    "predict": bench_predict,
+    "e2e": bench_e2e,
+    "dashboard": bench_dashboard,
+    "app": bench_app,
+    "history": bench_history,
+    "spool": bench_spool,
+    "imports": bench_imports,
+}
+
+
+# --- Reporting ---
+def flatten(results, prefix=""):
+    metrics = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            metrics.update(flatten(value, name + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool) and \
+                name.endswith(("_per_s", "_ms", "_bytes")):
+            metrics[name] = value
+    return metrics
+
+
+def compare(metrics, baseline, tolerance):
+    # -> [(name, baseline, current, relative change)] for metrics that got worse
+    regressions = []
+    for name, current in metrics.items():
+        old = baseline.get(name)
+        if not old:
+            continue
+        change = (current - old) / old
+        worse = -change if name.endswith("_per_s") else change
+        if worse > tolerance:
+            regressions.append((name, old, current, change))
+    return regressions
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SpaceScout performance benchmarks")
+    parser.add_argument("--suite", nargs="*", choices=list(SUITES), default=list(SUITES))
+    parser.add_argument("--model", default=MODEL_SOURCE, help="model registry directory or .pkl")
+    parser.add_argument("--out", default=RESULTS_PATH)
+    parser.add_argument("--quick", action="store_true", help="smaller inputs, for a fast check")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--room-counts", type=int, nargs="*", default=ROOM_COUNTS)
+    parser.add_argument("--sample-interval", type=float, default=0.1, help="e2e: seconds between lines per room")
+    parser.add_argument("--aggregate-every", type=float, default=1.0, help="e2e: seconds between predictions")
+    parser.add_argument("--flush-interval", type=float, default=0.1, help="e2e: writer flush interval")
+    parser.add_argument("--rtt", type=float, default=HISTORY_RTT, help="history: simulated round trip per read")
+    parser.add_argument("--baseline", help="earlier results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=REGRESSION_TOLERANCE)
+    parser.add_argument("--import-budget", type=float, default=IMPORT_BUDGET_MS, help="imports: budget in ms")
+    parser.add_argument("--first-run-budget", type=float, default=FIRST_RUN_BUDGET_MS,
+                        help="imports: budget for the page's first run in ms")
+    args = parser.parse_args()
+
+    results = {}
+    for name in args.suite:
+        print(f"⏱️ {name} ...", file=sys.stderr, flush=True)
+        start = time.perf_counter()
+        results[name] = SUITES[name](args)
+        print(f"   done in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+
+    metrics = flatten(results)
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "quick": args.quick,
+        },
+        "results": results,
+        "metrics": metrics,
+    }
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(metrics, indent=2))
+    print(f"📄 Results written to {args.out}", file=sys.stderr)
+
+    # Hard limits checked by the suites themselves (the import budget)
+    failures = [f"{name}: {failure}" for name, result in results.items() for failure in result.get("failures", [])]
+    for failure in failures:
+        print(f"❌ {failure}", file=sys.stderr)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f).get("metrics", {})
+        regressions = compare(metrics, baseline, args.tolerance)
+        for name, old, current, change in regressions:
+            print(f"📉 {name}: {old} -> {current} ({change:+.0%})", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print(f"✅ No regressions beyond {args.tolerance:.0%} against {args.baseline}", file=sys.stderr)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+import os
+import sys
+import time
+import uuid
+from datetime import datetime
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from pyarrow import fs
+
+# Columnar store for collected crowdiness rows, replacing the rewrite-on-exit CSV.
+#
+#   dataset/room=<room_id>/date=<YYYY-MM-DD>/part-<HHMMSS>-<id>.parquet
+#
+# - Append-only: a flush writes a new part file (tmp + rename), existing files are
+#   never rewritten, so appending costs O(new rows) and a crash loses at most the
+#   rows since the last flush.
+# - Reads go through pyarrow.dataset over memory-mapped files with column
+#   projection; a timestamp range prunes whole room/day directories first and then
+#   row groups via Parquet statistics.
+# - compact() merges a finished day's parts into one file to keep the file count low.
+
+DATASET_ROOT = "dataset"
+FLUSH_ROWS = 6            # 6 aggregates = one minute at AGGREGATE_EVERY=10
+FLUSH_SECONDS = 60
+ROW_GROUP_ROWS = 64_000
+DAY_FORMAT = "%Y-%m-%d"
+
+SCHEMA = pa.schema([
+    ("timestamp", pa.timestamp("us")),
+    ("motion_rate", pa.float32()),
+    ("avg_sound", pa.float32()),
+    ("avg_co2", pa.float32()),
+    ("crowdiness_index", pa.float32()),
+    ("model_version", pa.string()),     # Null in rows collected before the model registry
+])
+PARTITIONING = ds.partitioning(pa.schema([("room", pa.string()), ("date", pa.string())]), flavor="hive")
+
+
+def partition_dir(root, room_id, day):
+    return os.path.join(root, f"room={room_id}", f"date={day}")
+
+
+def _as_datetime(value):
+    return datetime.fromisoformat(value) if isinstance(value, str) else value
+
+
+def _write_part(root, room_id, day, table):
+    directory = partition_dir(root, room_id, day)
+    os.makedirs(directory, exist_ok=True)
+    name = f"part-{datetime.now().strftime('%H%M%S')}-{uuid.uuid4().hex[:8]}.parquet"
+    path = os.path.join(directory, name)
+    tmp_path = os.path.join(directory, "." + name + ".tmp")
+    pq.write_table(table, tmp_path, row_group_size=ROW_GROUP_ROWS, compression="zstd")
+    os.replace(tmp_path, path)
+    return path
+
+
+# --- Writing ---
+class DatasetWriter:
+    def __init__(self, room_id, root=DATASET_ROOT, flush_rows=FLUSH_ROWS, flush_seconds=FLUSH_SECONDS):
+        self.room_id = room_id
+        self.root = root
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_seconds
+        self.rows = []
+        self.last_flush = time.monotonic()
+        self.stats = {"rows": 0, "files": 0}
+
+    def append(self, row):
+        # row: {"timestamp": datetime or ISO string, "motion_rate": .., ..., "crowdiness_index": ..}
+        self.rows.append(row)
+        if len(self.rows) >= self.flush_rows or time.monotonic() - self.last_flush >= self.flush_seconds:
+            self.flush()
+
+    def flush(self):
+        self.last_flush = time.monotonic()
+        if not self.rows:
+            return 0
+        rows, self.rows = self.rows, []
+
+        # One part per day, so rows around midnight land in the right partition
+        by_day = {}
+        for row in rows:
+            moment = _as_datetime(row["timestamp"])
+            by_day.setdefault(moment.strftime(DAY_FORMAT), []).append(dict(row, timestamp=moment))
+        for day, day_rows in by_day.items():
+            table = pa.Table.from_pylist(day_rows, schema=SCHEMA)
+            _write_part(self.root, self.room_id, day, table)
+            self.stats["files"] += 1
+        self.stats["rows"] += len(rows)
+        return len(rows)
+
+    def close(self):
+        return self.flush()
+
+
+# --- Reading ---
+def open_dataset(root=DATASET_ROOT):
+    filesystem = fs.LocalFileSystem(use_mmap=True)
+    # Explicit schema: older part files without a column read it as nulls
+    schema = pa.unify_schemas([SCHEMA, PARTITIONING.schema])
+    return ds.dataset(root, schema=schema, format="parquet", partitioning=PARTITIONING, filesystem=filesystem,
+                      exclude_invalid_files=False, ignore_prefixes=[".", "_"])
+
+
+def build_filter(rooms=None, start=None, end=None):
+    # start is exclusive (rows newer than a checkpoint), end inclusive
+    conditions = []
+    if rooms is not None:
+        conditions.append(ds.field("room").isin(list(rooms)))
+    if start is not None:
+        start = _as_datetime(start)
+        conditions.append(ds.field("date") >= start.strftime(DAY_FORMAT))
+        conditions.append(ds.field("timestamp") > pa.scalar(start, pa.timestamp("us")))
+    if end is not None:
+        end = _as_datetime(end)
+        conditions.append(ds.field("date") <= end.strftime(DAY_FORMAT))
+        conditions.append(ds.field("timestamp") <= pa.scalar(end, pa.timestamp("us")))
+    if not conditions:
+        return None
+    expression = conditions[0]
+    for condition in conditions[1:]:
+        expression = expression & condition
+    return expression
+
+
+def read_table(root=DATASET_ROOT, columns=None, rooms=None, start=None, end=None):
+    # pyarrow Table of the requested columns ("room"/"date" come from the partition path)
+    if not os.path.isdir(root):
+        names = columns or SCHEMA.names
+        return pa.table({name: pa.array([], SCHEMA.field(name).type if name in SCHEMA.names else pa.string())
+                         for name in names})
+    return open_dataset(root).to_table(columns=columns, filter=build_filter(rooms, start, end))
+
+
+def read_pandas(root=DATASET_ROOT, columns=None, rooms=None, start=None, end=None):
+    return read_table(root, columns, rooms, start, end).to_pandas()
+
+
+def rooms(root=DATASET_ROOT):
+    if not os.path.isdir(root):
+        return []
+    return sorted(name.split("=", 1)[1] for name in os.listdir(root) if name.startswith("room="))
+
+
+# --- Maintenance ---
+def compact(room_id, day, root=DATASET_ROOT):
+    # Merge a day's part files into one, sorted by timestamp; returns the number merged
+    directory = partition_dir(root, room_id, day)
+    parts = sorted(
+        os.path.join(directory, name) for name in os.listdir(directory)
+        if name.endswith(".parquet") and not name.startswith(".")
+    ) if os.path.isdir(directory) else []
+    if len(parts) < 2:
+        return 0
+    table = pa.concat_tables(pq.read_table(path, memory_map=True, schema=SCHEMA) for path in parts)
+    table = table.sort_by("timestamp")
+    _write_part(root, room_id, day, table)
+    for path in parts:
+        os.remove(path)
+    return len(parts)
+
+
+def compact_closed_days(root=DATASET_ROOT, before=None):
+    # Compact every partition older than `before` (default: today)
+    before = (before or datetime.now()).strftime(DAY_FORMAT)
+    merged = 0
+    for room_id in rooms(root):
+        room_dir = os.path.join(root, f"room={room_id}")
+        for name in sorted(os.listdir(room_dir)):
+            if name.startswith("date=") and name[5:] < before:
+                merged += compact(room_id, name[5:], root)
+    return merged
+
+
+def import_csv(csv_path, room_id, root=DATASET_ROOT, chunk_rows=100_000):
+    # One-off migration of a legacy crowdiness CSV into the store
+    import pandas as pd
+
+    total = 0
+    for chunk in pd.read_csv(csv_path, chunksize=chunk_rows):
+        chunk["timestamp"] = pd.to_datetime(chunk["timestamp"], format="ISO8601")
+        chunk = chunk.reindex(columns=SCHEMA.names)
+        for day, group in chunk.groupby(chunk["timestamp"].dt.strftime(DAY_FORMAT)):
+            table = pa.Table.from_pandas(group, schema=SCHEMA, preserve_index=False)
+            _write_part(root, room_id, day, table)
+            total += len(group)
+    return total
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    if command == "import" and len(sys.argv) >= 4:
+        count = import_csv(sys.argv[2], sys.argv[3])
+        print(f"✅ Imported {count} rows from {sys.argv[2]} into {DATASET_ROOT}/room={sys.argv[3]}")
+    elif command == "compact":
+        print(f"🗜️ Merged {compact_closed_days()} part files")
+    elif command == "info":
+        table = read_table(columns=["room", "timestamp"])
+        print(f"📦 {table.num_rows} rows in {len(rooms())} rooms: {', '.join(rooms())}")
+    else:
+        print("Usage: python dataset_store.py import <csv> <room_id> | compact | info")
@@ -1,16 +1,12 @@
-import firebase_admin
-from firebase_admin import credentials, db
+import storage
 
-# Firebase setup
-cred = credentials.Certificate("serviceAccountKey.json")
-firebase_admin.initialize_app(cred, {
-    'databaseURL': 'https://campus-spacescout-default-rtdb.europe-west1.firebasedatabase.app/'
-})
+# Database setup (SPACESCOUT_DB picks firebase/memory/sqlite, see storage.py)
+db = storage.connect()
 
 # Wipe old data
-print("🔥 Wiping Firebase...")
+print(f"🔥 Wiping {storage.backend_name()} database...")
 
-for path in ["rooms", "sessions", "live_data", "logs"]:
+for path in ["rooms", "sessions", "session_index", "rollups", "forecasts", "summary", "live_data", "logs"]:
     db.reference(path).delete()
     print(f"Deleted: {path}/")
 
@@ -46,4 +42,4 @@ sample_rooms = {
 
 db.reference("rooms").set(sample_rooms)
 
-print("✅ Firebase reset complete with 3 sample rooms.")
+print("✅ Database reset complete with 3 sample rooms.")
@@ -0,0 +1,161 @@
+import random
+import threading
+import time
+from collections import deque
+
+from rollup import dirty_marks
+
+# Background writer for Firebase. Ingest loops call write_point()/write_paths(),
+# which only append to a bounded in-memory queue; a daemon thread drains it every
+# flush_interval (or as soon as batch_size entries are waiting) and sends the whole
+# batch as ONE multi-location update() on the database root. Several readings for
+# the same live_data/{room} collapse to the newest, and failed flushes are retried
+# with exponential backoff while the loop keeps reading sensors.
+#
+# `database` is anything with a reference() function: firebase_admin.db in
+# production, local_db for offline runs and tests.
+
+FLUSH_INTERVAL = 1.0       # Seconds between flushes
+BATCH_SIZE = 500           # Paths per update() call
+MAX_QUEUE = 20000          # Pending paths before the oldest are dropped
+MAX_RETRIES = 5            # Attempts per batch before it is put back in the queue
+BACKOFF_BASE = 0.5         # Seconds, doubled on every failed attempt
+BACKOFF_MAX = 30.0
+
+
+def point_updates(room_id, session_id, timestamp_key, data_point, live=True, session=True):
+    # -> {path: value} for one data point: the session log and/or live_data
+    updates = {}
+    if session:
+        updates[f"sessions/{room_id}/{session_id}/data/{timestamp_key}"] = data_point
+    if live:
+        updates[f"live_data/{room_id}"] = data_point
+    return updates
+
+
+class BatchedWriter:
+    def __init__(self, database, flush_interval=FLUSH_INTERVAL, batch_size=BATCH_SIZE,
+                 max_queue=MAX_QUEUE, max_retries=MAX_RETRIES,
+                 backoff_base=BACKOFF_BASE, backoff_max=BACKOFF_MAX):
+        self.database = database
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_queue = max_queue
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self.queue = deque()
+        self.condition = threading.Condition()
+        self.stopping = False
+        self.thread = None
+
+        self.stats = {
+            "queued": 0,
+            "written": 0,
+            "dropped": 0,
+            "flushes": 0,
+            "failed_attempts": 0,
+            "last_flush_ms": 0.0,
+        }
+
+    # --- Producer side (never touches the network) ---
+    def write_paths(self, updates):
+        with self.condition:
+            for path, value in updates.items():
+                if len(self.queue) >= self.max_queue:
+                    self.queue.popleft()
+                    self.stats["dropped"] += 1
+                self.queue.append((path, value))
+                self.stats["queued"] += 1
+            if len(self.queue) >= self.batch_size:
+                self.condition.notify()
+
+    def write_point(self, room_id, session_id, timestamp_key, data_point, live=True, session=True):
+        updates = point_updates(room_id, session_id, timestamp_key, data_point, live, session)
+        if updates:
+            self.write_paths(updates)
+
+    def pending(self):
+        with self.condition:
+            return len(self.queue)
+
+    # --- Consumer side ---
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name="firebase-writer", daemon=True)
+            self.thread.start()
+        return self
+
+    def stop(self, timeout=10.0):
+        # Flush whatever is left, then let the thread exit
+        with self.condition:
+            self.stopping = True
+            self.condition.notify()
+        if self.thread is not None:
+            self.thread.join(timeout)
+            self.thread = None
+        else:
+            while self.pending() and self.flush():
+                pass
+
+    def _take_batch(self):
+        batch = {}
+        while self.queue and len(batch) < self.batch_size:
+            path, value = self.queue.popleft()
+            # Later writes to the same path win, like sequential set() calls would
+            batch.pop(path, None)
+            batch[path] = value
+        return batch
+
+    def _requeue(self, batch):
+        with self.condition:
+            room = self.max_queue - len(self.queue)
+            items = list(batch.items())
+            if len(items) > room:
+                self.stats["dropped"] += len(items) - room
+                items = items[len(items) - room:] if room > 0 else []
+            self.queue.extendleft(reversed(items))
+
+    def flush(self):
+        with self.condition:
+            batch = self._take_batch()
+        if not batch:
+            return True
+
+        delay = self.backoff_base
+        for attempt in range(self.max_retries):
+            try:
+                start = time.perf_counter()
+                # Marks are worked out per attempt: a retry may land after the minute closed
+                self.database.reference("/").update({**batch, **dirty_marks(batch)})
+                self.stats["last_flush_ms"] = (time.perf_counter() - start) * 1000
+                self.stats["written"] += len(batch)
+                self.stats["flushes"] += 1
+                return True
+            except Exception as e:
+                self.stats["failed_attempts"] += 1
+                print(f"⚠️ Firebase flush failed (attempt {attempt + 1}/{self.max_retries}): {e}")
+                if attempt + 1 == self.max_retries:
+                    break
+                time.sleep(delay * random.uniform(0.5, 1.0))
+                delay = min(delay * 2, self.backoff_max)
+
+        self._requeue(batch)
+        return False
+
+    def _run(self):
+        while True:
+            with self.condition:
+                if not self.stopping and len(self.queue) < self.batch_size:
+                    self.condition.wait(self.flush_interval)
+                stopping = self.stopping
+
+            if stopping:
+                # Drain, but give up on a batch that keeps failing
+                while self.pending() and self.flush():
+                    pass
+                return
+
+            while self.flush() and self.pending() >= self.batch_size:
+                pass
@@ -0,0 +1,385 @@
+import math
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+# Next-hour crowdiness forecasts ("will this room be free in 30 minutes?").
+#
+# One model for every room, trained on the collected history (dataset/ store, or
+# the legacy crowdiness_dataset.csv). Each row describes a room at time t:
+#
+#   target time of day and day of week (sin/cos), weekend flag, horizon (minutes),
+#   crowdiness over the last STEP, its change over TREND_MINUTES, and the room's
+#   typical crowdiness in that hour-of-week slot (profile)
+#
+# and the label is the crowdiness h minutes later, for every h in HORIZONS.
+#
+# ForecastJob runs in the background like rollup.py: every FORECAST_EVERY seconds
+# it reads each room's recent points (the same bounded tail HistoryStore keeps for
+# the dashboard), predicts all rooms x horizons in one call and writes
+#
+#   forecasts/{room} = {"generated_at": ISO, "crowdiness_index": {"15m": .., ..., "60m": ..}}
+#
+# Horizons where the model does not beat the no-change baseline on the holdout carry
+# the room's current value instead of a prediction.
+#
+# The dashboard only reads forecasts/ and interpolates to each room's walking
+# time (at_arrival), so forecasting costs it nothing per request.
+
+DATA_PATH = "dataset"
+LEGACY_CSV = "crowdiness_dataset.csv"
+MODEL_PATH = "forecast_model.joblib"
+HORIZONS = [15, 30, 45, 60]       # Minutes ahead
+STEP = 5                          # Minutes per grid step; horizons and trend are multiples
+TREND_MINUTES = 10
+PROFILE_SLOTS = 7 * 24            # Hour-of-week slots
+FORECAST_EVERY = 60               # Seconds between job runs
+MAX_AGE = 10 * 60                 # Seconds before the dashboard ignores a forecast
+N_ESTIMATORS = 60
+MIN_SAMPLES_LEAF = 5
+HOLDOUT_DAYS = 7                  # Most recent history kept out of training for the report
+HOLDOUT_SHARE = 0.2               # Or the newest share of samples, when that is shorter
+FEATURE_NAMES = [
+    "tod_sin", "tod_cos", "dow_sin", "dow_cos", "weekend",
+    "horizon", "current", "trend", "profile",
+]
+
+
+def horizon_key(minutes):
+    # "15m" rather than "15": numeric keys can turn a Firebase node into a list
+    return f"{minutes}m"
+
+
+def slot_of(moment):
+    return moment.weekday() * 24 + moment.hour
+
+
+def feature_rows(targets, horizons, current, trend, profile):
+    # targets: target datetimes; the other arguments are sequences of the same length
+    n = len(targets)
+    minutes = np.array([t.hour * 60 + t.minute for t in targets], dtype=np.float64)
+    weekday = np.array([t.weekday() for t in targets], dtype=np.float64)
+    X = np.empty((n, len(FEATURE_NAMES)), dtype=np.float32)
+    X[:, 0] = np.sin(2 * np.pi * minutes / 1440)
+    X[:, 1] = np.cos(2 * np.pi * minutes / 1440)
+    X[:, 2] = np.sin(2 * np.pi * weekday / 7)
+    X[:, 3] = np.cos(2 * np.pi * weekday / 7)
+    X[:, 4] = weekday >= 5
+    X[:, 5] = horizons
+    X[:, 6] = current
+    X[:, 7] = trend
+    X[:, 8] = profile
+    return X
+
+
+# --- Profiles: typical crowdiness per room and hour of week ---
+class Profiles:
+    def __init__(self, rooms, fallback, overall):
+        self.rooms = rooms          # room_id -> float array [PROFILE_SLOTS], NaN = no data
+        self.fallback = fallback    # Every room pooled, same shape
+        self.overall = overall
+
+    @classmethod
+    def from_frame(cls, frame):
+        # frame: columns room, timestamp, crowdiness_index
+        slots = frame["timestamp"].dt.weekday * 24 + frame["timestamp"].dt.hour
+        rooms = {}
+        for room_id, means in frame.groupby([frame["room"], slots])["crowdiness_index"].mean().groupby(level=0):
+            profile = np.full(PROFILE_SLOTS, np.nan)
+            profile[means.index.get_level_values(1)] = means.to_numpy()
+            rooms[room_id] = profile
+        fallback = np.full(PROFILE_SLOTS, np.nan)
+        pooled = frame.groupby(slots)["crowdiness_index"].mean()
+        fallback[pooled.index] = pooled.to_numpy()
+        return cls(rooms, fallback, float(frame["crowdiness_index"].mean()))
+
+    def lookup(self, room_id, moment):
+        slot = slot_of(moment)
+        for table in (self.rooms.get(room_id), self.fallback):
+            if table is not None and not math.isnan(table[slot]):
+                return float(table[slot])
+        return self.overall
+
+
+# --- Training ---
+def load_history(path, csv_room="room01"):
+    # -> DataFrame(room, timestamp, crowdiness_index)
+    import pandas as pd
+
+    import dataset_store
+
+    if path.endswith(".csv"):
+        frame = pd.read_csv(path, usecols=["timestamp", "crowdiness_index"])
+        frame["timestamp"] = pd.to_datetime(frame["timestamp"], format="ISO8601")
+        frame["room"] = csv_room
+    else:
+        frame = dataset_store.read_pandas(path, columns=["room", "timestamp", "crowdiness_index"])
+    return frame.dropna(subset=["crowdiness_index"])
+
+
+def build_training_set(frame, profiles):
+    # Every room resampled to STEP-minute means; gaps stay gaps (no rows across them)
+    step = f"{STEP}min"
+    trend_steps = TREND_MINUTES // STEP
+    X_parts, y_parts = [], []
+    for room_id, room in frame.groupby("room"):
+        grid = room.set_index("timestamp")["crowdiness_index"].resample(step).mean()
+        # A step's mean is known at its end
+        ends = grid.index + grid.index.freq
+        current = grid.to_numpy()
+        trend = current - grid.shift(trend_steps).to_numpy()
+        for horizon in HORIZONS:
+            target = grid.shift(-(horizon // STEP)).to_numpy()
+            valid = ~(np.isnan(current) | np.isnan(trend) | np.isnan(target))
+            if not valid.any():
+                continue
+            at = [end.to_pydatetime() + timedelta(minutes=horizon) for end in ends[valid]]
+            X_parts.append(feature_rows(
+                at, np.full(len(at), horizon), current[valid], trend[valid],
+                [profiles.lookup(room_id, moment) for moment in at],
+            ))
+            y_parts.append(target[valid].astype(np.float32))
+    if not X_parts:
+        return np.empty((0, len(FEATURE_NAMES)), dtype=np.float32), np.empty(0, dtype=np.float32)
+    return np.concatenate(X_parts), np.concatenate(y_parts)
+
+
+def split_by_time(frame, holdout_days=HOLDOUT_DAYS, holdout_share=HOLDOUT_SHARE):
+    # -> (train, test): the test part is the last holdout_days of history, or the
+    # newest holdout_share of the samples for short histories, so the report scores
+    # forecasts of a period the model and the profiles have not seen, as in production
+    cutoff = max(frame["timestamp"].max() - timedelta(days=holdout_days),
+                 frame["timestamp"].quantile(1 - holdout_share))
+    return frame[frame["timestamp"] < cutoff], frame[frame["timestamp"] >= cutoff]
+
+
+def fit_model(X, y, n_estimators):
+    from sklearn.ensemble import RandomForestRegressor
+
+    model = RandomForestRegressor(n_estimators=n_estimators, min_samples_leaf=MIN_SAMPLES_LEAF,
+                                  random_state=42, n_jobs=-1)
+    return model.fit(X, y)
+
+
+def train(path, model_path=MODEL_PATH, n_estimators=N_ESTIMATORS, csv_room="room01"):
+    import joblib
+    from sklearn.metrics import mean_absolute_error
+
+    frame = load_history(path, csv_room)
+    train_frame, test_frame = split_by_time(frame)
+    # Profiles are a feature, so they come from the training period only as well
+    train_profiles = Profiles.from_frame(train_frame)
+    X_train, y_train = build_training_set(train_frame, train_profiles)
+    X_test, y_test = build_training_set(test_frame, train_profiles)
+    if len(y_train) < 10 or not len(y_test):
+        raise ValueError(f"Only {len(y_train)} training / {len(y_test)} test rows in {path}; "
+                         f"collect more history first")
+
+    model = fit_model(X_train, y_train, n_estimators)
+    y_pred = model.predict(X_test)
+
+    # Baseline: "it stays as it is now"
+    current = X_test[:, FEATURE_NAMES.index("current")]
+    horizons = X_test[:, FEATURE_NAMES.index("horizon")]
+    report = {}
+    for horizon in HORIZONS:
+        mask = horizons == horizon
+        if mask.any():
+            report[horizon_key(horizon)] = {
+                "mae": round(float(mean_absolute_error(y_test[mask], y_pred[mask])), 4),
+                "persistence_mae": round(float(mean_absolute_error(y_test[mask], current[mask])), 4),
+            }
+
+    # A horizon is only forecast where the model beats "it stays as it is now" on the
+    # holdout; for the others the job publishes the current value, which is what the
+    # baseline predicts. A model that beats it nowhere is not saved at all.
+    horizons = [h for h in HORIZONS if horizon_key(h) in report
+                and report[horizon_key(h)]["mae"] < report[horizon_key(h)]["persistence_mae"]]
+    if not horizons:
+        raise ValueError(f"The forecast does not beat the no-change baseline at any horizon "
+                         f"({report}); {model_path} not written")
+
+    # The report is settled; the shipped model learns from the whole history, the
+    # most recent weeks included
+    profiles = Profiles.from_frame(frame)
+    X, y = build_training_set(frame, profiles)
+    model = fit_model(X, y, n_estimators)
+    model.set_params(n_jobs=None)
+    artifact = {
+        "model": model,
+        "profiles": vars(profiles),     # Plain data, so loading never needs this module's classes
+        "horizons": horizons,
+        "baseline_horizons": [h for h in HORIZONS if h not in horizons],
+        "trained_at": datetime.now().isoformat(),
+        "rows": int(len(y)),
+        "holdout_from": test_frame["timestamp"].min().isoformat(),
+        "report": report,
+    }
+    tmp_path = model_path + ".tmp"
+    joblib.dump(artifact, tmp_path)
+    os.replace(tmp_path, model_path)
+    return artifact
+
+
+# --- Live features from recent points ---
+def recent_features(points, now):
+    # points: recent data points (oldest first, one per aggregate, e.g. from
+    # HistoryStore.window). -> (current, trend) or None when there is too little data
+    now_step = now - timedelta(minutes=STEP)
+    then_end = now - timedelta(minutes=TREND_MINUTES)
+    then_start = then_end - timedelta(minutes=STEP)
+    recent, earlier = [], []
+    for point in points:
+        value = point.get("crowdiness_index")
+        if not isinstance(value, (int, float)):
+            continue
+        moment = datetime.fromisoformat(point["timestamp"])
+        if moment >= now_step:
+            recent.append(value)
+        elif then_start <= moment < then_end:
+            earlier.append(value)
+    if not recent:
+        return None
+    current = sum(recent) / len(recent)
+    # No data from TREND_MINUTES ago (room just came online): assume flat
+    trend = current - sum(earlier) / len(earlier) if earlier else 0.0
+    return current, trend
+
+
+class ForecastJob:
+    def __init__(self, database, history_store, model_path=MODEL_PATH):
+        self.database = database
+        self.history_store = history_store
+        self.model_path = model_path
+        self.artifact = None
+        self.loaded_mtime = None
+        self.stats = {"runs": 0, "rooms_forecast": 0, "rooms_skipped": 0, "model_loads": 0}
+
+    def _load_model(self):
+        # Picks up a retrained model without restarting the job
+        import joblib
+
+        mtime = os.path.getmtime(self.model_path)
+        if mtime != self.loaded_mtime:
+            self.artifact = joblib.load(self.model_path)
+            self.loaded_mtime = mtime
+            self.stats["model_loads"] += 1
+        return self.artifact
+
+    def run(self, room_ids, now=None):
+        artifact = self._load_model()
+        profiles = Profiles(**artifact["profiles"])
+        horizons = artifact["horizons"]
+        baseline_horizons = artifact.get("baseline_horizons", [])
+        now = now or datetime.now()
+        minutes = STEP + TREND_MINUTES
+
+        due, currents, targets, horizon_col, current_col, trend_col, profile_col = [], [], [], [], [], [], []
+        for room_id in room_ids:
+            _, points = self.history_store.window(room_id, minutes, now=now)
+            features = recent_features(points, now)
+            if features is None:
+                self.stats["rooms_skipped"] += 1
+                continue
+            due.append(room_id)
+            currents.append(features[0])
+            for horizon in horizons:
+                at = now + timedelta(minutes=horizon)
+                targets.append(at)
+                horizon_col.append(horizon)
+                current_col.append(features[0])
+                trend_col.append(features[1])
+                profile_col.append(profiles.lookup(room_id, at))
+
+        if not due:
+            return 0
+        # Every room and horizon in one predict call
+        X = feature_rows(targets, horizon_col, current_col, trend_col, profile_col)
+        predictions = np.clip(artifact["model"].predict(X), 0.0, 1.0).reshape(len(due), len(horizons))
+
+        generated_at = now.isoformat()
+        updates = {}
+        for room_id, current, row in zip(due, currents, predictions):
+            values = {horizon_key(h): round(float(p), 3) for h, p in zip(horizons, row)}
+            # Horizons where the model lost to the no-change baseline carry the current value
+            values.update({horizon_key(h): round(float(current), 3) for h in baseline_horizons})
+            updates[f"forecasts/{room_id}"] = {
+                "generated_at": generated_at,
+                "crowdiness_index": values,
+            }
+        self.database.reference("/").update(updates)
+        self.stats["runs"] += 1
+        self.stats["rooms_forecast"] += len(due)
+        return len(due)
+
+
+# --- Dashboard side ---
+def at_arrival(forecast, current, minutes, now=None):
+    # Crowdiness expected `minutes` from now: linear between the current value (0 min)
+    # and the forecast horizons, held after the last one. Falls back to `current`
+    # without a fresh forecast.
+    if not forecast or current is None:
+        return current
+    generated_at = forecast.get("generated_at")
+    values = forecast.get("crowdiness_index") or {}
+    if not generated_at or not values:
+        return current
+    age = ((now or datetime.now()) - datetime.fromisoformat(generated_at)).total_seconds()
+    if age > MAX_AGE:
+        return current
+
+    # Horizons count from generated_at; the ones already passed are dropped
+    ahead = ((float(key.rstrip("m")) - age / 60, value) for key, value in values.items())
+    points = [(0.0, current)] + sorted(p for p in ahead if p[0] > 0)
+    if minutes <= 0:
+        return current
+    for (m0, v0), (m1, v1) in zip(points, points[1:]):
+        if minutes <= m1:
+            return v0 + (v1 - v0) * (minutes - m0) / (m1 - m0)
+    return points[-1][1]
+
+
+# --- CLI ---
+# python forecast.py train [dataset|file.csv]   fit forecast_model.joblib
+# python forecast.py run [--once]               refresh forecasts/ every FORECAST_EVERY s
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    if command == "train":
+        path = sys.argv[2] if len(sys.argv) > 2 else DATA_PATH
+        if path == DATA_PATH and not os.path.isdir(DATA_PATH) and os.path.exists(LEGACY_CSV):
+            print(f"ℹ️ No {DATA_PATH}/ store yet, reading {LEGACY_CSV}")
+            path = LEGACY_CSV
+        try:
+            artifact = train(path)
+        except ValueError as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+        print(f"📦 Forecast model saved as {MODEL_PATH} ({artifact['rows']} rows), "
+              f"scored on the history from {artifact['holdout_from']}:")
+        for key, scores in artifact["report"].items():
+            dropped = "  -> no-change baseline" if int(key[:-1]) in artifact["baseline_horizons"] else ""
+            print(f"   {key:>4}  MAE {scores['mae']:.3f}  (no-change baseline {scores['persistence_mae']:.3f}){dropped}")
+    elif command == "run":
+        import storage
+        from history import HistoryStore
+
+        db = storage.connect()
+        job = ForecastJob(db, HistoryStore(db))
+        once = "--once" in sys.argv
+        while True:
+            start = time.monotonic()
+            room_ids = sorted(db.reference("rooms").get(shallow=True) or {})
+            try:
+                job.run(room_ids)
+            except FileNotFoundError:
+                print(f"⚠️ {MODEL_PATH} not found — run: python forecast.py train")
+            print(f"🔮 Forecast pass over {len(room_ids)} rooms: {job.stats}")
+            if once:
+                break
+            time.sleep(max(0.0, FORECAST_EVERY - (time.monotonic() - start)))
+    else:
+        print("Usage: python forecast.py train [dataset|file.csv] | run [--once]")
+        sys.exit(1)
@@ -0,0 +1,182 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+from publish_policy import HOLD_SECONDS, expand_steps
+
+# Bounded, incremental access to sessions/{room}/{session}/data for the
+# "Crowdiness Over Time" chart.
+#
+# - The latest session comes from the small session_index/{room} pointer written
+#   by the ingest scripts; without one, a shallow read lists session ids only.
+# - Data keys are "%Y%m%d%H%M%S" timestamps, so a time window is an
+#   order_by_key().start_at(...) query and "All" is a limit_to_last(...) query.
+# - A per-room tail cache, shared by every session of the server process, keeps
+#   what was already fetched; each refresh only asks for keys after the newest one.
+# - Long windows read the rollups/{room}/{resolution} buckets written by rollup.py.
+# - Stored points are delta-encoded (see publish_policy.py): window() reads from
+#   HOLD_SECONDS before the window so a value held into it is not lost, and returns
+#   the series expanded back to one point per aggregate.
+
+KEY_FORMAT = "%Y%m%d%H%M%S"
+MAX_POINTS = 5000           # Cap for "All" and for each cached tail
+REFRESH_EVERY = 5.0         # Seconds before a tail is asked for new points again
+
+
+def timestamp_key(moment):
+    return moment.strftime(KEY_FORMAT)
+
+
+def session_index_path(room_id):
+    return f"session_index/{room_id}"
+
+
+def session_index_entry(session_id, started_at):
+    # Written by the ingest scripts when a session starts
+    return {"latest": session_id, "started_at": started_at}
+
+
+class RoomTail:
+    def __init__(self, session_id):
+        self.session_id = session_id
+        self.points = {}          # key -> data point, in key order
+        self.covers_from = None   # Every key >= this has been fetched; None = whole session
+        self.fetched_at = 0.0     # 0 until the first fetch
+        self.lock = threading.Lock()
+
+    @property
+    def last_key(self):
+        return next(reversed(self.points), None)
+
+    def merge(self, new_points, prepend=False):
+        if prepend:
+            merged = dict(new_points)
+            merged.update(self.points)
+            self.points = merged
+        else:
+            self.points.update(new_points)
+
+        if len(self.points) > MAX_POINTS:
+            keys = list(self.points)
+            for key in keys[:-MAX_POINTS]:
+                del self.points[key]
+            self.covers_from = keys[-MAX_POINTS]
+
+
+class HistoryStore:
+    def __init__(self, database, pointer_cache=None):
+        self.database = database
+        self.pointer_cache = pointer_cache
+        self.tails = {}
+        self.lock = threading.Lock()
+        self.stats = {"pointer_reads": 0, "range_reads": 0, "points_fetched": 0}
+
+    # --- Latest session ---
+    def _read_latest_session(self, room_id):
+        self.stats["pointer_reads"] += 1
+        entry = self.database.reference(session_index_path(room_id)).get()
+        if isinstance(entry, dict) and entry.get("latest"):
+            return entry["latest"]
+        # Older data without a pointer: list session ids only, never their points
+        session_ids = self.database.reference(f"sessions/{room_id}").get(shallow=True) or {}
+        return max(session_ids) if session_ids else None
+
+    def latest_session(self, room_id):
+        if self.pointer_cache is None:
+            return self._read_latest_session(room_id)
+        return self.pointer_cache.get("session_index", room_id, lambda: self._read_latest_session(room_id))
+
+    # --- Points ---
+    def _data_query(self, room_id, session_id):
+        return self.database.reference(f"sessions/{room_id}/{session_id}/data").order_by_key()
+
+    def _fetch(self, query):
+        points = query.get() or {}
+        self.stats["range_reads"] += 1
+        self.stats["points_fetched"] += len(points)
+        return dict(sorted(points.items()))
+
+    def _tail(self, room_id, session_id):
+        with self.lock:
+            tail = self.tails.get(room_id)
+            if tail is None or tail.session_id != session_id:
+                tail = self.tails[room_id] = RoomTail(session_id)
+            return tail
+
+    def _range(self, room_id, session_id, start_key=None, end_key=None):
+        # Keys in [start_key, end_key]; without a start, only the newest MAX_POINTS
+        query = self._data_query(room_id, session_id)
+        if start_key is not None:
+            query = query.start_at(start_key)
+        if end_key is not None:
+            query = query.end_at(end_key)
+        if start_key is None:
+            query = query.limit_to_last(MAX_POINTS)
+        points = self._fetch(query)
+        if start_key is None and len(points) >= MAX_POINTS:
+            start_key = next(iter(points))
+        return points, start_key
+
+    def window(self, room_id, minutes=None, now=None):
+        # -> (session_id, [data points oldest first]) for the last `minutes` (None = all, capped)
+        session_id = self.latest_session(room_id)
+        if session_id is None:
+            return None, []
+
+        now = now or datetime.now()
+        window_start = now - timedelta(minutes=minutes) if minutes else None
+        start_key = timestamp_key(window_start - timedelta(seconds=HOLD_SECONDS)) if minutes else None
+        tail = self._tail(room_id, session_id)
+
+        with tail.lock:
+            if not tail.fetched_at:
+                points, tail.covers_from = self._range(room_id, session_id, start_key)
+                tail.merge(points)
+                tail.fetched_at = time.monotonic()
+
+            elif (tail.covers_from is not None and len(tail.points) < MAX_POINTS
+                  and (start_key is None or start_key < tail.covers_from)):
+                # Wider window than before: fetch only the missing range in front
+                points, tail.covers_from = self._range(room_id, session_id, start_key, tail.covers_from)
+                tail.merge(points, prepend=True)
+
+            elif time.monotonic() - tail.fetched_at >= REFRESH_EVERY:
+                # New points since the last refresh
+                last_key = tail.last_key
+                points, _ = self._range(room_id, session_id, last_key or tail.covers_from)
+                points.pop(last_key, None)
+                tail.merge(points)
+                tail.fetched_at = time.monotonic()
+
+            if start_key is None:
+                points = list(tail.points.values())
+            else:
+                points = [point for key, point in tail.points.items() if key >= start_key]
+
+        points = expand_steps(points, until=now)
+        if window_start is not None:
+            start = window_start.isoformat()
+            points = [point for point in points if point["timestamp"] >= start]
+        return session_id, points[-MAX_POINTS:]
+
+    # --- Rollups (see rollup.py) ---
+    def _read_rollups(self, room_id, resolution, minutes, now):
+        start_key = timestamp_key((now or datetime.now()) - timedelta(minutes=minutes))
+        query = self.database.reference(f"rollups/{room_id}/{resolution}").order_by_key().start_at(start_key)
+        return list(self._fetch(query).values())
+
+    def rollup_window(self, room_id, resolution, minutes, now=None):
+        # Closed buckets of `resolution` for the last `minutes`, oldest first
+        if self.pointer_cache is None:
+            return self._read_rollups(room_id, resolution, minutes, now)
+        return self.pointer_cache.get(
+            "rollups", (room_id, resolution, minutes),
+            lambda: self._read_rollups(room_id, resolution, minutes, now),
+        )
+
+    def invalidate(self, room_id=None):
+        with self.lock:
+            if room_id is None:
+                self.tails.clear()
+            else:
+                self.tails.pop(room_id, None)
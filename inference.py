@@ -0,0 +1,208 @@
+import os
+import sys
+import time
+import warnings
+
+import joblib
+import numpy as np
+
+# Batched crowdiness inference. Callers hand over one feature row per room that is
+# due this tick and get every prediction back from a single call on a contiguous
+# float array — no one-row DataFrames, no per-room sklearn overhead.
+#
+# Two evaluators sit behind InferenceEngine:
+# - the fitted trees' compiled predict, called directly on a float32 array, which
+#   skips RandomForestRegressor.predict's validation and joblib dispatch;
+# - FlatForest, an exported copy of the forest as flat NumPy node arrays that walks
+#   every (room, tree) pair level by level. It wins for a handful of rooms and
+#   only needs NumPy, so gateways can score from the .npz without scikit-learn.
+
+FEATURES = ["motion_rate", "avg_sound", "avg_co2"]
+MODEL_PATH = "owl_model.pkl"
+FLAT_MAX_ROWS = 32  # Above this the compiled tree path is faster
+
+
+def flat_path_for(model_path):
+    return os.path.splitext(model_path)[0] + ".flat.npz"
+
+
+def as_feature_array(rows):
+    # Accepts an (n, 3) array, a list of (motion, sound, co2) tuples or feature dicts
+    if isinstance(rows, np.ndarray):
+        return np.ascontiguousarray(rows, dtype=np.float64).reshape(-1, len(FEATURES))
+    rows = list(rows)
+    if rows and isinstance(rows[0], dict):
+        rows = [[row[f] for f in FEATURES] for row in rows]
+    return np.asarray(rows, dtype=np.float64).reshape(-1, len(FEATURES))
+
+
+class FlatForest:
+    def __init__(self, feature, threshold, left, right, value, roots, max_depth):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.max_depth = int(max_depth)
+
+    @classmethod
+    def from_model(cls, model):
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            n = tree.node_count
+            left = tree.children_left.astype(np.int64)
+            right = tree.children_right.astype(np.int64)
+            leaf = left == -1
+            own = np.arange(n, dtype=np.int64)
+
+            # Leaves point back at themselves, which is how predict() spots them
+            features.append(np.where(leaf, 0, tree.feature).astype(np.int64))
+            thresholds.append(np.where(leaf, np.inf, tree.threshold))
+            lefts.append(np.where(leaf, own, left) + offset)
+            rights.append(np.where(leaf, own, right) + offset)
+            values.append(tree.value[:, 0, 0].astype(np.float64))
+            roots.append(offset)
+            offset += n
+            max_depth = max(max_depth, tree.max_depth)
+
+        return cls(
+            np.concatenate(features),
+            np.concatenate(thresholds),
+            np.concatenate(lefts),
+            np.concatenate(rights),
+            np.concatenate(values),
+            np.asarray(roots, dtype=np.int64),
+            max_depth,
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(
+                data["feature"], data["threshold"], data["left"], data["right"],
+                data["value"], data["roots"], data["max_depth"],
+            )
+
+    def save(self, path):
+        np.savez(
+            path,
+            feature=self.feature, threshold=self.threshold, left=self.left,
+            right=self.right, value=self.value, roots=self.roots,
+            max_depth=np.int64(self.max_depth),
+        )
+
+    def predict(self, X):
+        # sklearn trees compare float32 inputs against float64 thresholds; do the same
+        # so the flattened forest returns the same predictions
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        n_rows, n_features = X.shape
+        n_trees = len(self.roots)
+        if not n_rows:
+            return np.empty(0)
+
+        flat_x = X.ravel()
+        node = np.tile(self.roots, n_rows)
+        row_base = np.repeat(np.arange(n_rows) * n_features, n_trees)
+        is_leaf = self.left == np.arange(len(self.left))
+
+        # Only (room, tree) pairs that have not reached a leaf are advanced
+        active = np.flatnonzero(~is_leaf[node])
+        for _ in range(self.max_depth):
+            if not active.size:
+                break
+            current = node[active]
+            go_left = flat_x[row_base[active] + self.feature[current]] <= self.threshold[current]
+            following = np.where(go_left, self.left[current], self.right[current])
+            node[active] = following
+            active = active[~is_leaf[following]]
+        return self.value[node].reshape(n_rows, n_trees).mean(axis=1)
+
+
+class InferenceEngine:
+    def __init__(self, model=None, flat=None):
+        if model is None and flat is None:
+            raise ValueError("InferenceEngine needs a model or a flattened forest")
+        self.model = model
+        self.flat = flat
+        self.trees = [estimator.tree_ for estimator in getattr(model, "estimators_", [])]
+
+    @classmethod
+    def load(cls, model_path=MODEL_PATH, use_flat=True):
+        model = joblib.load(model_path)
+        flat = None
+        flat_path = flat_path_for(model_path)
+        if use_flat:
+            # Re-export if the flattened copy is missing or older than the pickle
+            if os.path.exists(flat_path) and os.path.getmtime(flat_path) >= os.path.getmtime(model_path):
+                flat = FlatForest.load(flat_path)
+            elif hasattr(model, "estimators_"):
+                flat = FlatForest.from_model(model)
+                try:
+                    flat.save(flat_path)
+                except OSError:
+                    pass
+        return cls(model, flat)
+
+    def predict_trees(self, X):
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        total = np.zeros(X.shape[0])
+        for tree in self.trees:
+            total += tree.predict(X).reshape(X.shape[0], -1)[:, 0]
+        return total / len(self.trees)
+
+    def predict_batch(self, rows):
+        X = as_feature_array(rows)
+        if self.flat is not None and (len(X) <= FLAT_MAX_ROWS or not self.trees):
+            return self.flat.predict(X)
+        if self.trees:
+            return self.predict_trees(X)
+        with warnings.catch_warnings():
+            # Model was fitted on a DataFrame; a plain array is intentional here
+            warnings.filterwarnings("ignore", message="X does not have valid feature names")
+            return self.model.predict(X)
+
+    def predict_rounded(self, rows):
+        return [round(float(p), 3) for p in self.predict_batch(rows)]
+
+    def predict_one(self, motion_rate, avg_sound, avg_co2):
+        return self.predict_rounded([(motion_rate, avg_sound, avg_co2)])[0]
+
+
+# --- CLI: export the flattened forest and check it against sklearn ---
+# python inference.py [owl_model.pkl] [n_rooms]
+if __name__ == "__main__":
+    model_path = sys.argv[1] if len(sys.argv) > 1 else MODEL_PATH
+    n_rooms = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+
+    model = joblib.load(model_path)
+    flat = FlatForest.from_model(model)
+    flat.save(flat_path_for(model_path))
+    print(f"📦 Exported {len(flat.roots)} trees / {len(flat.value)} nodes to {flat_path_for(model_path)}")
+
+    rng = np.random.default_rng(42)
+    X = np.column_stack([
+        rng.uniform(0, 1, n_rooms),
+        rng.uniform(30, 75, n_rooms),
+        rng.uniform(400, 1200, n_rooms),
+    ])
+
+    engine = InferenceEngine(model, flat)
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore", message="X does not have valid feature names")
+        expected = model.predict(X)
+
+    for label, predict in [
+        ("sklearn predict", lambda: model.predict(X)),
+        ("compiled trees", lambda: engine.predict_trees(X)),
+        ("flat forest", lambda: flat.predict(X)),
+    ]:
+        with warnings.catch_warnings():
+            warnings.filterwarnings("ignore", message="X does not have valid feature names")
+            start = time.perf_counter()
+            actual = predict()
+            elapsed_ms = (time.perf_counter() - start) * 1000
+        print(f"{label:<16} {elapsed_ms:8.1f} ms for {n_rooms} rooms  max |diff| {np.abs(expected - actual).max():.1e}")
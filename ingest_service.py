@@ -0,0 +1,334 @@
+import argparse
+import asyncio
+import json
+import os
+import signal
+import sys
+import time
+from datetime import datetime
+
+from Simulate_Serial import generate_fake_sensor_data
+from firebase_writer import BatchedWriter
+from history import session_index_entry, session_index_path
+from model_registry import ModelHandle
+from publish_policy import PublishPolicy
+from rolling_stats import SensorWindow
+from serial_protocol import FrameParser
+from spool import Spool, SpoolBusy, SpoolWriter, spool_dir
+import storage
+
+# CONFIG — defaults, overridable from the command line
+ROOMS_FILE = "rooms.json"
+MODEL_SOURCE = None          # models/ registry if published, else owl_model.pkl
+MODEL_CHECK_EVERY = 30      # Seconds between checks for a newly published model
+BUFFER_SECONDS = 300        # Rolling window per room (5 minutes at 1Hz)
+AGGREGATE_EVERY = 10        # Seconds between predictions
+MIN_SAMPLES = 10            # Samples needed before a room is published
+FLUSH_INTERVAL = 1.0        # Seconds between batched Firebase updates
+RECONNECT_DELAY = 5         # Seconds before a dead stream is reopened
+READ_CHUNK = 65536          # Bytes per read(); every complete frame in it is parsed at once
+
+
+# --- Room list ---
+# rooms.json:
+# {"rooms": [
+#     {"room_id": "room01", "source": {"type": "simulator", "mode": "CROWDED"}},
+#     {"room_id": "room02", "source": {"type": "command", "argv": ["python", "Simulate_Serial.py", "SPARSE"]}},
+#     {"room_id": "room03", "source": {"type": "pipe", "path": "/tmp/room03.fifo"}},
+#     {"room_id": "room04", "source": {"type": "serial", "port": "/dev/ttyUSB0", "baudrate": 9600}},
+#     {"room_id": "room05", "source": {"type": "socket", "host": "127.0.0.1", "port": 7000, "room": "room05"}}
+# ]}
+def load_room_config(path):
+    with open(path) as f:
+        config = json.load(f)
+    rooms = config["rooms"] if isinstance(config, dict) else config
+
+    seen = set()
+    for room in rooms:
+        room_id = room.get("room_id")
+        if not room_id:
+            raise ValueError(f"Room entry without room_id: {room}")
+        if room_id in seen:
+            raise ValueError(f"Duplicate room_id in {path}: {room_id}")
+        seen.add(room_id)
+        room.setdefault("source", {"type": "simulator"})
+    return rooms
+
+
+# --- Per-room state ---
+class RoomState:
+    def __init__(self, room_id, session_id):
+        self.room_id = room_id
+        self.session_root = f"sessions/{room_id}/{session_id}"
+
+        self.window = SensorWindow(BUFFER_SECONDS)
+        self.parser = FrameParser()
+
+        self.samples = 0
+        self.points = 0
+        self.last_sample_at = None
+        self.reported_errors = 0
+
+    def add_data(self, data):
+        samples = self.parser.feed(data)
+        if not samples:
+            return
+        append = self.window.append
+        for m, s, c in samples:
+            append(m, s, c)
+        self.samples += len(samples)
+        self.last_sample_at = time.time()
+
+    def new_errors(self):
+        # Malformed/corrupt frames and sequence gaps since the last call
+        stats = self.parser.stats()
+        errors = stats["malformed"] + stats["checksum_errors"] + stats["dropped"]
+        fresh = errors - self.reported_errors
+        self.reported_errors = errors
+        return fresh
+
+    def ready(self):
+        return len(self.window) >= MIN_SAMPLES
+
+    def features(self):
+        return self.window.features()
+
+
+# --- Stream readers ---
+# Every source is an async iterator of raw byte chunks, so a slow or silent stream
+# only ever parks its own task. Nothing on the read path waits for the network:
+# data points go to the BatchedWriter queue and are flushed from its own thread.
+async def simulator_chunks(source):
+    mode = source.get("mode")
+    interval = source.get("interval", 1.0)
+    while True:
+        yield generate_fake_sensor_data(mode).encode() + b"\n"
+        await asyncio.sleep(interval)
+
+
+async def command_chunks(source):
+    argv = source.get("argv") or [sys.executable, "Simulate_Serial.py"]
+    process = await asyncio.create_subprocess_exec(*argv, stdout=asyncio.subprocess.PIPE)
+    try:
+        while True:
+            data = await process.stdout.read(READ_CHUNK)
+            if not data:
+                break
+            yield data
+    finally:
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+
+
+async def stream_chunks(file_obj):
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader()
+    transport, _ = await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), file_obj)
+    try:
+        while True:
+            data = await reader.read(READ_CHUNK)
+            if not data:
+                break
+            yield data
+    finally:
+        transport.close()
+
+
+async def pipe_chunks(source):
+    fd = os.open(source["path"], os.O_RDONLY | os.O_NONBLOCK)
+    async for data in stream_chunks(os.fdopen(fd, "rb", buffering=0)):
+        yield data
+
+
+async def socket_chunks(source):
+    # TCP stream, e.g. load_simulator.py --output socket; "room" subscribes to one stream
+    reader, writer = await asyncio.open_connection(source.get("host", "127.0.0.1"), source["port"])
+    try:
+        if source.get("room"):
+            writer.write(source["room"].encode() + b"\n")
+            await writer.drain()
+        while True:
+            data = await reader.read(READ_CHUNK)
+            if not data:
+                break
+            yield data
+    finally:
+        writer.close()
+
+
+async def serial_chunks(source):
+    import serial  # pyserial, only needed for real hardware
+
+    port = serial.Serial(source["port"], source.get("baudrate", 9600), timeout=0)
+    try:
+        async for data in stream_chunks(os.fdopen(port.fileno(), "rb", buffering=0, closefd=False)):
+            yield data
+    finally:
+        port.close()
+
+
+SOURCES = {
+    "simulator": simulator_chunks,
+    "command": command_chunks,
+    "pipe": pipe_chunks,
+    "socket": socket_chunks,
+    "serial": serial_chunks,
+}
+
+
+# --- Service ---
+class IngestService:
+    def __init__(self, rooms, model, writer, session_id=None, policy=None):
+        self.session_id = session_id or f"session_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        # A ModelHandle, or a bare engine that is served as-is
+        self.model = model if isinstance(model, ModelHandle) else ModelHandle(engine=model)
+        self.writer = writer
+        # Only changes and heartbeats are written, see publish_policy.py
+        self.policy = policy or PublishPolicy()
+        self.room_config = {room["room_id"]: room for room in rooms}
+        self.rooms = {room_id: RoomState(room_id, self.session_id) for room_id in self.room_config}
+        self.tasks = []
+
+    async def read_room(self, room):
+        source = self.room_config[room.room_id]["source"]
+        open_chunks = SOURCES[source.get("type", "simulator")]
+        while True:
+            try:
+                async for data in open_chunks(source):
+                    room.add_data(data)
+                print(f"⚠️ Stream for {room.room_id} ended, reopening in {RECONNECT_DELAY}s")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️ Stream for {room.room_id} failed ({e}), reopening in {RECONNECT_DELAY}s")
+            await asyncio.sleep(RECONNECT_DELAY)
+
+    async def aggregate(self):
+        while True:
+            await asyncio.sleep(AGGREGATE_EVERY)
+            for room in self.rooms.values():
+                errors = room.new_errors()
+                if errors:
+                    print(f"⚠️ {room.room_id}: {errors} bad or missing frames ({room.parser.stats()})")
+
+            due = [room for room in self.rooms.values() if room.ready()]
+            if not due:
+                continue
+
+            # Every due room is scored in one vectorized call, by one model version
+            engine, model_version = self.model.active
+            feature_rows = [room.features() for room in due]
+            predictions = engine.predict_rounded(feature_rows)
+
+            now = datetime.now()
+            timestamp_key = now.strftime("%Y%m%d%H%M%S")
+            for room, features, crowdiness in zip(due, feature_rows, predictions):
+                self.policy.publish(self.writer, room.room_id, self.session_id, timestamp_key, {
+                    "motion_rate": round(features["motion_rate"], 3),
+                    "avg_sound": round(features["avg_sound"], 1),
+                    "avg_co2": round(features["avg_co2"], 1),
+                    "crowdiness_index": crowdiness,
+                    "model_version": model_version,
+                    "timestamp": now.isoformat()
+                })
+                room.points += 1
+            print(f"🔥 Aggregated {len(due)}/{len(self.rooms)} rooms, {self.writer.pending()} writes pending")
+
+    async def watch_model(self):
+        # A new model is loaded off the event loop and swapped in between ticks;
+        # room buffers keep filling meanwhile
+        while True:
+            await asyncio.sleep(MODEL_CHECK_EVERY)
+            await asyncio.to_thread(self.model.poll)
+
+    def start_sessions(self):
+        started_at = datetime.now().isoformat()
+        updates = {}
+        for room in self.rooms.values():
+            updates[f"{room.session_root}/room_id"] = room.room_id
+            updates[f"{room.session_root}/started_at"] = started_at
+            updates[session_index_path(room.room_id)] = session_index_entry(self.session_id, started_at)
+        self.writer.write_paths(updates)
+
+    def end_sessions(self):
+        ended_at = datetime.now().isoformat()
+        self.writer.write_paths({f"{room.session_root}/ended_at": ended_at for room in self.rooms.values()})
+
+    def stats(self):
+        return {
+            "rooms": len(self.rooms),
+            "samples": sum(r.samples for r in self.rooms.values()),
+            "malformed": sum(r.parser.malformed for r in self.rooms.values()),
+            "checksum_errors": sum(r.parser.checksum_errors for r in self.rooms.values()),
+            "dropped_samples": sum(r.parser.dropped for r in self.rooms.values()),
+            "sequence_resyncs": sum(r.parser.resyncs for r in self.rooms.values()),
+            "points": sum(r.points for r in self.rooms.values()),
+            "published": dict(self.policy.stats),
+            "model": {"version": self.model.version, **self.model.stats},
+            "writer": dict(self.writer.stats),
+        }
+
+    async def run(self):
+        self.writer.start()
+        self.start_sessions()
+        print(f"🦉 Ingesting {len(self.rooms)} rooms into {self.session_id} with model {self.model.version}")
+
+        for room in self.rooms.values():
+            self.tasks.append(asyncio.create_task(self.read_room(room), name=f"read:{room.room_id}"))
+        self.tasks.append(asyncio.create_task(self.aggregate(), name="aggregate"))
+        self.tasks.append(asyncio.create_task(self.watch_model(), name="watch_model"))
+
+        try:
+            await asyncio.gather(*self.tasks)
+        finally:
+            for task in self.tasks:
+                task.cancel()
+            await asyncio.gather(*self.tasks, return_exceptions=True)
+
+    async def shutdown(self):
+        print("🛑 Session interrupted.")
+        self.end_sessions()
+        await asyncio.to_thread(self.writer.stop)
+        print(f"📊 {self.stats()}")
+
+
+async def main(args):
+    db = storage.connect(args.backend, credentials=args.credentials)
+
+    # One model in memory, shared by every room and hot-swapped when a new one is published
+    model = ModelHandle(args.model, check_every=MODEL_CHECK_EVERY)
+    rooms = load_room_config(args.rooms)
+    # Spooled to local disk first unless --no-spool: an outage delays uploads, loses nothing
+    if args.no_spool:
+        writer = BatchedWriter(db, flush_interval=FLUSH_INTERVAL)
+    else:
+        try:
+            spool = Spool(args.spool)
+        except SpoolBusy as e:
+            sys.exit(f"❌ {e} — give each ingest process its own --spool directory")
+        writer = SpoolWriter(db, spool, flush_interval=FLUSH_INTERVAL)
+    service = IngestService(rooms, model, writer)
+
+    loop = asyncio.get_running_loop()
+    runner = asyncio.current_task()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, runner.cancel)
+
+    try:
+        await service.run()
+    except asyncio.CancelledError:
+        pass
+    finally:
+        await service.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Multi-room SpaceScout ingestion service")
+    parser.add_argument("--rooms", default=ROOMS_FILE, help="JSON room list")
+    parser.add_argument("--model", default=MODEL_SOURCE, help="model registry directory or .pkl (default: models/ if published, else owl_model.pkl)")
+    parser.add_argument("--backend", choices=storage.BACKENDS, help=f"database backend (default: ${storage.BACKEND_ENV} or firebase)")
+    parser.add_argument("--credentials", default=storage.CREDENTIALS_PATH)
+    parser.add_argument("--spool", default=spool_dir("ingest"), help="write-ahead spool directory, one per process")
+    parser.add_argument("--no-spool", action="store_true", help="queue writes in memory only (lost on an outage or crash)")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,385 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+
+# Where a dashboard rerun spends its time, and how much it asks of the database.
+#
+# - Metrics: process-wide counters and summaries (count/sum/max) with labels,
+#   rendered in the Prometheus text format.
+# - RerunTrace: one per Streamlit rerun (thread-local, sessions run in their own
+#   threads). app.py marks its sections with trace.section("name"); library code
+#   can add nested span("name") blocks. Database calls made by that thread are
+#   added to the trace too, so the debug panel shows the breakdown of this rerun;
+#   worker threads join it with in_trace(trace).
+# - instrument(db): wraps the database (firebase_admin.db, local_db or SQLite) so
+#   every get/set/update/delete/push is counted with its wall time and JSON bytes,
+#   labelled by the top-level node; listener events are counted as they arrive.
+# - Exporters: SPACESCOUT_METRICS_PORT serves GET /metrics on 127.0.0.1, and
+#   SPACESCOUT_METRICS_LOG appends a JSON snapshot every METRICS_LOG_EVERY seconds.
+# - profile_start()/profile_stop(): cProfile around a single rerun, one at a time.
+#
+# Byte counts are the size of the JSON value, close to what Firebase transfers
+# (without protocol overhead); measuring them serializes each value once more.
+
+METRICS_PORT_ENV = "SPACESCOUT_METRICS_PORT"
+METRICS_LOG_ENV = "SPACESCOUT_METRICS_LOG"
+METRICS_LOG_EVERY = 60.0        # Seconds between log snapshots
+PROFILE_LINES = 30              # Functions shown from a cProfile capture
+READ_OPS = {"get"}
+WRITE_OPS = {"set", "update", "push", "delete", "transaction"}
+HELP = {
+    "spacescout_db_calls_total": "Database calls by operation and top-level node",
+    "spacescout_db_seconds": "Wall time of database calls",
+    "spacescout_db_bytes_total": "JSON bytes read from / written to the database",
+    "spacescout_listener_events_total": "Listener events received",
+    "spacescout_listener_bytes_total": "JSON bytes received by listeners",
+    "spacescout_span_seconds": "Wall time of instrumented sections",
+    "spacescout_rerun_seconds": "Wall time of whole dashboard reruns",
+}
+
+
+def json_bytes(value):
+    if value is None:
+        return 0
+    try:
+        return len(json.dumps(value, separators=(",", ":"), default=str))
+    except (TypeError, ValueError):
+        return 0
+
+
+def _label_text(labels):
+    if not labels:
+        return ""
+    escaped = (f'{k}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"' for k, v in labels)
+    return "{" + ",".join(escaped) + "}"
+
+
+# --- Metrics ---
+class Metrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}     # (name, labels) -> value
+        self.summaries = {}    # (name, labels) -> [count, sum, max]
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            summary = self.summaries.get(key)
+            if summary is None:
+                self.summaries[key] = [1, value, value]
+            else:
+                summary[0] += 1
+                summary[1] += value
+                summary[2] = max(summary[2], value)
+
+    def snapshot(self):
+        # -> {"counters": {"name{labels}": value}, "summaries": {"name{labels}": {...}}}
+        with self.lock:
+            counters = dict(self.counters)
+            summaries = {key: list(value) for key, value in self.summaries.items()}
+        return {
+            "counters": {name + _label_text(labels): value for (name, labels), value in sorted(counters.items())},
+            "summaries": {
+                name + _label_text(labels): {"count": c, "sum": round(s, 6), "max": round(m, 6)}
+                for (name, labels), (c, s, m) in sorted(summaries.items())
+            },
+        }
+
+    def prometheus(self):
+        with self.lock:
+            counters = sorted(self.counters.items())
+            summaries = sorted((key, list(value)) for key, value in self.summaries.items())
+        lines, seen = [], set()
+
+        def header(name, kind):
+            if name not in seen:
+                seen.add(name)
+                if name in HELP:
+                    lines.append(f"# HELP {name} {HELP[name]}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in counters:
+            header(name, "counter")
+            lines.append(f"{name}{_label_text(labels)} {value}")
+        for (name, labels), (count, total, peak) in summaries:
+            header(name, "summary")
+            lines.append(f"{name}_count{_label_text(labels)} {count}")
+            lines.append(f"{name}_sum{_label_text(labels)} {total:.6f}")
+            lines.append(f"{name}_max{_label_text(labels)} {peak:.6f}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+_local = threading.local()
+
+
+# --- Per-rerun traces ---
+class RerunTrace:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans = []           # [(name, ms)] in the order they finished
+        self.db = {"calls": 0, "ms": 0.0, "read_bytes": 0, "write_bytes": 0}
+        self.db_by_node = {}      # "get live_data" -> [calls, ms, bytes]
+        self.total_ms = None
+        self._section = None      # (name, started)
+        self.lock = threading.Lock()    # Pool workers can report database calls concurrently
+
+    def section(self, name):
+        # Ends the running section (if any) and starts the next one
+        self._end_section()
+        self._section = (name, time.perf_counter())
+
+    def _end_section(self):
+        if self._section is not None:
+            name, started = self._section
+            self._section = None
+            elapsed = time.perf_counter() - started
+            self.spans.append((name, elapsed * 1000))
+            metrics.observe("spacescout_span_seconds", elapsed, span=name)
+
+    def add_db_call(self, op, node, seconds, nbytes):
+        with self.lock:
+            self.db["calls"] += 1
+            self.db["ms"] += seconds * 1000
+            self.db["read_bytes" if op in READ_OPS else "write_bytes"] += nbytes
+            entry = self.db_by_node.setdefault(f"{op} {node}", [0, 0.0, 0])
+            entry[0] += 1
+            entry[1] += seconds * 1000
+            entry[2] += nbytes
+
+    def finish(self):
+        self._end_section()
+        if self.total_ms is None:
+            elapsed = time.perf_counter() - self.started
+            self.total_ms = elapsed * 1000
+            metrics.observe("spacescout_rerun_seconds", elapsed)
+        if getattr(_local, "trace", None) is self:
+            _local.trace = None
+        return self
+
+    def breakdown(self):
+        # -> rows for the debug panel, sections in order plus what was not covered
+        total = self.total_ms if self.total_ms is not None else (time.perf_counter() - self.started) * 1000
+        rows = [{"section": name, "ms": round(ms, 1), "share": ms / total if total else 0.0} for name, ms in self.spans]
+        covered = sum(ms for name, ms in self.spans if "›" not in name)
+        rows.append({"section": "(other)", "ms": round(max(total - covered, 0.0), 1),
+                     "share": max(total - covered, 0.0) / total if total else 0.0})
+        return rows
+
+
+def start_rerun():
+    trace = RerunTrace()
+    _local.trace = trace
+    return trace
+
+
+def current_trace():
+    return getattr(_local, "trace", None)
+
+
+@contextmanager
+def in_trace(trace):
+    # Counts work done on another thread (e.g. a pool worker) towards `trace`
+    previous = current_trace()
+    _local.trace = trace
+    try:
+        yield
+    finally:
+        _local.trace = previous
+
+
+@contextmanager
+def span(name):
+    # Nested timing inside the current section, e.g. span("geodesic")
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        metrics.observe("spacescout_span_seconds", elapsed, span=name)
+        trace = current_trace()
+        if trace is not None:
+            parent = trace._section[0] if trace._section else None
+            trace.spans.append((f"{parent} › {name}" if parent else name, elapsed * 1000))
+
+
+# --- Database wrapper ---
+def _top_node(path):
+    parts = [part for part in str(path).split("/") if part]
+    return parts[0] if parts else "/"
+
+
+class _Instrumented:
+    # Proxies a Reference or Query; methods returning another reference/query stay wrapped
+    def __init__(self, target, node):
+        self._target = target
+        self._node = node
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            if name == "listen" and args:
+                args = (_counted_listener(args[0], self._node),) + args[1:]
+            if name not in READ_OPS and name not in WRITE_OPS:
+                # child(), order_by_*(), start_at(), limit_to_*() ...
+                result = attr(*args, **kwargs)
+                if hasattr(result, "get") and not isinstance(result, dict):
+                    return _Instrumented(result, self._node)
+                return result
+
+            start = time.perf_counter()
+            result = attr(*args, **kwargs)
+            elapsed = time.perf_counter() - start
+            if name in READ_OPS:
+                nbytes = json_bytes(result)
+                direction = "read"
+            else:
+                value = args[0] if args else kwargs.get("value")
+                nbytes = 0 if callable(value) else json_bytes(value)
+                direction = "write"
+            metrics.inc("spacescout_db_calls_total", op=name, node=self._node)
+            metrics.observe("spacescout_db_seconds", elapsed, op=name)
+            metrics.inc("spacescout_db_bytes_total", nbytes, direction=direction, node=self._node)
+            trace = current_trace()
+            if trace is not None:
+                trace.add_db_call(name, self._node, elapsed, nbytes)
+            if name == "push" and result is not None:
+                return _Instrumented(result, self._node)
+            return result
+
+        return call
+
+
+def _counted_listener(callback, node):
+    def on_event(event):
+        metrics.inc("spacescout_listener_events_total", node=node)
+        metrics.inc("spacescout_listener_bytes_total", json_bytes(getattr(event, "data", None)), node=node)
+        return callback(event)
+    return on_event
+
+
+class InstrumentedDatabase:
+    def __init__(self, database):
+        self.database = database
+
+    def reference(self, path="/"):
+        return _Instrumented(self.database.reference(path), _top_node(path))
+
+    def __getattr__(self, name):
+        return getattr(self.database, name)
+
+
+def instrument(database):
+    if isinstance(database, InstrumentedDatabase):
+        return database
+    return InstrumentedDatabase(database)
+
+
+# --- Profiling ---
+# Python 3.12+ runs cProfile on sys.monitoring, which allows one active profiler per
+# process, so sessions take turns: a request made while another is running is skipped
+_profile_lock = threading.Lock()
+
+
+def profile_start():
+    # -> enabled profiler, or None while another one is active
+    if not _profile_lock.acquire(blocking=False):
+        return None
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Profiled from outside (python -m cProfile, a debugger)
+        _profile_lock.release()
+        return None
+    return profiler
+
+
+def profile_stop(profiler, limit=PROFILE_LINES, sort="cumulative"):
+    # -> pstats text of the top `limit` functions
+    try:
+        profiler.disable()
+    finally:
+        _profile_lock.release()
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).strip_dirs().sort_stats(sort).print_stats(limit)
+    return out.getvalue()
+
+
+# --- Exporters ---
+_exporters = {}
+_exporters_lock = threading.Lock()
+
+
+def serve(port, host="127.0.0.1"):
+    # Prometheus scrape endpoint in a daemon thread; one per process and port.
+    # http.server is only imported when the endpoint is enabled.
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class _MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/metrics", "/"):
+                self.send_error(404)
+                return
+            body = metrics.prometheus().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    with _exporters_lock:
+        if ("http", port) not in _exporters:
+            server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            server.daemon_threads = True
+            threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+            _exporters[("http", port)] = server
+        return _exporters[("http", port)]
+
+
+def log_to(path, every=METRICS_LOG_EVERY):
+    # Appends {"time": ..., "counters": ..., "summaries": ...} lines to `path`
+    def run():
+        while True:
+            time.sleep(every)
+            try:
+                with open(path, "a") as f:
+                    f.write(json.dumps({"time": time.time(), **metrics.snapshot()}) + "\n")
+            except OSError as e:
+                print(f"⚠️ Could not write metrics to {path}: {e}")
+
+    with _exporters_lock:
+        if ("log", path) not in _exporters:
+            thread = threading.Thread(target=run, name="metrics-log", daemon=True)
+            thread.start()
+            _exporters[("log", path)] = thread
+        return _exporters[("log", path)]
+
+
+def start_exporters():
+    # From the environment; safe to call on every rerun
+    port = os.environ.get(METRICS_PORT_ENV)
+    if port:
+        try:
+            serve(int(port))
+        except OSError as e:
+            print(f"⚠️ Metrics endpoint on port {port} unavailable: {e}")
+    path = os.environ.get(METRICS_LOG_ENV)
+    if path:
+        log_to(path)
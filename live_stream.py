@@ -0,0 +1,177 @@
+import threading
+import time
+
+from publish_policy import LIVE_HEARTBEAT
+
+# Server-side push feed for live_data. One Firebase listener per Streamlit
+# process (db.reference("live_data").listen) keeps an in-memory snapshot up to
+# date and bumps a version counter for every room whose value actually changed.
+# Browser sessions compare those versions with the ones they last rendered and
+# only rerun when a room they show changed — no Firebase read on the way.
+#
+# A listener can die quietly (the stream thread exits on a network error) or stop
+# delivering. Every online room writes live_data at least every LIVE_HEARTBEAT
+# seconds, so no event for STALE_AFTER, or a dead listener thread, makes the feed
+# unhealthy; app.py then polls instead, and a watchdog thread restarts the
+# listener, whose initial snapshot brings the data up to date again. Restarts that
+# bring no change (database unreachable, no room publishing at night) back off
+# exponentially from WATCH_EVERY up to STALE_AFTER, so a quiet deployment is not
+# reconnected on every check.
+
+STALE_AFTER = 2 * LIVE_HEARTBEAT + 60   # Seconds without an event: two missed heartbeats
+WATCH_EVERY = 10.0                      # Seconds between watchdog checks
+
+
+def split_path(path):
+    return [part for part in str(path).split("/") if part]
+
+
+def _apply(node, parts, value, merge):
+    # Returns the new value for `node` after writing `value` at `parts`
+    if not parts:
+        if merge and isinstance(node, dict) and isinstance(value, dict):
+            node = dict(node)
+            for key, child in value.items():
+                if child is None:
+                    node.pop(key, None)
+                else:
+                    node[key] = child
+            return node or None
+        return value
+
+    node = dict(node) if isinstance(node, dict) else {}
+    child = _apply(node.get(parts[0]), parts[1:], value, merge)
+    if child is None:
+        node.pop(parts[0], None)
+    else:
+        node[parts[0]] = child
+    return node or None
+
+
+def _listener_thread(registration):
+    # firebase_admin keeps the stream thread in _thread, local_db in thread
+    return getattr(registration, "thread", None) or getattr(registration, "_thread", None)
+
+
+class LiveFeed:
+    def __init__(self, database, path="live_data", stale_after=STALE_AFTER, watch_every=WATCH_EVERY):
+        self.database = database
+        self.path = path
+        self.stale_after = stale_after
+        self.watch_every = watch_every
+        self.lock = threading.Lock()
+        self.changed = threading.Condition(self.lock)
+        self.data = {}
+        self.versions = {}       # room_id -> change counter
+        self.version = 0         # Bumped on every effective change
+        self.ready = False       # True after the listener's initial snapshot
+        self.error = None
+        self.registration = None
+        self.last_event_at = None
+        self.restarts = 0
+        self.restart_delay = 0.0     # Current backoff between watchdog restarts
+        self.stopping = threading.Event()
+        self.watchdog = None
+
+    def start(self):
+        self._listen()
+        self.watchdog = threading.Thread(target=self._watch, name=f"watch:{self.path}", daemon=True)
+        self.watchdog.start()
+        return self
+
+    def _listen(self):
+        self.last_event_at = time.monotonic()
+        try:
+            self.registration = self.database.reference(self.path).listen(self.on_event)
+            self.error = None
+        except Exception as e:
+            self.error = e
+
+    def _close_listener(self):
+        registration, self.registration = self.registration, None
+        if registration is not None:
+            try:
+                registration.close()
+            except Exception as e:
+                print(f"⚠️ Closing the {self.path} listener failed: {e}")
+
+    def restart(self):
+        self._close_listener()
+        self.restarts += 1
+        self._listen()
+
+    def close(self):
+        self.stopping.set()
+        self._close_listener()
+
+    def _watch(self):
+        restarted_at, version = None, None
+        while not self.stopping.wait(self.watch_every):
+            if self.healthy:
+                continue
+            now = time.monotonic()
+            if restarted_at is not None and now - restarted_at < self.restart_delay:
+                continue
+            # A change since the last restart means it was needed; none means waiting longer
+            if version != self.version:
+                self.restart_delay = self.watch_every
+            else:
+                self.restart_delay = min(self.restart_delay * 2, self.stale_after)
+            reason = self.error or f"no event for {now - self.last_event_at:.0f}s"
+            print(f"⚠️ {self.path} listener unhealthy ({reason}), restarting "
+                  f"(next restart after {self.restart_delay:.0f}s at the earliest)")
+            self.restart()
+            restarted_at, version = time.monotonic(), self.version
+
+    @property
+    def healthy(self):
+        # Listening, the listener thread still runs and events keep arriving
+        registration = self.registration
+        if registration is None or self.error is not None:
+            return False
+        thread = _listener_thread(registration)
+        if thread is not None and not thread.is_alive():
+            return False
+        return time.monotonic() - self.last_event_at < self.stale_after
+
+    def on_event(self, event):
+        self.apply_event(event.event_type, event.path, event.data)
+
+    def apply_event(self, event_type, path, data):
+        parts = split_path(path)
+        merge = event_type == "patch"
+        with self.lock:
+            old = self.data
+            new = _apply(old, parts, data, merge) or {}
+            if not isinstance(new, dict):
+                new = {}
+
+            # Only the rooms under the event path can have changed
+            touched = new.keys() | old.keys() if not parts else {parts[0]}
+            for room_id in touched:
+                if old.get(room_id) != new.get(room_id):
+                    self.versions[room_id] = self.versions.get(room_id, 0) + 1
+                    self.version += 1
+
+            self.data = new
+            self.ready = True
+            self.last_event_at = time.monotonic()
+            self.changed.notify_all()
+
+    def snapshot(self):
+        # The dict is replaced, never mutated, so callers may keep the reference
+        with self.lock:
+            return self.data
+
+    def room_versions(self, room_ids):
+        with self.lock:
+            return {room_id: self.versions.get(room_id, 0) for room_id in room_ids}
+
+    def changed_since(self, seen_versions):
+        with self.lock:
+            return any(self.versions.get(room_id, 0) != version for room_id, version in seen_versions.items())
+
+    def wait_for_change(self, version, timeout=None):
+        with self.changed:
+            self.changed.wait_for(lambda: self.version != version, timeout)
+            return self.version
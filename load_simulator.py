@@ -0,0 +1,492 @@
+import argparse
+import errno
+import json
+import math
+import os
+import selectors
+import socket
+import sys
+import time
+import tty
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from serial_protocol import frame_line
+
+# Load generator for the ingestion path: many rooms' sensor streams at once, in the
+# same "M:..;S:..;C:.." format as Simulate_Serial.py, with every sample drawn in
+# NumPy batches (one draw per tick for all rooms) instead of random.gauss per value.
+#
+#   python load_simulator.py --rooms 2000 --rate 1 --profile lecture --speed 60 \
+#       --output fifo --dir /tmp/rooms --rooms-file rooms_load.json
+#   python ingest_service.py --rooms rooms_load.json
+#
+# Occupancy follows a profile over simulated time (--speed compresses a day):
+#   mode:CROWDED            constant, any Simulate_Serial mode or a level 0..1
+#   lecture                 lecture blocks with per-room attendance and ramps
+#   ramp:FROM:TO:MINUTES    linear ramp, then hold
+# on top of which rooms get noise bursts, sensor dropouts and malformed lines.
+# Outputs: stdout (all rooms interleaved), one FIFO or pseudo-tty per room, or a TCP
+# socket where a client subscribes by sending "<room_id>\n". Writes never block: a
+# reader that falls behind has its bytes dropped and counted, like a serial port.
+
+TICK = 0.05                 # Seconds between batches
+MAX_PENDING = 1 << 20       # Bytes buffered per output before dropping
+REOPEN_EVERY = 1.0          # Seconds between attempts to open a FIFO with no reader
+STATS_EVERY = 10.0
+CO2_LAG_MINUTES = 10        # CO2 follows occupancy with this time constant (simulated)
+BURST_DB = 15.0
+BURST_SECONDS = (5, 30)
+DROPOUT_SECONDS = 60        # Mean dropout length
+
+# Occupancy level -> sensor distribution, anchored on Simulate_Serial's modes
+MODE_LEVELS = {"EMPTY": 0.0, "SPARSE": 0.2, "AVERAGE": 0.45, "CROWDED": 0.75, "OVERCROWDED": 1.0}
+LEVELS = [0.0, 0.2, 0.45, 0.75, 1.0]
+MOTION_P = [0.1, 0.15, 0.4, 0.7, 0.9]
+SOUND_MEAN = [32, 40, 49, 58, 65]
+SOUND_SD = [2, 5, 4, 4, 4]
+CO2_MEAN = [420, 500, 760, 950, 1100]
+CO2_SD = [10, 20, 40, 40, 40]
+
+# Lecture blocks as (start hour, end hour); rooms not in use sit at the break level
+LECTURE_BLOCKS = [(8.25, 9.75), (10.0, 11.5), (12.25, 13.75), (14.0, 15.5), (16.0, 17.5)]
+LECTURE_USE = 0.7           # Chance a room hosts a given block
+BREAK_LEVEL = 0.1
+RAMP_MINUTES = 10
+
+
+# --- Occupancy profiles: simulated datetime -> occupancy per room (0..1) ---
+def constant_profile(level, n_rooms):
+    levels = np.full(n_rooms, level)
+    return lambda moment: levels
+
+
+def ramp_profile(start_level, end_level, minutes, n_rooms, start):
+    def profile(moment):
+        progress = min(max((moment - start).total_seconds() / (minutes * 60), 0.0), 1.0)
+        return np.full(n_rooms, start_level + (end_level - start_level) * progress)
+    return profile
+
+
+def lecture_profile(n_rooms, rng):
+    in_use = rng.random((n_rooms, len(LECTURE_BLOCKS))) < LECTURE_USE
+    attendance = rng.uniform(0.4, 1.0, (n_rooms, len(LECTURE_BLOCKS)))
+    starts = np.array([block[0] for block in LECTURE_BLOCKS])
+    ends = np.array([block[1] for block in LECTURE_BLOCKS])
+    ramp = RAMP_MINUTES / 60
+
+    def profile(moment):
+        hour = moment.hour + moment.minute / 60 + moment.second / 3600
+        if moment.weekday() >= 5 or hour < starts[0] - ramp or hour > ends[-1] + ramp:
+            return np.zeros(n_rooms)
+        # Trapezoid per block: ramp in before the start, out after the end
+        shape = np.clip(np.minimum((hour - starts + ramp) / ramp, (ends + ramp - hour) / ramp), 0.0, 1.0)
+        lecture = (in_use * attendance * shape).max(axis=1)
+        return np.maximum(lecture, BREAK_LEVEL)
+
+    return profile
+
+
+def make_profile(spec, n_rooms, rng, start):
+    kind, _, arg = spec.partition(":")
+    if kind == "mode":
+        level = MODE_LEVELS.get(arg.upper())
+        return constant_profile(float(arg) if level is None else level, n_rooms)
+    if kind == "ramp":
+        start_level, end_level, minutes = (float(x) for x in arg.split(":"))
+        return ramp_profile(start_level, end_level, minutes, n_rooms, start)
+    if kind == "lecture":
+        return lecture_profile(n_rooms, rng)
+    raise ValueError(f"Unknown profile {spec!r}")
+
+
+# --- Sample generation ---
+class LoadGenerator:
+    def __init__(self, room_ids, profile, rng, bursts_per_hour=0.0, dropouts_per_hour=0.0,
+                 garbage=0.0, framed=False):
+        self.room_ids = room_ids
+        self.profile = profile
+        self.rng = rng
+        self.bursts_per_hour = bursts_per_hour
+        self.dropouts_per_hour = dropouts_per_hour
+        self.garbage = garbage
+        self.framed = framed
+
+        n = len(room_ids)
+        self.co2_level = None
+        self.burst_until = np.zeros(n)
+        self.dropout_until = np.zeros(n)
+        self.seq = [0] * n
+        self.stats = {"samples": 0, "dropped_samples": 0, "garbage": 0, "bursts": 0, "dropouts": 0}
+
+    def _events(self, now, dt):
+        # Start new bursts/dropouts as Poisson arrivals over the last dt seconds
+        n = len(self.room_ids)
+        if self.bursts_per_hour:
+            start = (self.rng.random(n) < 1 - math.exp(-self.bursts_per_hour * dt / 3600)) & (self.burst_until <= now)
+            self.burst_until[start] = now + self.rng.uniform(*BURST_SECONDS, int(start.sum()))
+            self.stats["bursts"] += int(start.sum())
+        if self.dropouts_per_hour:
+            start = (self.rng.random(n) < 1 - math.exp(-self.dropouts_per_hour * dt / 3600)) & (self.dropout_until <= now)
+            self.dropout_until[start] = now + self.rng.exponential(DROPOUT_SECONDS, int(start.sum()))
+            self.stats["dropouts"] += int(start.sum())
+
+    def sample(self, moment, now, dt, count, sim_dt):
+        # count samples for every room -> list of bytes per room (b"" while dropped out)
+        n = len(self.room_ids)
+        self._events(now, dt)
+        occupancy = self.profile(moment)
+
+        # CO2 drifts towards the level the occupancy implies instead of jumping
+        target = np.interp(occupancy, LEVELS, CO2_MEAN)
+        if self.co2_level is None:
+            self.co2_level = target.copy()
+        else:
+            self.co2_level += (target - self.co2_level) * (1 - math.exp(-sim_dt / (CO2_LAG_MINUTES * 60)))
+
+        shape = (n, count)
+        motion = self.rng.random(shape) < np.interp(occupancy, LEVELS, MOTION_P)[:, None]
+        sound = self.rng.normal(np.interp(occupancy, LEVELS, SOUND_MEAN)[:, None],
+                                np.interp(occupancy, LEVELS, SOUND_SD)[:, None], shape)
+        sound += (self.burst_until > now)[:, None] * BURST_DB
+        co2 = self.rng.normal(self.co2_level[:, None], np.interp(occupancy, LEVELS, CO2_SD)[:, None], shape)
+        np.clip(sound, 30.0, 75.0, out=sound)
+        np.clip(co2, 400.0, 1200.0, out=co2)
+        corrupt = self.rng.random(shape) < self.garbage if self.garbage else None
+
+        active = self.dropout_until <= now
+        self.stats["samples"] += int(active.sum()) * count
+        self.stats["dropped_samples"] += int((~active).sum()) * count
+
+        out = []
+        motion, sound, co2 = motion.tolist(), sound.tolist(), co2.tolist()
+        for i in range(n):
+            if not active[i]:
+                # The sensor keeps counting while its samples are lost, so the
+                # reader sees a gap in Q when it comes back
+                self.seq[i] += count
+                out.append(b"")
+                continue
+            lines = [f"M:{int(m)};S:{s:.1f};C:{c:.1f}" for m, s, c in zip(motion[i], sound[i], co2[i])]
+            if self.framed:
+                seq = self.seq[i]
+                lines = [frame_line(line, seq + k, with_checksum=True) for k, line in enumerate(lines)]
+                self.seq[i] = seq + len(lines)
+            if corrupt is not None and corrupt[i].any():
+                for k in np.flatnonzero(corrupt[i]):
+                    lines[k] = lines[k][:len(lines[k]) // 2]
+                    self.stats["garbage"] += 1
+            out.append(("\n".join(lines) + "\n").encode())
+        return out
+
+
+# --- Outputs ---
+class FdOutput:
+    # Non-blocking writes to one fd per room, with a bounded backlog
+    def __init__(self, room_ids):
+        self.room_ids = room_ids
+        self.fds = [None] * len(room_ids)
+        self.pending = [bytearray() for _ in room_ids]
+        self.stats = {"bytes": 0, "dropped_bytes": 0}
+
+    def _closed(self, i):
+        os.close(self.fds[i])
+        self.fds[i] = None
+        self.pending[i].clear()
+
+    def write(self, i, data):
+        if self.fds[i] is None:
+            self.stats["dropped_bytes"] += len(data)
+            return
+        buffer = self.pending[i]
+        if len(buffer) + len(data) > MAX_PENDING:
+            self.stats["dropped_bytes"] += len(data)
+        else:
+            buffer += data
+        if not buffer:
+            return
+        try:
+            written = os.write(self.fds[i], buffer)
+        except BlockingIOError:
+            return
+        except OSError as e:
+            if e.errno in (errno.EPIPE, errno.EIO):
+                self._closed(i)
+                return
+            raise
+        self.stats["bytes"] += written
+        del buffer[:written]
+
+    def poll(self, now):
+        pass
+
+    def close(self):
+        for i, fd in enumerate(self.fds):
+            if fd is not None:
+                self._closed(i)
+
+
+class FifoOutput(FdOutput):
+    def __init__(self, room_ids, directory):
+        super().__init__(room_ids)
+        os.makedirs(directory, exist_ok=True)
+        self.paths = [os.path.join(directory, f"{room_id}.fifo") for room_id in room_ids]
+        for path in self.paths:
+            if not os.path.exists(path):
+                os.mkfifo(path)
+        self.last_open = 0.0
+
+    def poll(self, now):
+        # A FIFO can only be opened for writing once a reader has it open
+        if now - self.last_open < REOPEN_EVERY:
+            return
+        self.last_open = now
+        for i, path in enumerate(self.paths):
+            if self.fds[i] is None:
+                try:
+                    self.fds[i] = os.open(path, os.O_WRONLY | os.O_NONBLOCK)
+                except OSError as e:
+                    if e.errno != errno.ENXIO:
+                        raise
+
+    def source(self, i):
+        return {"type": "pipe", "path": self.paths[i]}
+
+
+class PtyOutput(FdOutput):
+    def __init__(self, room_ids):
+        super().__init__(room_ids)
+        self.slaves = []
+        self.ports = []
+        for i in range(len(room_ids)):
+            master, slave = os.openpty()
+            tty.setraw(slave)
+            os.set_blocking(master, False)
+            self.fds[i] = master
+            self.slaves.append(slave)   # Kept open so the line has a buffer before a reader attaches
+            self.ports.append(os.ttyname(slave))
+
+    def source(self, i):
+        return {"type": "serial", "port": self.ports[i]}
+
+    def close(self):
+        super().close()
+        for slave in self.slaves:
+            os.close(slave)
+
+
+class SocketOutput:
+    # TCP server; a client sends "<room_id>\n" and then receives that room's stream
+    def __init__(self, room_ids, host, port):
+        self.room_ids = room_ids
+        self.host = host
+        self.positions = {room_id: i for i, room_id in enumerate(room_ids)}
+        self.server = socket.create_server((host, port), backlog=1024)
+        self.server.setblocking(False)
+        self.port = self.server.getsockname()[1]
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.server, selectors.EVENT_READ)
+        self.handshakes = {}                 # socket -> partial subscribe line
+        self.subscribers = [[] for _ in room_ids]
+        self.pending = {}                    # socket -> bytearray backlog
+        self.stats = {"bytes": 0, "dropped_bytes": 0, "clients": 0}
+
+    def poll(self, now):
+        for key, _ in self.selector.select(timeout=0):
+            sock = key.fileobj
+            if sock is self.server:
+                self._accept()
+                continue
+            try:
+                data = sock.recv(256)
+            except BlockingIOError:
+                continue
+            except OSError:
+                data = b""
+            if not data:
+                self._drop(sock)
+                continue
+            if sock in self.handshakes:
+                line = self.handshakes[sock] + data
+                if b"\n" not in line:
+                    self.handshakes[sock] = line
+                    continue
+                room_id = line.split(b"\n", 1)[0].strip().decode(errors="replace")
+                del self.handshakes[sock]
+                if room_id not in self.positions:
+                    self._drop(sock)
+                    continue
+                self.subscribers[self.positions[room_id]].append(sock)
+                self.pending[sock] = bytearray()
+                self.stats["clients"] += 1
+
+    def _accept(self):
+        while True:
+            try:
+                client, _ = self.server.accept()
+            except BlockingIOError:
+                return
+            client.setblocking(False)
+            self.handshakes[client] = b""
+            self.selector.register(client, selectors.EVENT_READ)
+
+    def _drop(self, sock):
+        self.selector.unregister(sock)
+        self.handshakes.pop(sock, None)
+        if self.pending.pop(sock, None) is not None:
+            for subscribers in self.subscribers:
+                if sock in subscribers:
+                    subscribers.remove(sock)
+            self.stats["clients"] -= 1
+        sock.close()
+
+    def write(self, i, data):
+        for sock in list(self.subscribers[i]):
+            buffer = self.pending[sock]
+            if len(buffer) + len(data) > MAX_PENDING:
+                self.stats["dropped_bytes"] += len(data)
+            else:
+                buffer += data
+            try:
+                sent = sock.send(buffer)
+            except BlockingIOError:
+                continue
+            except OSError:
+                self._drop(sock)
+                continue
+            self.stats["bytes"] += sent
+            del buffer[:sent]
+
+    def source(self, i):
+        return {"type": "socket", "host": self.host, "port": self.port, "room": self.room_ids[i]}
+
+    def close(self):
+        for sock in list(self.pending) + list(self.handshakes):
+            self._drop(sock)
+        self.selector.close()
+        self.server.close()
+
+
+class StdoutOutput:
+    # Every room's lines on one stream: for a single room or raw throughput tests
+    def __init__(self, room_ids):
+        self.out = sys.stdout.buffer
+        self.stats = {"bytes": 0, "dropped_bytes": 0}
+
+    def poll(self, now):
+        pass
+
+    def write(self, i, data):
+        self.out.write(data)
+        self.stats["bytes"] += len(data)
+
+    def flush(self):
+        self.out.flush()
+
+    def close(self):
+        self.out.flush()
+
+
+def write_rooms_file(path, room_ids, output):
+    # ingest_service.py config that reads exactly the streams this run produces
+    rooms = [{"room_id": room_id, "source": output.source(i)} for i, room_id in enumerate(room_ids)]
+    with open(path, "w") as f:
+        json.dump({"rooms": rooms}, f, indent=1)
+
+
+def log(message):
+    print(message, file=sys.stderr, flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-room sensor stream generator")
+    parser.add_argument("--rooms", type=int, default=10, help="number of rooms")
+    parser.add_argument("--room-ids", nargs="*", help="explicit room ids (overrides --rooms)")
+    parser.add_argument("--rate", type=float, default=1.0, help="samples per second per room")
+    parser.add_argument("--profile", default="lecture", help="mode:<MODE|level>, lecture, ramp:FROM:TO:MINUTES")
+    parser.add_argument("--speed", type=float, default=1.0, help="simulated seconds per wall second")
+    parser.add_argument("--start", help="simulated start time (ISO), default now")
+    parser.add_argument("--duration", type=float, default=0, help="wall seconds to run, 0 = forever")
+    parser.add_argument("--output", choices=["stdout", "fifo", "pty", "socket"], default="stdout")
+    parser.add_argument("--dir", default="/tmp/spacescout_rooms", help="FIFO directory")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=7000)
+    parser.add_argument("--rooms-file", help="write an ingest_service.py config for these streams")
+    parser.add_argument("--framed", action="store_true", help="add sequence numbers and checksums")
+    parser.add_argument("--bursts", type=float, default=0.0, help="noise bursts per room per hour")
+    parser.add_argument("--dropouts", type=float, default=0.0, help="sensor dropouts per room per hour")
+    parser.add_argument("--garbage", type=float, default=0.0, help="fraction of lines to corrupt")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    room_ids = args.room_ids or [f"room{i:04d}" for i in range(1, args.rooms + 1)]
+    rng = np.random.default_rng(args.seed)
+    sim_start = datetime.fromisoformat(args.start) if args.start else datetime.now()
+    profile = make_profile(args.profile, len(room_ids), rng, sim_start)
+    generator = LoadGenerator(room_ids, profile, rng, args.bursts, args.dropouts, args.garbage, args.framed)
+
+    if args.output == "fifo":
+        output = FifoOutput(room_ids, args.dir)
+    elif args.output == "pty":
+        output = PtyOutput(room_ids)
+    elif args.output == "socket":
+        output = SocketOutput(room_ids, args.host, args.port)
+    else:
+        output = StdoutOutput(room_ids)
+
+    if args.rooms_file:
+        if args.output == "stdout":
+            parser.error("--rooms-file needs a per-room output (fifo, pty or socket)")
+        write_rooms_file(args.rooms_file, room_ids, output)
+        log(f"📝 Wrote {args.rooms_file} for {len(room_ids)} rooms")
+    if args.output == "pty" and len(room_ids) <= 10:
+        for room_id, port in zip(room_ids, output.ports):
+            log(f"🔌 {room_id}: {port}")
+
+    log(f"🚀 {len(room_ids)} rooms x {args.rate:g} Hz = {len(room_ids) * args.rate:g} samples/s "
+        f"({args.profile}, {args.output})")
+
+    start = time.monotonic()
+    emitted = 0
+    last_tick = start
+    last_sim = sim_start
+    last_stats = start
+    try:
+        while True:
+            now = time.monotonic()
+            elapsed = now - start
+            if args.duration and elapsed >= args.duration:
+                break
+            output.poll(now)
+
+            due = int(elapsed * args.rate) - emitted
+            if due > 0:
+                moment = sim_start + timedelta(seconds=elapsed * args.speed)
+                batches = generator.sample(moment, now, now - last_tick, due, (moment - last_sim).total_seconds())
+                for i, data in enumerate(batches):
+                    if data:
+                        output.write(i, data)
+                if isinstance(output, StdoutOutput):
+                    output.flush()
+                emitted += due
+                last_tick, last_sim = now, moment
+
+            if now - last_stats >= STATS_EVERY:
+                last_stats = now
+                rate = generator.stats["samples"] / max(elapsed, 1e-9)
+                log(f"📈 {rate:,.0f} samples/s | generator {generator.stats} | output {output.stats}")
+
+            time.sleep(max(TICK - (time.monotonic() - now), 0))
+    except (KeyboardInterrupt, BrokenPipeError):
+        pass
+    finally:
+        try:
+            output.close()
+        except BrokenPipeError:
+            pass
+        log(f"🛑 Stopped after {time.monotonic() - start:.1f}s | generator {generator.stats} | output {output.stats}")
+
+
+if __name__ == "__main__":
+    main()
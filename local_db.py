@@ -0,0 +1,402 @@
+import copy
+import hashlib
+import itertools
+import json
+import threading
+import time
+from collections import namedtuple
+
+# In-memory stand-in for firebase_admin.db. It exposes the same reference() entry
+# point and the Reference methods the SpaceScout scripts use (child/get/set/update/
+# delete/push/listen, shallow gets and order_by_key/child/value() queries), with
+# Realtime Database semantics: paths are slash separated, writing None deletes,
+# empty branches disappear and update() accepts multi-location keys such as
+# {"live_data/room01": {...}, "sessions/room01/...": {...}}.
+#
+#   import local_db as db          # instead of: from firebase_admin import db
+#   db.reference("rooms").set({...})
+#
+# Reference and Query only call get/query/set/update/delete/listen on the database
+# object, so other backends (storage.SqliteDatabase) reuse them.
+
+
+def split_path(path):
+    return [part for part in str(path).split("/") if part]
+
+
+def _prune(value):
+    # Firebase never stores empty objects or nulls
+    if isinstance(value, dict):
+        pruned = {}
+        for key, child in value.items():
+            child = _prune(child)
+            if child is not None:
+                pruned[str(key)] = child
+        return pruned or None
+    return value
+
+
+def key_order(key):
+    # RTDB sorts keys that parse as 32-bit integers numerically, before all others
+    if key.lstrip("-").isdigit() and -2**31 <= int(key) < 2**31:
+        return (0, int(key), "")
+    return (1, 0, key)
+
+
+def shallow(value):
+    if not isinstance(value, dict):
+        return value
+    return {key: True if isinstance(child, dict) else child for key, child in value.items()}
+
+
+def value_etag(value):
+    encoded = json.dumps(value, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.md5(encoded.encode()).hexdigest()
+
+
+def value_order(value):
+    # RTDB order_by_value/child: null, false, true, numbers, strings, then objects
+    if value is None:
+        return (0, 0, "")
+    if isinstance(value, bool):
+        return (1, int(value), "")
+    if isinstance(value, (int, float)):
+        return (2, value, "")
+    if isinstance(value, str):
+        return (3, 0, value)
+    return (4, 0, "")
+
+
+def child_value(value, parts):
+    for part in parts:
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+def apply_query(node, order_by=("key",), start_at=None, end_at=None, limit_to_first=None, limit_to_last=None):
+    # Children of `node` selected and ordered like an RTDB query
+    if not isinstance(node, dict):
+        return {} if node is None else node
+    if order_by[0] == "key":
+        keys = sorted(node, key=key_order)
+        if start_at is not None:
+            keys = [key for key in keys if key_order(key) >= key_order(str(start_at))]
+        if end_at is not None:
+            keys = [key for key in keys if key_order(key) <= key_order(str(end_at))]
+    else:
+        parts = split_path(order_by[1]) if order_by[0] == "child" else []
+        ranked = sorted((value_order(child_value(node[key], parts)), key_order(key), key) for key in node)
+        if start_at is not None:
+            ranked = [item for item in ranked if item[0] >= value_order(start_at)]
+        if end_at is not None:
+            ranked = [item for item in ranked if item[0] <= value_order(end_at)]
+        keys = [item[2] for item in ranked]
+    if limit_to_first is not None:
+        keys = keys[:limit_to_first]
+    if limit_to_last is not None:
+        keys = keys[-limit_to_last:] if limit_to_last else []
+    return {key: copy.deepcopy(node[key]) for key in keys}
+
+
+def overlaps(a, b):
+    # True if one path is a prefix of the other
+    return a[:len(b)] == b[:len(a)]
+
+
+# --- Listeners ---
+Event = namedtuple("Event", ["event_type", "path", "data"])
+
+
+class ListenerRegistration:
+    # Delivers Firebase-style events for one path on a background thread: an initial
+    # put of the whole value, then a put per direct child that changed (or a put at
+    # "/" when the value stops or starts being an object). Bursts of writes are
+    # coalesced into one diff. poll_interval re-checks for changes made elsewhere
+    # (another process) when the database supports it.
+    def __init__(self, database, parts, callback, poll_interval=None):
+        self.database = database
+        self.parts = parts
+        self.callback = callback
+        self.poll_interval = poll_interval
+        self.wakeup = threading.Event()
+        self.closed = False
+        self.thread = threading.Thread(target=self._run, name=f"listen:/{'/'.join(parts)}", daemon=True)
+        self.thread.start()
+
+    def notify(self):
+        self.wakeup.set()
+
+    def close(self):
+        self.closed = True
+        self.wakeup.set()
+        self.database.remove_listener(self)
+        if self.thread is not threading.current_thread():
+            self.thread.join(5)
+
+    def _emit(self, event):
+        try:
+            self.callback(event)
+        except Exception as e:
+            print(f"⚠️ Listener on /{'/'.join(self.parts)} failed: {e}")
+
+    def _run(self):
+        token = self.database.change_token()
+        snapshot = self.database.get(self.parts)
+        self._emit(Event("put", "/", snapshot))
+        while not self.closed:
+            self.wakeup.wait(self.poll_interval)
+            self.wakeup.clear()
+            if self.closed:
+                break
+            new_token = self.database.change_token()
+            if new_token == token:
+                continue
+            token = new_token
+            current = self.database.get(self.parts)
+            for event in diff_events(snapshot, current):
+                self._emit(event)
+            snapshot = current
+
+
+def diff_events(old, new):
+    if old == new:
+        return []
+    if not isinstance(old, dict) or not isinstance(new, dict):
+        return [Event("put", "/", new)]
+    return [
+        Event("put", f"/{key}", new.get(key))
+        for key in list(old.keys() | new.keys())
+        if old.get(key) != new.get(key)
+    ]
+
+
+class LocalDatabase:
+    def __init__(self, data=None):
+        self.root = _prune(copy.deepcopy(data)) or {}
+        self.lock = threading.RLock()
+        self.ops = {"get": 0, "set": 0, "update": 0, "delete": 0}
+        self.listeners = []
+        self.writes = 0
+
+    def reference(self, path="/"):
+        return Reference(self, split_path(path))
+
+    def _get(self, parts):
+        node = self.root
+        for part in parts:
+            if not isinstance(node, dict) or part not in node:
+                return None
+            node = node[part]
+        return node
+
+    def _set(self, parts, value):
+        value = _prune(copy.deepcopy(value))
+        if not parts:
+            self.root = value if isinstance(value, dict) else {}
+            return
+
+        # Walk down, remembering the trail so empty parents can be removed afterwards
+        node = self.root
+        trail = []
+        for part in parts[:-1]:
+            child = node.get(part)
+            if not isinstance(child, dict):
+                if value is None:
+                    return
+                child = node[part] = {}
+            trail.append((node, part))
+            node = child
+
+        if value is None:
+            node.pop(parts[-1], None)
+        else:
+            node[parts[-1]] = value
+
+        for parent, part in reversed(trail):
+            if parent[part]:
+                break
+            del parent[part]
+
+    def get(self, parts, shallow_only=False):
+        with self.lock:
+            self.ops["get"] += 1
+            value = self._get(parts)
+            if shallow_only:
+                return shallow(value)
+            return copy.deepcopy(value)
+
+    def query(self, parts, **params):
+        with self.lock:
+            self.ops["get"] += 1
+            return apply_query(self._get(parts), **params)
+
+    def set(self, parts, value):
+        with self.lock:
+            self.ops["set"] += 1
+            self._set(parts, value)
+        self._notify([parts])
+
+    def update(self, parts, values):
+        if not isinstance(values, dict) or not values:
+            raise ValueError("update() needs a non-empty dict")
+        paths = [parts + split_path(key) for key in values]
+        # Like the real database: a multi-path update may not write a path and one
+        # below it. Sorted, a path is directly followed by its descendants.
+        ordered = sorted(paths)
+        for a, b in zip(ordered, ordered[1:]):
+            if overlaps(a, b):
+                raise ValueError(f"update() paths overlap: {'/'.join(a)} and {'/'.join(b)}")
+        with self.lock:
+            self.ops["update"] += 1
+            for path, value in zip(paths, values.values()):
+                self._set(path, value)
+        self._notify(paths)
+
+    def delete(self, parts):
+        with self.lock:
+            self.ops["delete"] += 1
+            self._set(parts, None)
+        self._notify([parts])
+
+    # --- Listeners ---
+    def listen(self, parts, callback):
+        registration = ListenerRegistration(self, parts, callback)
+        with self.lock:
+            self.listeners.append(registration)
+        return registration
+
+    def remove_listener(self, registration):
+        with self.lock:
+            if registration in self.listeners:
+                self.listeners.remove(registration)
+
+    def change_token(self):
+        with self.lock:
+            return self.writes
+
+    def _notify(self, paths):
+        with self.lock:
+            self.writes += 1
+            listeners = list(self.listeners)
+        for listener in listeners:
+            if any(overlaps(listener.parts, path) for path in paths):
+                listener.notify()
+
+
+_push_counter = itertools.count()
+
+
+class Reference:
+    def __init__(self, database, parts):
+        self._db = database
+        self._parts = parts
+
+    @property
+    def key(self):
+        return self._parts[-1] if self._parts else None
+
+    @property
+    def path(self):
+        return "/" + "/".join(self._parts)
+
+    @property
+    def parent(self):
+        if not self._parts:
+            return None
+        return Reference(self._db, self._parts[:-1])
+
+    def child(self, path):
+        return Reference(self._db, self._parts + split_path(path))
+
+    def get(self, etag=False, shallow=False):
+        # etag=True -> (value, etag) like firebase_admin; the etag is a hash of the
+        # value, so it changes exactly when the data does
+        if etag and shallow:
+            raise ValueError("etag and shallow cannot both be set")
+        value = self._db.get(self._parts, shallow_only=shallow)
+        if etag:
+            return value, value_etag(value)
+        return value
+
+    def order_by_key(self):
+        return Query(self._db, self._parts)
+
+    def order_by_child(self, path):
+        return Query(self._db, self._parts, ("child", path))
+
+    def order_by_value(self):
+        return Query(self._db, self._parts, ("value",))
+
+    def listen(self, callback):
+        # callback(event) with event.event_type, event.path and event.data, from a
+        # background thread; returns a registration with close()
+        return self._db.listen(self._parts, callback)
+
+    def set(self, value):
+        self._db.set(self._parts, value)
+
+    def update(self, value):
+        self._db.update(self._parts, value)
+
+    def delete(self):
+        self._db.delete(self._parts)
+
+    def push(self, value=""):
+        # Real push keys sort by creation time; keep that property locally
+        ref = self.child(f"-{time.time_ns():020d}{next(_push_counter) % 1000:03d}")
+        if value is not None:
+            ref.set(value)
+        return ref
+
+
+class Query:
+    # order_by_key/child/value() queries; results come back as an ordered dict like the SDK's
+    def __init__(self, database, parts, order_by=("key",)):
+        self._db = database
+        self._parts = parts
+        self._params = {"order_by": order_by}
+
+    def _with(self, name, value):
+        if name in self._params:
+            raise ValueError(f"{name} already set")
+        self._params[name] = value
+        return self
+
+    def start_at(self, start):
+        return self._with("start_at", start)
+
+    def end_at(self, end):
+        return self._with("end_at", end)
+
+    def equal_to(self, value):
+        self._with("start_at", value)
+        return self._with("end_at", value)
+
+    def limit_to_first(self, limit):
+        if "limit_to_last" in self._params:
+            raise ValueError("Cannot set both first and last limits")
+        return self._with("limit_to_first", limit)
+
+    def limit_to_last(self, limit):
+        if "limit_to_first" in self._params:
+            raise ValueError("Cannot set both first and last limits")
+        return self._with("limit_to_last", limit)
+
+    def get(self):
+        return self._db.query(self._parts, **self._params)
+
+
+# --- Module-level default, so `import local_db as db` works like firebase_admin.db ---
+default_database = LocalDatabase()
+
+
+def reference(path="/"):
+    return default_database.reference(path)
+
+
+def reset(data=None):
+    global default_database
+    default_database = LocalDatabase(data)
+    return default_database
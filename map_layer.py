@@ -0,0 +1,96 @@
+import html
+
+import folium
+from branca.element import MacroElement
+from folium.plugins import FastMarkerCluster
+from jinja2 import Template
+
+# Room map for the dashboard, split into two parts for streamlit_folium.st_folium:
+# - the base map (tiles, scale control) carries no room data, so its HTML is the
+#   same on every rerun and the browser keeps it mounted;
+# - the room layer is a FeatureGroup passed as feature_group_to_add, which the
+#   component swaps in place when markers change colour or value.
+# Room markers are one data array of [lat, lng, colour, popup_html] rows, built
+# into markers client-side (RoomMarkers, or FastMarkerCluster above
+# CLUSTER_THRESHOLD rooms). As folium Markers, each room cost st_folium a template
+# render per marker, icon and popup on every rerun (~2 ms per room); as rows the
+# layer's JS is one template and a JSON dump. st_folium has no way to update single
+# markers: a changed row still re-sends and redraws the whole layer.
+
+CLUSTER_THRESHOLD = 200
+MAP_ZOOM = 19
+
+# One marker per room, built in the browser from [lat, lng, colour, popup_html]
+MARKER_CALLBACK = """
+function (row) {
+    var icon = L.AwesomeMarkers.icon({icon: 'info-sign', markerColor: row[2], prefix: 'glyphicon'});
+    var marker = L.marker(new L.LatLng(row[0], row[1]), {icon: icon});
+    marker.bindPopup(row[3], {maxWidth: 250});
+    return marker;
+};
+"""
+
+
+class RoomMarkers(MacroElement):
+    # Unclustered counterpart of FastMarkerCluster: every row becomes a marker on the parent layer
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+            (function () {
+                var callback = {{ this.callback }}
+                var data = {{ this.data|tojson }};
+                for (var i = 0; i < data.length; i++) {
+                    callback(data[i]).addTo({{ this._parent.get_name() }});
+                }
+            })();
+        {% endmacro %}
+    """)
+
+    def __init__(self, data, callback=MARKER_CALLBACK):
+        super().__init__()
+        self._name = "RoomMarkers"
+        self.data = data
+        self.callback = callback.strip()
+
+
+def marker_color(crowdiness):
+    if crowdiness == -1:
+        return "gray"
+    elif crowdiness < 0.3:
+        return "green"
+    elif crowdiness < 0.6:
+        return "orange"
+    else:
+        return "red"
+
+
+def popup_html(room):
+    return (
+        f"<b>{html.escape(str(room['name']))}</b><br>"
+        f"Distance: {room['distance']} km<br>"
+        f"Crowdiness: {room['crowdiness'] if room['crowdiness'] != -1 else 'Offline'}<br>"
+    )
+
+
+def base_map(center, zoom=MAP_ZOOM):
+    return folium.Map(location=center, zoom_start=zoom, control_scale=True)
+
+
+def room_layer(room_entries, user_latlng):
+    layer = folium.FeatureGroup(name="rooms")
+
+    # User marker
+    folium.Marker(
+        location=user_latlng,
+        popup="📍 You Are Here",
+        icon=folium.Icon(color="blue", icon="user")
+    ).add_to(layer)
+
+    rows = [
+        [room['lat'], room['lng'], marker_color(room['crowdiness']), popup_html(room)]
+        for room in room_entries
+    ]
+    if len(rows) > CLUSTER_THRESHOLD:
+        FastMarkerCluster(rows, callback=MARKER_CALLBACK).add_to(layer)
+    else:
+        RoomMarkers(rows).add_to(layer)
+    return layer
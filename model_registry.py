@@ -0,0 +1,239 @@
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime
+
+import joblib
+
+from inference import MODEL_PATH, FlatForest, InferenceEngine
+
+# Versioned model artifacts that ingest processes can pick up without a restart.
+#
+#   models/v0001/model.joblib    fitted forest (uncompressed, so it can be mmapped)
+#   models/v0001/flat.joblib     FlatForest node arrays
+#   models/v0001/meta.json       training metadata written by train_model.py
+#   models/CURRENT               name of the version processes should serve
+#
+# - A version directory is written under a temporary name and renamed into place,
+#   and CURRENT is swapped with os.replace, so a reader never sees half a model.
+# - Artifacts are loaded with joblib mmap_mode="r": the flat forest's node arrays
+#   stay in the page cache and are shared by every process serving that version.
+#   (sklearn copies tree nodes into its own buffers on unpickle, so the compiled
+#   tree path still costs each process its own copy.)
+# - ModelHandle holds the engine a process is serving and polls CURRENT; a new
+#   version is loaded next to the old one and swapped in with a single assignment,
+#   so rolling buffers and in-flight predictions are never interrupted.
+# - Without a registry, ModelHandle serves the legacy owl_model.pkl and reloads it
+#   when the file is replaced.
+
+REGISTRY_ROOT = "models"
+CURRENT_FILE = "CURRENT"
+CHECK_EVERY = 30.0          # Seconds between checks for a new version
+KEEP_VERSIONS = 5           # prune() keeps this many, plus the current one
+
+
+def _version_number(name):
+    return int(name[1:]) if name.startswith("v") and name[1:].isdigit() else None
+
+
+class ModelRegistry:
+    def __init__(self, root=REGISTRY_ROOT):
+        self.root = root
+
+    def path(self, version, name=""):
+        return os.path.join(self.root, version, name) if name else os.path.join(self.root, version)
+
+    def exists(self):
+        return os.path.exists(os.path.join(self.root, CURRENT_FILE))
+
+    def versions(self):
+        if not os.path.isdir(self.root):
+            return []
+        names = [name for name in os.listdir(self.root) if _version_number(name) is not None]
+        return sorted(names, key=_version_number)
+
+    def current_version(self):
+        try:
+            with open(os.path.join(self.root, CURRENT_FILE)) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def set_current(self, version):
+        # Also the rollback: point CURRENT back at an older version
+        if not os.path.isdir(self.path(version)):
+            raise ValueError(f"Unknown model version {version!r} in {self.root}/")
+        tmp_path = os.path.join(self.root, f".{CURRENT_FILE}.{uuid.uuid4().hex[:8]}")
+        with open(tmp_path, "w") as f:
+            f.write(version + "\n")
+        os.replace(tmp_path, os.path.join(self.root, CURRENT_FILE))
+
+    def meta(self, version=None):
+        version = version or self.current_version()
+        if version is None:
+            return {}
+        try:
+            with open(self.path(version, "meta.json")) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def publish(self, model, meta=None, activate=True):
+        # -> new version name; the flattened forest is exported alongside the model
+        os.makedirs(self.root, exist_ok=True)
+        tmp_dir = os.path.join(self.root, f".tmp-{uuid.uuid4().hex[:8]}")
+        os.makedirs(tmp_dir)
+        try:
+            joblib.dump(model, os.path.join(tmp_dir, "model.joblib"))
+            if hasattr(model, "estimators_"):
+                flat = FlatForest.from_model(model)
+                joblib.dump(vars(flat), os.path.join(tmp_dir, "flat.joblib"))
+
+            # Two trainers publishing at once: the loser of the rename takes the next number
+            while True:
+                last = self.versions()
+                version = f"v{(_version_number(last[-1]) if last else 0) + 1:04d}"
+                meta = dict(meta or {}, version=version, published_at=datetime.now().isoformat())
+                with open(os.path.join(tmp_dir, "meta.json"), "w") as f:
+                    json.dump(meta, f, indent=2)
+                try:
+                    os.rename(tmp_dir, self.path(version))
+                    break
+                except OSError:
+                    if not os.path.isdir(self.path(version)):
+                        raise
+        except BaseException:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+
+        if activate:
+            self.set_current(version)
+        return version
+
+    def load_model(self, version=None, mmap_mode="r"):
+        version = version or self.current_version()
+        return joblib.load(self.path(version, "model.joblib"), mmap_mode=mmap_mode)
+
+    def load(self, version=None, mmap_mode="r", use_flat=True):
+        # -> (InferenceEngine, version)
+        version = version or self.current_version()
+        if version is None:
+            raise FileNotFoundError(f"No model published in {self.root}/")
+        model = self.load_model(version, mmap_mode)
+        flat = None
+        flat_path = self.path(version, "flat.joblib")
+        if use_flat and os.path.exists(flat_path):
+            flat = FlatForest(**joblib.load(flat_path, mmap_mode=mmap_mode))
+        return InferenceEngine(model, flat), version
+
+    def prune(self, keep=KEEP_VERSIONS):
+        # Running processes keep their mmapped files open, so deleting is safe on POSIX
+        current = self.current_version()
+        removed = []
+        for version in self.versions()[:-keep] if keep else self.versions():
+            if version != current:
+                shutil.rmtree(self.path(version), ignore_errors=True)
+                removed.append(version)
+        return removed
+
+
+def _file_version(path):
+    # Legacy pickles have no version; the modification time stands in for one
+    return f"{os.path.basename(path)}@{datetime.fromtimestamp(os.path.getmtime(path)).strftime('%Y%m%d%H%M%S')}"
+
+
+class ModelHandle:
+    def __init__(self, source=None, check_every=CHECK_EVERY, mmap_mode="r", engine=None, version="fixed"):
+        # source: registry directory or a .pkl file; default models/ if published, else
+        # owl_model.pkl. engine: serve an already loaded engine, never reloaded (benchmarks).
+        if source is None and engine is None:
+            source = REGISTRY_ROOT if ModelRegistry(REGISTRY_ROOT).exists() else MODEL_PATH
+        self.source = source
+        self.check_every = check_every
+        self.mmap_mode = mmap_mode
+        self.registry = ModelRegistry(source) if source and os.path.isdir(source) else None
+        self.lock = threading.Lock()
+        self.stats = {"loads": 0, "swaps": 0, "failed_loads": 0}
+        # (engine, version), replaced as a whole so readers never mix the two
+        self.active = (engine, version) if engine is not None else self._load()
+        self.checked_at = time.monotonic()
+
+    @property
+    def engine(self):
+        return self.active[0]
+
+    @property
+    def version(self):
+        return self.active[1]
+
+    def _latest_version(self):
+        if self.registry is not None:
+            return self.registry.current_version()
+        return _file_version(self.source)
+
+    def _load(self):
+        self.stats["loads"] += 1
+        if self.registry is not None:
+            return self.registry.load(mmap_mode=self.mmap_mode)
+        version = _file_version(self.source)
+        return InferenceEngine.load(self.source), version
+
+    def poll(self, force=False):
+        # -> True if a new version was swapped in. Cheap between checks (one stat/read
+        # every check_every seconds); loading happens here, outside the prediction path.
+        if self.source is None:
+            return False
+        now = time.monotonic()
+        if not force and now - self.checked_at < self.check_every:
+            return False
+        with self.lock:
+            self.checked_at = now
+            try:
+                latest = self._latest_version()
+                if latest is None or latest == self.version:
+                    return False
+                engine, version = self._load()
+            except Exception as e:
+                # A half-copied pickle or a bad deploy: keep serving the current model
+                self.stats["failed_loads"] += 1
+                print(f"⚠️ Model reload from {self.source} failed, keeping {self.version}: {e}")
+                return False
+            previous = self.version
+            self.active = (engine, version)
+            self.stats["swaps"] += 1
+        print(f"🔄 Model {previous} -> {version}")
+        return True
+
+
+# --- CLI ---
+# python model_registry.py list | use <version> | import [owl_model.pkl] | prune [keep]
+if __name__ == "__main__":
+    registry = ModelRegistry()
+    command = sys.argv[1] if len(sys.argv) > 1 else "list"
+    if command == "list":
+        current = registry.current_version()
+        for version in registry.versions():
+            meta = registry.meta(version)
+            marker = "*" if version == current else " "
+            print(f"{marker} {version}  trained {meta.get('trained_at', '?')}  "
+                  f"trees {meta.get('n_estimators', '?')}  R² {meta.get('test_r2', '?')}")
+        if not registry.versions():
+            print(f"ℹ️ No versions in {registry.root}/")
+    elif command == "use" and len(sys.argv) > 2:
+        registry.set_current(sys.argv[2])
+        print(f"✅ {sys.argv[2]} is now current; running processes switch within {CHECK_EVERY:.0f}s")
+    elif command == "import":
+        path = sys.argv[2] if len(sys.argv) > 2 else MODEL_PATH
+        model = joblib.load(path)
+        version = registry.publish(model, {"imported_from": path, "n_estimators": getattr(model, "n_estimators", None)})
+        print(f"📦 Imported {path} as {version}")
+    elif command == "prune":
+        keep = int(sys.argv[2]) if len(sys.argv) > 2 else KEEP_VERSIONS
+        print(f"🧹 Removed {', '.join(registry.prune(keep)) or 'nothing'}")
+    else:
+        print("Usage: python model_registry.py list | use <version> | import [owl_model.pkl] | prune [keep]")
+        sys.exit(1)
@@ -0,0 +1,240 @@
+import re
+import sys
+import time
+from datetime import datetime
+
+# Campus-wide occupancy totals, kept up to date as live_data changes, so building-
+# and floor-level views read one small document instead of scanning every room:
+#
+#   summary/campus                 = totals
+#   summary/buildings/{building}   = totals
+#   summary/floors/{building}/{floor_N} = totals
+#   summary/types/{type}           = totals
+#   summary/generated_at           = ISO time of the last change
+#
+#   totals = {"name", "rooms", "online", "offline", "capacity", "online_capacity",
+#             "people", "free_seats", "occupancy"}
+#
+# Estimated people are capacity x crowdiness of the online rooms; a room is offline
+# without live_data or when its last value is older than OFFLINE_AFTER. Each room's
+# contribution is remembered, so a live_data change subtracts the old one and adds
+# the new one: O(groups of that room) per change, and only the totals that moved
+# are written.
+
+OFFLINE_AFTER = 300         # Seconds; live_data heartbeats every 120 s (publish_policy.py)
+PUBLISH_EVERY = 2.0         # Seconds between summary writes
+ROOMS_REFRESH = 600         # Seconds between rooms/ reloads (full rebuild)
+UNKNOWN = "Unknown"
+SUMS = ("rooms", "online", "capacity", "online_capacity", "people")
+
+
+def node_key(value):
+    # Realtime Database keys cannot contain . $ # [ ] /
+    return re.sub(r"[.$#\[\]/]", "_", str(value)).strip() or UNKNOWN
+
+
+def room_groups(meta):
+    # -> [(summary path, display name)] the room counts towards
+    building = meta.get("building") or UNKNOWN
+    floor = meta.get("floor")
+    floor_name = UNKNOWN if floor is None else str(floor)
+    rtype = meta.get("type") or UNKNOWN
+    # "floor_3", not "3": numeric keys can turn a Firebase node into a list
+    return [
+        ("campus", "Campus"),
+        (f"buildings/{node_key(building)}", building),
+        (f"floors/{node_key(building)}/floor_{node_key(floor_name)}", floor_name),
+        (f"types/{node_key(rtype)}", rtype),
+    ]
+
+
+def is_online(live, now, offline_after=OFFLINE_AFTER):
+    if not isinstance(live, dict) or not isinstance(live.get("crowdiness_index"), (int, float)):
+        return False
+    try:
+        age = (now - datetime.fromisoformat(live["timestamp"])).total_seconds()
+    except (KeyError, TypeError, ValueError):
+        return False
+    return age <= offline_after
+
+
+def contribution(meta, live, now, offline_after=OFFLINE_AFTER):
+    capacity = meta.get("capacity")
+    capacity = capacity if isinstance(capacity, (int, float)) else 0
+    if not is_online(live, now, offline_after):
+        return (1, 0, capacity, 0, 0.0)
+    crowdiness = min(max(float(live["crowdiness_index"]), 0.0), 1.0)
+    return (1, 1, capacity, capacity, capacity * crowdiness)
+
+
+def totals(name, sums):
+    rooms, online, capacity, online_capacity, people = sums
+    people = int(round(people))
+    return {
+        "name": name,
+        "rooms": int(rooms),
+        "online": int(online),
+        "offline": int(rooms - online),
+        "capacity": capacity,
+        "online_capacity": online_capacity,
+        "people": people,
+        "free_seats": max(int(online_capacity) - people, 0),
+        "occupancy": round(people / online_capacity, 3) if online_capacity else None,
+    }
+
+
+class OccupancySummary:
+    def __init__(self, offline_after=OFFLINE_AFTER):
+        self.offline_after = offline_after
+        self.rooms = {}       # room_id -> metadata
+        self.live = {}        # room_id -> live_data value
+        self.parts = {}       # room_id -> (contribution, [(path, name)])
+        self.groups = {}      # path -> [name, sums list]
+        self.dirty = set()    # Paths whose totals changed since the last take_changes()
+        self.removed = set()  # Paths with no rooms left
+
+    def _apply(self, room_id, sign):
+        part, groups = self.parts[room_id]
+        for path, name in groups:
+            group = self.groups.setdefault(path, [name, [0] * len(SUMS)])
+            group[1] = [total + sign * value for total, value in zip(group[1], part)]
+            self.dirty.add(path)
+            if group[1][0] <= 0:
+                del self.groups[path]
+                self.removed.add(path)
+
+    def _refresh(self, room_id, now):
+        if room_id in self.parts:
+            self._apply(room_id, -1)
+            del self.parts[room_id]
+        meta = self.rooms.get(room_id)
+        if meta is None:
+            return
+        self.parts[room_id] = (contribution(meta, self.live.get(room_id), now, self.offline_after), room_groups(meta))
+        self._apply(room_id, +1)
+
+    def set_rooms(self, rooms_data, now=None):
+        # Full rebuild: metadata changes move rooms between groups
+        now = now or datetime.now()
+        old_paths = set(self.groups)
+        self.rooms = {room_id: meta for room_id, meta in (rooms_data or {}).items() if isinstance(meta, dict)}
+        self.parts.clear()
+        self.groups.clear()
+        for room_id in self.rooms:
+            self._refresh(room_id, now)
+        self.dirty = set(self.groups)
+        self.removed = old_paths - set(self.groups)
+
+    def update_room(self, room_id, live, now=None):
+        # live: the room's live_data value, None when it was removed
+        if live is None:
+            self.live.pop(room_id, None)
+        else:
+            self.live[room_id] = live
+        self._refresh(room_id, now or datetime.now())
+
+    def expire(self, now=None):
+        # Rooms whose value got too old without a new write go offline here
+        now = now or datetime.now()
+        changed = 0
+        for room_id, (part, _) in list(self.parts.items()):
+            online = is_online(self.live.get(room_id), now, self.offline_after)
+            if online != bool(part[1]):
+                self._refresh(room_id, now)
+                changed += 1
+        return changed
+
+    def document(self):
+        # The whole summary, e.g. for a first write
+        doc = {}
+        for path, (name, sums) in self.groups.items():
+            node = doc
+            *branches, leaf = path.split("/")
+            for branch in branches:
+                node = node.setdefault(branch, {})
+            node[leaf] = totals(name, sums)
+        return doc
+
+    def take_changes(self):
+        # -> {summary path: totals or None} since the last call
+        updates = {f"summary/{path}": totals(*self.groups[path]) for path in self.dirty if path in self.groups}
+        updates.update({f"summary/{path}": None for path in self.removed if path not in self.groups})
+        self.dirty.clear()
+        self.removed.clear()
+        return updates
+
+
+class SummaryJob:
+    def __init__(self, database, writer, feed, summary=None):
+        self.database = database
+        self.writer = writer
+        self.feed = feed
+        self.summary = summary or OccupancySummary()
+        self.seen_versions = {}
+        self.rooms_loaded_at = None
+        self.stats = {"room_updates": 0, "expired": 0, "writes": 0, "paths_written": 0, "rebuilds": 0}
+
+    def sync(self, now=None):
+        # One pass: reload rooms/ when due, apply the rooms that changed in the feed,
+        # expire silent rooms and queue the totals that moved. -> paths queued
+        now = now or datetime.now()
+        clock = time.monotonic()
+        # Versions before the snapshot: a change landing in between is applied twice, never missed
+        versions = self.feed.room_versions(self.feed.snapshot().keys() | self.seen_versions.keys())
+        snapshot = self.feed.snapshot()
+        if self.rooms_loaded_at is None or clock - self.rooms_loaded_at >= ROOMS_REFRESH:
+            self.summary.live = dict(snapshot)
+            self.summary.set_rooms(self.database.reference("rooms").get() or {}, now)
+            self.rooms_loaded_at = clock
+            self.stats["rebuilds"] += 1
+        else:
+            for room_id, version in versions.items():
+                if self.seen_versions.get(room_id) != version:
+                    self.summary.update_room(room_id, snapshot.get(room_id), now)
+                    self.stats["room_updates"] += 1
+            self.stats["expired"] += self.summary.expire(now)
+        self.seen_versions = versions
+
+        updates = self.summary.take_changes()
+        if updates:
+            updates["summary/generated_at"] = now.isoformat()
+            self.writer.write_paths(updates)
+            self.stats["writes"] += 1
+            self.stats["paths_written"] += len(updates)
+        return len(updates)
+
+    def run(self, publish_every=PUBLISH_EVERY, once=False):
+        version = None
+        while True:
+            start = time.monotonic()
+            self.sync()
+            if once:
+                return
+            # Sleep until live_data changes, at most publish_every; then batch for the rest
+            version = self.feed.wait_for_change(version, timeout=publish_every)
+            time.sleep(max(0.0, publish_every - (time.monotonic() - start)))
+
+
+if __name__ == "__main__":
+    import storage
+    from firebase_writer import BatchedWriter
+    from live_stream import LiveFeed
+
+    db = storage.connect()
+    feed = LiveFeed(db).start()
+    if not feed.healthy:
+        sys.exit(f"❌ Could not listen to live_data: {feed.error}")
+    # The first pass needs the listener's initial snapshot
+    deadline = time.monotonic() + 30
+    while not feed.ready and time.monotonic() < deadline:
+        time.sleep(0.1)
+    writer = BatchedWriter(db).start()
+    job = SummaryJob(db, writer, feed)
+    try:
+        job.run(once="--once" in sys.argv)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        feed.close()
+        writer.stop()
+        print(f"🏢 Summary job: {job.stats}")
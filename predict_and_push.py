@@ -1,61 +1,50 @@
 import time
 import subprocess
-import joblib
-import pandas as pd
-import firebase_admin
-from firebase_admin import credentials, db
-from collections import deque
 from datetime import datetime
 import uuid
 
+import storage
+from history import session_index_entry, session_index_path
+from model_registry import ModelHandle
+from publish_policy import PublishPolicy
+from rolling_stats import SensorWindow
+from serial_protocol import FrameParser
+from spool import Spool, SpoolWriter, spool_dir
+
 # CONFIG — change this as needed
 ROOM_ID = "room01"  # 🔁 Match with one of the static sample rooms
 SESSION_ID = f"session_{datetime.now().strftime('%Y%m%d_%H%M%S')}"  # Unique session per run
 
-# Firebase setup
-cred = credentials.Certificate("serviceAccountKey.json")
-firebase_admin.initialize_app(cred, {
-    'databaseURL': 'https://campus-spacescout-default-rtdb.europe-west1.firebasedatabase.app/'
-})
+# Database setup (SPACESCOUT_DB picks firebase/memory/sqlite, see storage.py)
+db = storage.connect()
 
-# Load AI model
-model = joblib.load("owl_model.pkl")
+# Load AI model (models/ registry if published, else owl_model.pkl); a newly
+# published version is picked up by poll() without restarting
+model = ModelHandle()
 
 # Init rolling buffer
-motion_buffer = deque(maxlen=300)
-sound_buffer = deque(maxlen=300)
-co2_buffer = deque(maxlen=300)
+sensor_window = SensorWindow(300)
+parser = FrameParser()
 
-# Firebase references
-session_root = db.reference(f"sessions/{ROOM_ID}/{SESSION_ID}")
-live_data_ref = db.reference(f"live_data/{ROOM_ID}")
+# Every write goes to the local spool first (spool/{ROOM_ID}, one per room) and is uploaded
+# in the background, so the serial loop never waits on the network and an outage loses
+# no data points. A second process for the same room stops here with SpoolBusy.
+writer = SpoolWriter(db, Spool(spool_dir(ROOM_ID))).start()
+policy = PublishPolicy()
 
 # Write session metadata
-session_root.update({
-    "room_id": ROOM_ID,
-    "started_at": datetime.now().isoformat()
+started_at = datetime.now().isoformat()
+writer.write_paths({
+    f"sessions/{ROOM_ID}/{SESSION_ID}/room_id": ROOM_ID,
+    f"sessions/{ROOM_ID}/{SESSION_ID}/started_at": started_at,
+    session_index_path(ROOM_ID): session_index_entry(SESSION_ID, started_at),
 })
 
 # Start fake serial stream (or real later)
 process = subprocess.Popen(["python", "simulate_serial.py"], stdout=subprocess.PIPE, text=True)
 
-def parse_line(line):
-    try:
-        parts = line.strip().split(";")
-        m = int(parts[0].split(":")[1])
-        s = float(parts[1].split(":")[1])
-        c = float(parts[2].split(":")[1])
-        return m, s, c
-    except:
-        return None
-
-def predict_crowdiness(motion_rate, avg_sound, avg_co2):
-    X = pd.DataFrame([{
-        "motion_rate": motion_rate,
-        "avg_sound": avg_sound,
-        "avg_co2": avg_co2
-    }])
-    return round(float(model.predict(X)[0]), 3)
+def predict_crowdiness(engine, motion_rate, avg_sound, avg_co2):
+    return engine.predict_one(motion_rate, avg_sound, avg_co2)
 
 # --- Main loop ---
 last_push = time.time()
@@ -63,40 +52,45 @@ last_push = time.time()
 try:
     while True:
         line = process.stdout.readline()
-        parsed = parse_line(line)
+        parsed = parser.parse_line(line)
         if parsed:
-            m, s, c = parsed
-            motion_buffer.append(m)
-            sound_buffer.append(s)
-            co2_buffer.append(c)
+            sensor_window.append(*parsed)
 
         now = time.time()
-        if now - last_push >= 10 and len(motion_buffer) >= 10:
-            motion_rate = sum(motion_buffer) / len(motion_buffer)
-            avg_sound = sum(sound_buffer) / len(sound_buffer)
-            avg_co2 = sum(co2_buffer) / len(co2_buffer)
-            crowdiness = predict_crowdiness(motion_rate, avg_sound, avg_co2)
+        if now - last_push >= 10 and len(sensor_window) >= 10:
+            features = sensor_window.features()
+            motion_rate = features["motion_rate"]
+            avg_sound = features["avg_sound"]
+            avg_co2 = features["avg_co2"]
+            model.poll()
+            engine, model_version = model.active
+            crowdiness = predict_crowdiness(engine, motion_rate, avg_sound, avg_co2)
 
             data_point = {
                 "motion_rate": round(motion_rate, 3),
                 "avg_sound": round(avg_sound, 1),
                 "avg_co2": round(avg_co2, 1),
                 "crowdiness_index": crowdiness,
+                "model_version": model_version,
                 "timestamp": datetime.now().isoformat()
             }
 
-            # Save in session log
+            # Session log + live data, only when something changed or a heartbeat is due
             timestamp_key = datetime.now().strftime("%Y%m%d%H%M%S")
-            session_root.child("data").child(timestamp_key).set(data_point)
-
-            # Update live data
-            live_data_ref.set(data_point)
+            wrote_session, wrote_live = policy.publish(writer, ROOM_ID, SESSION_ID, timestamp_key, data_point)
 
-            print(f"🔥 Pushed to Firebase: {data_point}")
+            if wrote_session or wrote_live:
+                print(f"🔥 Spooled for Firebase (session={wrote_session}, live={wrote_live}): {data_point}")
+            else:
+                print(f"💤 Unchanged, skipped: {data_point}")
             last_push = now
 
 except KeyboardInterrupt:
     print("🛑 Session interrupted.")
-    session_root.update({
-        "ended_at": datetime.now().isoformat()
-    })
+    writer.write_paths({f"sessions/{ROOM_ID}/{SESSION_ID}/ended_at": datetime.now().isoformat()})
+    writer.stop()
+    print(f"📟 Serial frames: {parser.stats()}")
+    print(f"📤 Published: {policy.stats}")
+    print(f"📼 Spool: {writer.stats}")
+finally:
+    process.terminate()
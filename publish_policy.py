@@ -0,0 +1,121 @@
+import time
+from datetime import datetime, timedelta
+
+# Decides which aggregates are worth a database write. A room that sits empty all
+# night produces the same point every 10 seconds; only changes (and a periodic
+# heartbeat) are published:
+#
+# - live_data/{room} is written when crowdiness moves by LIVE_DEADBAND or more since
+#   the last published value, or LIVE_HEARTBEAT seconds have passed.
+# - sessions/.../data is delta-encoded: a point is stored when any field moves past
+#   its deadband, plus a keyframe every KEYFRAME_EVERY seconds. Readers treat the
+#   series as a step function — each stored value holds until the next point, for
+#   at most HOLD_SECONDS (a longer gap means the room was offline) — and
+#   expand_steps() turns it back into one point per SAMPLE_INTERVAL for charts
+#   and rollups.
+
+SAMPLE_INTERVAL = 10            # Seconds between aggregates (AGGREGATE_EVERY)
+LIVE_DEADBAND = 0.05            # Crowdiness change that updates live_data
+LIVE_HEARTBEAT = 120            # Seconds; 0 publishes every point
+KEYFRAME_EVERY = 300            # Seconds between stored points while nothing changes
+HOLD_SECONDS = KEYFRAME_EVERY + 2 * SAMPLE_INTERVAL
+DEADBANDS = {
+    "crowdiness_index": 0.02,
+    "motion_rate": 0.05,
+    "avg_sound": 1.0,
+    "avg_co2": 15.0,
+}
+TAGS = ("model_version",)       # Any change is stored, so held values keep the right tag
+
+
+class PublishPolicy:
+    def __init__(self, live_deadband=LIVE_DEADBAND, live_heartbeat=LIVE_HEARTBEAT,
+                 deadbands=None, keyframe_every=KEYFRAME_EVERY, clock=time.monotonic):
+        self.live_deadband = live_deadband
+        self.live_heartbeat = live_heartbeat
+        self.deadbands = DEADBANDS if deadbands is None else deadbands
+        self.keyframe_every = keyframe_every
+        self.clock = clock
+        self.last_live = {}       # room_id -> (crowdiness, published at)
+        self.last_session = {}    # room_id -> (data point, stored at)
+        self.stats = {"points": 0, "session_writes": 0, "live_writes": 0}
+
+    def _moved(self, old, new):
+        if any(old.get(tag) != new.get(tag) for tag in TAGS):
+            return True
+        for field, deadband in self.deadbands.items():
+            a, b = old.get(field), new.get(field)
+            if a is None or b is None:
+                if a != b:
+                    return True
+            elif abs(b - a) >= deadband:
+                return True
+        return False
+
+    def decide(self, room_id, data_point):
+        # -> (write the session point, write live_data)
+        now = self.clock()
+        self.stats["points"] += 1
+
+        last = self.last_session.get(room_id)
+        write_session = (
+            last is None
+            or now - last[1] >= self.keyframe_every
+            or self._moved(last[0], data_point)
+        )
+        if write_session:
+            self.last_session[room_id] = (data_point, now)
+            self.stats["session_writes"] += 1
+
+        crowdiness = data_point.get("crowdiness_index")
+        live = self.last_live.get(room_id)
+        write_live = (
+            live is None
+            or now - live[1] >= self.live_heartbeat
+            or crowdiness is None or live[0] is None
+            or abs(crowdiness - live[0]) >= self.live_deadband
+        )
+        if write_live:
+            self.last_live[room_id] = (crowdiness, now)
+            self.stats["live_writes"] += 1
+        return write_session, write_live
+
+    def publish(self, writer, room_id, session_id, timestamp_key, data_point):
+        write_session, write_live = self.decide(room_id, data_point)
+        if write_session or write_live:
+            writer.write_point(room_id, session_id, timestamp_key, data_point,
+                               live=write_live, session=write_session)
+        return write_session, write_live
+
+    def reset(self, room_id=None):
+        # Forget what was published, e.g. when a new session starts
+        if room_id is None:
+            self.last_live.clear()
+            self.last_session.clear()
+        else:
+            self.last_live.pop(room_id, None)
+            self.last_session.pop(room_id, None)
+
+
+def expand_steps(points, interval=SAMPLE_INTERVAL, hold=HOLD_SECONDS, until=None):
+    # Delta-encoded points (oldest first) -> one point per interval, each a copy of
+    # the last stored value with its own timestamp. A value is held until the next
+    # point, `hold` seconds or `until` (datetime, exclusive), whichever comes first.
+    expanded = []
+    times = [datetime.fromisoformat(point["timestamp"]) for point in points]
+    step = timedelta(seconds=interval)
+    for i, (point, start) in enumerate(zip(points, times)):
+        end = start + timedelta(seconds=hold)
+        if i + 1 < len(times):
+            end = min(end, times[i + 1])
+        elif until is not None:
+            end = min(end, until)
+        else:
+            end = start + step
+        expanded.append(point)
+        moment = start + step
+        # Half a step of slack: aggregates drift a little around the nominal interval
+        while moment + step / 2 < end:
+            expanded.append(dict(point, timestamp=moment.isoformat()))
+            moment += step
+    return expanded
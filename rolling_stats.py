@@ -0,0 +1,148 @@
+import math
+from array import array
+
+# Rolling window statistics shared by predict_and_push.py, serial_listener.py and
+# ingest_service.py. Samples live in a fixed-size array('d') ring buffer (8 bytes
+# per sample instead of a boxed float per deque slot) and mean/variance are kept
+# up to date incrementally, so every append is O(1) regardless of window size.
+
+RESYNC_EVERY = 4096  # Appends between exact recomputations, bounds float drift
+
+
+class RollingWindow:
+    def __init__(self, size, ewma_alpha=0.1):
+        if size < 1:
+            raise ValueError("size must be at least 1")
+        self.size = size
+        self.ewma_alpha = ewma_alpha
+        self.values = array("d", bytes(8 * size))
+        self.count = 0
+        self.head = 0          # Next slot to write
+        self._mean = 0.0
+        self._m2 = 0.0         # Sum of squared deviations from the mean (Welford)
+        self._min = math.inf
+        self._max = -math.inf
+        self._extremes_stale = False
+        self._since_resync = 0
+        self.ewma = None
+
+    def __len__(self):
+        return self.count
+
+    def append(self, x):
+        x = float(x)
+        if self.count < self.size:
+            self.values[self.head] = x
+            self.count += 1
+            delta = x - self._mean
+            self._mean += delta / self.count
+            self._m2 += delta * (x - self._mean)
+        else:
+            old = self.values[self.head]
+            self.values[self.head] = x
+            old_mean = self._mean
+            self._mean += (x - old) / self.count
+            self._m2 += (x - old) * (x - self._mean + old - old_mean)
+            # Only a full rescan can find the next extreme once the current one leaves
+            if old == self._min or old == self._max:
+                self._extremes_stale = True
+        self.head = (self.head + 1) % self.size
+
+        if x < self._min:
+            self._min = x
+        if x > self._max:
+            self._max = x
+        self.ewma = x if self.ewma is None else self.ewma + self.ewma_alpha * (x - self.ewma)
+
+        self._since_resync += 1
+        if self._since_resync >= RESYNC_EVERY:
+            self.resync()
+
+    def window(self):
+        # Samples in insertion order, oldest first
+        if self.count < self.size:
+            return self.values[:self.count]
+        return self.values[self.head:] + self.values[:self.head]
+
+    def resync(self):
+        data = self.window()
+        n = len(data)
+        self._since_resync = 0
+        if not n:
+            return
+        self._mean = math.fsum(data) / n
+        self._m2 = math.fsum((v - self._mean) ** 2 for v in data)
+
+    def _refresh_extremes(self):
+        data = self.window()
+        self._min = min(data)
+        self._max = max(data)
+        self._extremes_stale = False
+
+    def mean(self):
+        if not self.count:
+            raise ValueError("mean of empty window")
+        return self._mean
+
+    def variance(self):
+        # Population variance, like numpy's default
+        if not self.count:
+            raise ValueError("variance of empty window")
+        return max(self._m2, 0.0) / self.count
+
+    def std(self):
+        return math.sqrt(self.variance())
+
+    def min(self):
+        if not self.count:
+            raise ValueError("min of empty window")
+        if self._extremes_stale:
+            self._refresh_extremes()
+        return self._min
+
+    def max(self):
+        if not self.count:
+            raise ValueError("max of empty window")
+        if self._extremes_stale:
+            self._refresh_extremes()
+        return self._max
+
+    def summary(self):
+        return {
+            "mean": self.mean(),
+            "variance": self.variance(),
+            "min": self.min(),
+            "max": self.max(),
+            "ewma": self.ewma,
+        }
+
+
+# --- Motion/sound/CO2 window used by every ingest script ---
+class SensorWindow:
+    def __init__(self, size=300, ewma_alpha=0.1):
+        self.motion = RollingWindow(size, ewma_alpha)
+        self.sound = RollingWindow(size, ewma_alpha)
+        self.co2 = RollingWindow(size, ewma_alpha)
+
+    def __len__(self):
+        return len(self.motion)
+
+    def append(self, motion, sound, co2):
+        self.motion.append(motion)
+        self.sound.append(sound)
+        self.co2.append(co2)
+
+    def features(self):
+        # Same values the model was trained on: plain means over the window
+        return {
+            "motion_rate": self.motion.mean(),
+            "avg_sound": self.sound.mean(),
+            "avg_co2": self.co2.mean(),
+        }
+
+    def summary(self):
+        return {
+            "motion": self.motion.summary(),
+            "sound": self.sound.summary(),
+            "co2": self.co2.summary(),
+        }
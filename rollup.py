@@ -0,0 +1,298 @@
+import sys
+import time
+from datetime import datetime, timedelta
+
+from history import KEY_FORMAT, timestamp_key
+from publish_policy import HOLD_SECONDS, expand_steps
+
+# Downsampling tier for session data. Raw points stay where they are
+# (sessions/{room}/{session}/data/{key}, one every 10 s); this job writes closed
+# time buckets next to them:
+#
+#   rollups/{room}/{resolution}/{bucket_key} = {
+#       "timestamp": <bucket start, ISO>, "count": n,
+#       "crowdiness_index": mean, "crowdiness_index_min": .., "crowdiness_index_max": ..,
+#       "motion_rate": mean, ..., "avg_sound": mean, ..., "avg_co2": mean, ...
+#   }
+#   rollups/{room}/_state = {"1m": <next bucket to build>, ..., "session": <session id>}
+#   rollups/{room}/_dirty/{minute_key} = true
+#
+# Bucket keys use the raw key format, so the dashboard reads a window with the same
+# order_by_key().start_at(...) query, and the mean fields carry the raw names so a
+# bucket can be charted like a raw point. Only closed buckets are written; raw
+# points older than RAW_RETENTION (and already rolled up) are pruned. Raw points
+# are delta-encoded (publish_policy.py), so they are expanded back to one point per
+# RAW_INTERVAL before aggregating; otherwise a quiet hour would count as one sample.
+#
+# Late points: a minute is closed CLOSE_GRACE after it ends, and the watermark only
+# moves past closed minutes. A point written later than that (a spool replay after
+# an outage, a retried batch) lands behind the watermark, so the writers add a
+# _dirty mark for its minute in the same update() (dirty_marks()). The next pass
+# rebuilds every marked minute from raw points, across all sessions, and the closed
+# 15m/1h buckets that contain it, then clears the marks. Minutes older than
+# RAW_RETENTION are dropped instead: their other raw points may already be pruned.
+
+RESOLUTIONS = {"1m": 60, "15m": 15 * 60, "1h": 60 * 60}
+FIELDS = ["crowdiness_index", "motion_rate", "avg_sound", "avg_co2"]
+RAW_INTERVAL = 10                 # Seconds between raw points
+RAW_MAX_SPAN = 30 * 60            # Windows up to this long always chart raw points
+RAW_RETENTION = timedelta(days=7)
+ROLLUP_EVERY = 60                 # Seconds between job runs
+CLOSE_GRACE = 30                  # Seconds after a minute ends before it is rolled up
+PAGE_SIZE = 1000                  # Raw points per read/delete page
+CHART_WIDTH = 700                 # Pixels, matches the dashboard chart
+PX_PER_POINT = 4
+
+
+def bucket_start(moment, seconds):
+    epoch = datetime(moment.year, moment.month, moment.day)
+    offset = (moment - epoch).total_seconds()
+    return epoch + timedelta(seconds=offset - offset % seconds)
+
+
+def parse_key(key):
+    return datetime.strptime(key, KEY_FORMAT)
+
+
+def dirty_marks(updates, now=None):
+    # Writer side: {path: value} about to be written -> the _dirty marks for raw
+    # points whose minute may already be rolled up (it closed before this upload)
+    closed = timestamp_key(bucket_start((now or datetime.now()) - timedelta(seconds=CLOSE_GRACE),
+                                        min(RESOLUTIONS.values())))
+    marks = {}
+    for path in updates:
+        parts = path.split("/")
+        if len(parts) != 5 or parts[0] != "sessions" or parts[3] != "data" or parts[4] >= closed:
+            continue
+        try:
+            minute = timestamp_key(bucket_start(parse_key(parts[4]), min(RESOLUTIONS.values())))
+        except ValueError:
+            continue  # Not a timestamp key, nothing to roll up; never block the upload
+        marks[f"rollups/{parts[1]}/_dirty/{minute}"] = True
+    return marks
+
+
+def pick_resolution(span_seconds, chart_width=CHART_WIDTH, px_per_point=PX_PER_POINT):
+    # Finest resolution whose point count still fits the chart; None means raw points.
+    # Short windows keep raw points even if they overflow the chart a little: the
+    # newest minute is never rolled up, so a 1m chart would trail the live value.
+    max_points = max(chart_width // px_per_point, 1)
+    if span_seconds <= RAW_MAX_SPAN or span_seconds / RAW_INTERVAL <= max_points:
+        return None
+    for name, seconds in sorted(RESOLUTIONS.items(), key=lambda item: item[1]):
+        if span_seconds / seconds <= max_points:
+            return name
+    return max(RESOLUTIONS, key=RESOLUTIONS.get)
+
+
+def aggregate(points, start):
+    # Raw points -> one bucket
+    bucket = {"timestamp": start.isoformat(), "count": len(points)}
+    for field in FIELDS:
+        values = [p[field] for p in points if isinstance(p.get(field), (int, float))]
+        if not values:
+            continue
+        bucket[field] = round(sum(values) / len(values), 3)
+        bucket[f"{field}_min"] = min(values)
+        bucket[f"{field}_max"] = max(values)
+    return bucket
+
+
+def combine(buckets, start):
+    # Finer buckets -> one coarser bucket (count-weighted means)
+    total = sum(b.get("count", 0) for b in buckets)
+    bucket = {"timestamp": start.isoformat(), "count": total}
+    for field in FIELDS:
+        parts = [b for b in buckets if field in b and b.get("count")]
+        if not parts:
+            continue
+        weight = sum(b["count"] for b in parts)
+        bucket[field] = round(sum(b[field] * b["count"] for b in parts) / weight, 3)
+        bucket[f"{field}_min"] = min(b[f"{field}_min"] for b in parts)
+        bucket[f"{field}_max"] = max(b[f"{field}_max"] for b in parts)
+    return bucket
+
+
+class RollupJob:
+    def __init__(self, database, retention=RAW_RETENTION):
+        self.database = database
+        self.retention = retention
+        self.stats = {"raw_points_read": 0, "buckets_written": 0, "raw_points_pruned": 0,
+                      "late_minutes": 0, "late_minutes_expired": 0}
+
+    def _session_ids(self, room_id):
+        return sorted(self.database.reference(f"sessions/{room_id}").get(shallow=True) or {})
+
+    def _read_raw(self, room_id, session_ids, start_key, end_key):
+        # Raw points with start_key <= key < end_key across the given sessions, expanded
+        # to one per RAW_INTERVAL; reading starts HOLD_SECONDS early for a held value
+        read_from = None
+        if start_key is not None:
+            read_from = timestamp_key(parse_key(start_key) - timedelta(seconds=HOLD_SECONDS))
+        points = {}
+        for session_id in session_ids:
+            query = self.database.reference(f"sessions/{room_id}/{session_id}/data").order_by_key()
+            if read_from is not None:
+                query = query.start_at(read_from)
+            chunk = query.end_at(end_key).get() or {}
+            chunk.pop(end_key, None)
+            self.stats["raw_points_read"] += len(chunk)
+            stored = [chunk[key] for key in sorted(chunk)]
+            for point in expand_steps(stored, RAW_INTERVAL, until=parse_key(end_key)):
+                key = timestamp_key(datetime.fromisoformat(point["timestamp"]))
+                if (start_key is None or key >= start_key) and key < end_key:
+                    points[key] = point
+        return dict(sorted(points.items()))
+
+    def _group(self, items, seconds):
+        groups = {}
+        for key, value in items.items():
+            groups.setdefault(bucket_start(parse_key(key), seconds), []).append(value)
+        return groups
+
+    def run_room(self, room_id, now=None):
+        # The finest resolution is built from raw points, every coarser one from the
+        # finest buckets, so a pass only reads raw data since the last closed minute
+        # (plus the minutes marked dirty by late writes)
+        now = now or datetime.now()
+        state = self.database.reference(f"rollups/{room_id}/_state").get() or {}
+        all_session_ids = self._session_ids(room_id)
+        if not all_session_ids:
+            return 0
+
+        # Sessions before the one we stopped in are finished and fully rolled up
+        session_ids = all_session_ids
+        if state.get("session"):
+            session_ids = [s for s in session_ids if s >= state["session"]] or session_ids[-1:]
+
+        resolutions = sorted(RESOLUTIONS.items(), key=lambda item: item[1])
+        finest, finest_seconds = resolutions[0]
+        # Closed buckets end at the start of each resolution's current bucket, CLOSE_GRACE
+        # behind the clock so points still in flight are not left behind the watermark
+        closed_at = now - timedelta(seconds=CLOSE_GRACE)
+        ends = {name: timestamp_key(bucket_start(closed_at, seconds)) for name, seconds in resolutions}
+        starts = {name: state.get(name) for name, _ in resolutions}
+
+        updates = {}
+        fine_buckets = {}
+        late = self._late_minutes(room_id, all_session_ids, ends[finest], now, fine_buckets, updates)
+        if starts[finest] is None or starts[finest] < ends[finest]:
+            raw = self._read_raw(room_id, session_ids, starts[finest], ends[finest])
+            for start, points in self._group(raw, finest_seconds).items():
+                # A rebuilt late minute read every session, this pass only the current ones
+                fine_buckets.setdefault(timestamp_key(start), aggregate(points, start))
+            updates[f"rollups/{room_id}/_state/{finest}"] = ends[finest]
+
+        for name, seconds in resolutions[1:]:
+            if starts[name] is not None and starts[name] >= ends[name]:
+                continue
+            query = self.database.reference(f"rollups/{room_id}/{finest}").order_by_key()
+            if starts[name] is not None:
+                query = query.start_at(starts[name])
+            source = query.end_at(ends[name]).get() or {}
+            source.update({k: v for k, v in fine_buckets.items() if starts[name] is None or k >= starts[name]})
+            source = {k: v for k, v in source.items() if k < ends[name]}
+            for start, buckets in self._group(source, seconds).items():
+                updates[f"rollups/{room_id}/{name}/{timestamp_key(start)}"] = combine(buckets, start)
+            updates[f"rollups/{room_id}/_state/{name}"] = ends[name]
+
+        # Closed coarser buckets that contain a rebuilt minute are combined again
+        for name, seconds in resolutions[1:]:
+            for start in sorted({bucket_start(parse_key(key), seconds) for key in late}):
+                start_key = timestamp_key(start)
+                if starts[name] is None or start_key >= starts[name]:
+                    continue  # Built by the pass above, or once it closes
+                end_key = timestamp_key(start + timedelta(seconds=seconds))
+                source = (self.database.reference(f"rollups/{room_id}/{finest}").order_by_key()
+                          .start_at(start_key).end_at(end_key).get() or {})
+                source.pop(end_key, None)
+                source.update({k: v for k, v in fine_buckets.items() if start_key <= k < end_key})
+                updates[f"rollups/{room_id}/{name}/{start_key}"] = combine(list(source.values()), start)
+
+        for key, bucket in fine_buckets.items():
+            updates[f"rollups/{room_id}/{finest}/{key}"] = bucket
+        if not updates:
+            return 0
+        updates[f"rollups/{room_id}/_state/session"] = session_ids[-1]
+
+        self.database.reference("/").update(updates)
+        written = sum(1 for path in updates if "/_state/" not in path and "/_dirty/" not in path)
+        self.stats["buckets_written"] += written
+        return written
+
+    def _late_minutes(self, room_id, session_ids, end_key, now, fine_buckets, updates):
+        # Rebuild the closed minutes marked dirty into fine_buckets and clear their
+        # marks in updates -> the rebuilt minute keys. Open minutes keep their mark.
+        dirty = sorted(self.database.reference(f"rollups/{room_id}/_dirty").get(shallow=True) or {})
+        dirty = [key for key in dirty if key < end_key]
+        if not dirty:
+            return []
+        for key in dirty:
+            updates[f"rollups/{room_id}/_dirty/{key}"] = None
+
+        expired = timestamp_key(now - self.retention)
+        late = [key for key in dirty if key >= expired]
+        self.stats["late_minutes_expired"] += len(dirty) - len(late)
+        if not late:
+            return []
+        # One raw read per hour with dirty minutes, so scattered marks skip the gaps
+        seconds = min(RESOLUTIONS.values())
+        for keys in self._group({key: key for key in late}, 3600).values():
+            raw = self._read_raw(room_id, session_ids, keys[0],
+                                 timestamp_key(parse_key(keys[-1]) + timedelta(seconds=seconds)))
+            groups = self._group(raw, seconds)
+            for key in keys:
+                start = parse_key(key)
+                if start in groups:
+                    fine_buckets[key] = aggregate(groups[start], start)
+        self.stats["late_minutes"] += len(late)
+        return late
+
+    def prune_room(self, room_id, now=None):
+        # Delete raw points past the retention window that every resolution already covers
+        now = now or datetime.now()
+        state = self.database.reference(f"rollups/{room_id}/_state").get() or {}
+        done = [state.get(name) for name in RESOLUTIONS]
+        if any(key is None for key in done):
+            return 0
+        cutoff = min([timestamp_key(now - self.retention)] + done)
+        # Keep one hold period more, the last point before the cutoff may still be in effect
+        cutoff = timestamp_key(parse_key(cutoff) - timedelta(seconds=HOLD_SECONDS))
+
+        pruned = 0
+        for session_id in self._session_ids(room_id):
+            data_ref = self.database.reference(f"sessions/{room_id}/{session_id}/data")
+            while True:
+                page = data_ref.order_by_key().end_at(cutoff).limit_to_first(PAGE_SIZE).get() or {}
+                page.pop(cutoff, None)
+                if not page:
+                    break
+                data_ref.update({key: None for key in page})
+                pruned += len(page)
+                if len(page) < PAGE_SIZE:
+                    break
+        self.stats["raw_points_pruned"] += pruned
+        return pruned
+
+    def run(self, room_ids, now=None):
+        for room_id in room_ids:
+            try:
+                self.run_room(room_id, now)
+                self.prune_room(room_id, now)
+            except Exception as e:
+                print(f"⚠️ Rollup for {room_id} failed: {e}")
+
+
+if __name__ == "__main__":
+    import storage
+
+    db = storage.connect()
+    job = RollupJob(db)
+    once = "--once" in sys.argv
+    while True:
+        room_ids = sorted(db.reference("rooms").get(shallow=True) or {})
+        job.run(room_ids)
+        print(f"🧮 Rollup pass over {len(room_ids)} rooms: {job.stats}")
+        if once:
+            break
+        time.sleep(ROLLUP_EVERY)
@@ -1,47 +1,35 @@
 import subprocess
 import sys
-import pandas as pd
 import time
 from datetime import datetime
-from collections import deque
-import joblib
 
-# ML model load
-model = joblib.load("owl_model.pkl")
+from dataset_store import DatasetWriter
+from model_registry import ModelHandle
+from rolling_stats import SensorWindow
+from serial_protocol import FrameParser
+
+# ML model load (models/ registry if published, else owl_model.pkl), reloaded when a new version is published
+model = ModelHandle()
 
 # Rolling buffer (5 minutes at 1Hz = 300 entries)
 BUFFER_SECONDS = 300
 READ_INTERVAL = 1
 AGGREGATE_EVERY = 10  # seconds
+ROOM_ID = "room01"  # Partition the collected rows are stored under
 
-motion_buffer = deque(maxlen=BUFFER_SECONDS)
-sound_buffer = deque(maxlen=BUFFER_SECONDS)
-co2_buffer = deque(maxlen=BUFFER_SECONDS)
-
-def parse_line(line):
-    try:
-        parts = line.strip().split(";")
-        m = int(parts[0].split(":")[1])
-        s = float(parts[1].split(":")[1])
-        c = float(parts[2].split(":")[1])
-        return m, s, c
-    except:
-        return None
+sensor_window = SensorWindow(BUFFER_SECONDS)
+parser = FrameParser()
 
-def predict_crowdiness(motion_rate, avg_sound, avg_co2):
-    features = pd.DataFrame([{
-    "motion_rate": motion_rate,
-    "avg_sound": avg_sound,
-    "avg_co2": avg_co2}])
-    prediction = model.predict(features)[0]
-    return round(float(prediction), 3)
+def predict_crowdiness(engine, motion_rate, avg_sound, avg_co2):
+    return engine.predict_one(motion_rate, avg_sound, avg_co2)
 
 def main():
     # Launch the simulation script
     process = subprocess.Popen([sys.executable, "simulate_serial.py"], stdout=subprocess.PIPE, text=True)
 
     last_aggregation = time.time()
-    dataset = []
+    # Rows are flushed to dataset/ every minute while collecting, not only on exit
+    dataset = DatasetWriter(ROOM_ID)
 
     try:
         while True:
@@ -49,43 +37,37 @@ def main():
             if not line:
                 break
 
-            parsed = parse_line(line)
+            parsed = parser.parse_line(line)
             if parsed:
-                m, s, c = parsed
-                motion_buffer.append(m)
-                sound_buffer.append(s)
-                co2_buffer.append(c)
+                sensor_window.append(*parsed)
 
             now = time.time()
-            if now - last_aggregation >= AGGREGATE_EVERY and len(motion_buffer) >= 10:
-                motion_rate = sum(motion_buffer) / len(motion_buffer)
-                avg_sound = sum(sound_buffer) / len(sound_buffer)
-                avg_co2 = sum(co2_buffer) / len(co2_buffer)
-                crowdiness = predict_crowdiness(motion_rate, avg_sound, avg_co2)
+            if now - last_aggregation >= AGGREGATE_EVERY and len(sensor_window) >= 10:
+                features = sensor_window.features()
+                motion_rate = features["motion_rate"]
+                avg_sound = features["avg_sound"]
+                avg_co2 = features["avg_co2"]
+                model.poll()
+                engine, model_version = model.active
+                crowdiness = predict_crowdiness(engine, motion_rate, avg_sound, avg_co2)
 
                 row = {
                     "timestamp": datetime.now().isoformat(),
                     "motion_rate": round(motion_rate, 3),
                     "avg_sound": round(avg_sound, 1),
                     "avg_co2": round(avg_co2, 1),
-                    "crowdiness_index": crowdiness
+                    "crowdiness_index": crowdiness,
+                    "model_version": model_version
                 }
                 dataset.append(row)
                 print(row)
                 last_aggregation = now
 
     except KeyboardInterrupt:
-        print("Stopped. Appending to CSV...")
-
-        csv_file = "crowdiness_dataset.csv"
-        try:
-            df_existing = pd.read_csv(csv_file)
-            df_combined = pd.concat([df_existing, pd.DataFrame(dataset)], ignore_index=True)
-        except FileNotFoundError:
-            df_combined = pd.DataFrame(dataset)
-
-        df_combined.to_csv(csv_file, index=False)
-        print(f"✅ Appended {len(dataset)} rows. Total rows now: {len(df_combined)}")
+        print(f"Stopped. Serial frames: {parser.stats()}")
+    finally:
+        dataset.close()
+        print(f"✅ Stored {dataset.stats['rows']} rows in {dataset.stats['files']} files under {dataset.root}/room={ROOM_ID}")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,153 @@
+import re
+from functools import reduce
+from operator import xor
+
+# Sensor line protocol shared by every ingest script.
+#
+#   M:<motion>;S:<sound>;C:<co2>[;Q:<seq>][*<checksum>]\n
+#
+# Q is an optional sequence number (wrapping at SEQ_MODULO) used to spot dropped
+# samples. A jump of more than MAX_SEQ_GAP, which includes going backwards or
+# repeating a number, is a resync (the sensor rebooted, or was gone so long that
+# counting makes no sense): it is counted on its own, not as ~65k drops. The
+# optional checksum is the two-digit hex XOR of every byte before the '*', NMEA
+# style. Parsing works on raw bytes. FrameParser.feed() takes whole
+# read() buffers (keeping a partial trailing line for the next call): a buffer of
+# well-formed frames is validated by one regex pass and converted with a single
+# split, and only buffers containing checksums or bad frames fall back to the
+# line-by-line path. Malformed frames are counted, not silently ignored.
+
+SEQ_MODULO = 65536
+MAX_SEQ_GAP = 3600  # Missing samples still counted as drops (an hour at 1 Hz)
+MAX_LINE = 256  # Longer runs without a newline are treated as garbage
+
+_NUMBER = rb"(-?\d+(?:\.\d*)?)"
+FRAME_RE = re.compile(
+    rb"\s*M:(\d+);S:" + _NUMBER + rb";C:" + _NUMBER +
+    rb"(?:;Q:(\d+))?(?:\*([0-9A-Fa-f]{2}))?\s*"
+)
+
+# Whole-buffer patterns for the bulk path: every line plain, or every line sequenced
+_BULK_NUMBER = rb"-?\d+(?:\.\d*)?"
+PLAIN_BLOCK_RE = re.compile(rb"(?:M:\d+;S:" + _BULK_NUMBER + rb";C:" + _BULK_NUMBER + rb"\r?\n)*")
+SEQ_BLOCK_RE = re.compile(rb"(?:M:\d+;S:" + _BULK_NUMBER + rb";C:" + _BULK_NUMBER + rb";Q:\d+\r?\n)*")
+
+
+def checksum(payload):
+    return reduce(xor, payload, 0)
+
+
+def frame_line(line, seq=None, with_checksum=False):
+    # Add the optional sequence/checksum fields to an "M:..;S:..;C:.." line
+    if seq is not None:
+        line += f";Q:{seq % SEQ_MODULO}"
+    if with_checksum:
+        line += f"*{checksum(line.encode()):02X}"
+    return line
+
+
+def encode_frame(motion, sound, co2, seq=None, with_checksum=False):
+    return frame_line(f"M:{motion};S:{sound};C:{co2}", seq, with_checksum)
+
+
+def parse_frame(line):
+    # -> (motion, sound, co2, seq, checksum_ok) or None when the frame is malformed
+    if isinstance(line, str):
+        line = line.encode()
+    match = FRAME_RE.fullmatch(line)
+    if match is None:
+        return None
+    m, s, c, seq, check = match.groups()
+    checksum_ok = True
+    if check is not None:
+        body = line.strip()
+        checksum_ok = checksum(body[:body.rindex(b"*")]) == int(check, 16)
+    return int(m), float(s), float(c), (int(seq) if seq is not None else None), checksum_ok
+
+
+def parse_line(line):
+    # Drop-in for the old parse_line(): (motion, sound, co2) or None
+    frame = parse_frame(line)
+    if frame is None or not frame[4]:
+        return None
+    return frame[0], frame[1], frame[2]
+
+
+class FrameParser:
+    def __init__(self):
+        self.partial = b""
+        self.frames = 0
+        self.malformed = 0
+        self.checksum_errors = 0
+        self.dropped = 0           # Samples missing according to the sequence field
+        self.resyncs = 0           # Sequence restarts, backwards jumps and repeats
+        self.last_seq = None
+
+    def parse_line(self, line):
+        frame = parse_frame(line)
+        if frame is None:
+            if line.strip():
+                self.malformed += 1
+            return None
+        m, s, c, seq, checksum_ok = frame
+        if not checksum_ok:
+            self.checksum_errors += 1
+            return None
+        if seq is not None:
+            self._track_sequence((seq,))
+        self.frames += 1
+        return m, s, c
+
+    def _track_sequence(self, seqs):
+        last = self.last_seq
+        for seq in seqs:
+            if last is not None:
+                gap = (seq - last - 1) % SEQ_MODULO
+                if gap > MAX_SEQ_GAP:
+                    self.resyncs += 1
+                else:
+                    self.dropped += gap
+            last = seq
+        self.last_seq = last
+
+    def feed(self, data):
+        # Parse every complete line in `data`; returns a list of (motion, sound, co2)
+        if isinstance(data, str):
+            data = data.encode()
+        data = self.partial + data
+        cut = data.rfind(b"\n") + 1
+        complete, self.partial = data[:cut], data[cut:]
+        if len(self.partial) > MAX_LINE:
+            self.malformed += 1
+            self.partial = b""
+        if not complete:
+            return []
+
+        if PLAIN_BLOCK_RE.fullmatch(complete):
+            tokens = complete.translate(None, b"MSC:\r").replace(b";", b" ").split()
+            samples = list(zip(map(int, tokens[0::3]), map(float, tokens[1::3]), map(float, tokens[2::3])))
+            self.frames += len(samples)
+            return samples
+
+        if SEQ_BLOCK_RE.fullmatch(complete):
+            tokens = complete.translate(None, b"MSCQ:\r").replace(b";", b" ").split()
+            self._track_sequence(map(int, tokens[3::4]))
+            samples = list(zip(map(int, tokens[0::4]), map(float, tokens[1::4]), map(float, tokens[2::4])))
+            self.frames += len(samples)
+            return samples
+
+        samples = []
+        for line in complete.split(b"\n"):
+            sample = self.parse_line(line)
+            if sample is not None:
+                samples.append(sample)
+        return samples
+
+    def stats(self):
+        return {
+            "frames": self.frames,
+            "malformed": self.malformed,
+            "checksum_errors": self.checksum_errors,
+            "dropped": self.dropped,
+            "resyncs": self.resyncs,
+        }
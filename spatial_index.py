@@ -0,0 +1,108 @@
+import math
+
+import numpy as np
+
+# Spatial index over rooms/ metadata, built once and reused by every rerun.
+# Coordinates live in NumPy arrays, so distances to all rooms are one vectorized
+# haversine pass; a coarse lat/lng grid answers "within N metres" by looking only
+# at nearby cells. geopy's ellipsoidal geodesic() is used just for the short list
+# that is actually shown.
+
+EARTH_RADIUS_KM = 6371.0088
+CELL_DEG = 0.005            # Grid cell size, roughly 550 m north-south
+
+
+def haversine_km(lat, lng, lats, lngs):
+    lat1, lng1 = math.radians(lat), math.radians(lng)
+    lat2, lng2 = np.radians(lats), np.radians(lngs)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def geodesic_km(origin, lat, lng):
+    from geopy.distance import geodesic
+
+    return geodesic(origin, (lat, lng)).km
+
+
+class RoomIndex:
+    def __init__(self, rooms_data, cell_deg=CELL_DEG):
+        ids, lats, lngs = [], [], []
+        for room_id, room in (rooms_data or {}).items():
+            coords = room.get("location", {}) or {}
+            lat, lng = coords.get("lat"), coords.get("lng")
+            if not lat or not lng:
+                continue
+            ids.append(room_id)
+            lats.append(float(lat))
+            lngs.append(float(lng))
+
+        self.ids = ids
+        self.positions = {room_id: i for i, room_id in enumerate(ids)}
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.lngs = np.asarray(lngs, dtype=np.float64)
+        self.cell_deg = cell_deg
+
+        self.cells = {}
+        for i, (lat, lng) in enumerate(zip(lats, lngs)):
+            self.cells.setdefault(self._cell(lat, lng), []).append(i)
+        self.cells = {cell: np.asarray(members) for cell, members in self.cells.items()}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _cell(self, lat, lng):
+        return (math.floor(lat / self.cell_deg), math.floor(lng / self.cell_deg))
+
+    def distances_km(self, lat, lng):
+        # Haversine distance to every indexed room, aligned with self.ids
+        return haversine_km(lat, lng, self.lats, self.lngs)
+
+    def _refine(self, origin, candidates):
+        return [(self.ids[i], geodesic_km(origin, self.lats[i], self.lngs[i])) for i in candidates]
+
+    def nearest(self, lat, lng, k=5, allowed=None, exact=True):
+        # k closest rooms as [(room_id, km)], optionally only among `allowed` ids
+        distances = self.distances_km(lat, lng)
+        if allowed is not None:
+            mask = np.zeros(len(self.ids), dtype=bool)
+            mask[[self.positions[r] for r in allowed if r in self.positions]] = True
+            distances = np.where(mask, distances, np.inf)
+
+        # Over-fetch a little: the exact distance can reorder near-ties
+        shortlist = min(len(self.ids), 2 * k)
+        if not shortlist:
+            return []
+        candidates = np.argpartition(distances, shortlist - 1)[:shortlist]
+        candidates = [i for i in candidates if np.isfinite(distances[i])]
+        if exact:
+            results = self._refine((lat, lng), candidates)
+        else:
+            results = [(self.ids[i], float(distances[i])) for i in candidates]
+        return sorted(results, key=lambda item: item[1])[:k]
+
+    def within(self, lat, lng, radius_m, exact=True):
+        # Rooms within radius_m metres as [(room_id, km)], nearest first
+        radius_km = radius_m / 1000
+        lat_span = radius_km / 111.0 / self.cell_deg
+        lng_span = radius_km / (111.0 * max(math.cos(math.radians(lat)), 1e-6)) / self.cell_deg
+        row, col = self._cell(lat, lng)
+        members = [
+            self.cells[(r, c)]
+            for r in range(row - math.ceil(lat_span), row + math.ceil(lat_span) + 1)
+            for c in range(col - math.ceil(lng_span), col + math.ceil(lng_span) + 1)
+            if (r, c) in self.cells
+        ]
+        if not members:
+            return []
+        candidates = np.concatenate(members)
+        distances = haversine_km(lat, lng, self.lats[candidates], self.lngs[candidates])
+
+        if exact:
+            # Small margin so the sphere/ellipsoid difference cannot drop a room at the edge
+            shortlist = candidates[distances <= radius_km * 1.005]
+            results = [(room_id, km) for room_id, km in self._refine((lat, lng), shortlist) if km <= radius_km]
+        else:
+            inside = distances <= radius_km
+            results = [(self.ids[i], float(d)) for i, d in zip(candidates[inside], distances[inside])]
+        return sorted(results, key=lambda item: item[1])
@@ -0,0 +1,485 @@
+import fcntl
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+import zlib
+
+from firebase_writer import BACKOFF_BASE, BACKOFF_MAX, FLUSH_INTERVAL, point_updates
+from rollup import dirty_marks
+
+# Write-ahead spool for the ingest scripts, so a database outage costs nothing but
+# upload delay. Every write lands on local disk first; a background thread uploads
+# it once the database is reachable.
+#
+#   spool/{name}/0000000000000001.log   segment, named after its first sequence number
+#   spool/{name}/ACKED                  last sequence number the database confirmed
+#   spool/{name}/LOCK                   flock held by the process that owns the directory
+#
+# One directory per writing process (spool/room01, spool/ingest, ...): sequence
+# numbers, ACKED and segment cleanup are per directory, so a second process opening
+# the same one gets SpoolBusy instead of silently sharing it.
+# - Each write_paths() call is one record line "<seq> <crc32> <json>\n", handed to
+#   the OS right away (a crashed process loses nothing) and fsynced in groups: after
+#   FSYNC_BATCH records or FSYNC_EVERY seconds, whichever comes first, so a power
+#   loss costs at most that window. The fsync runs on the uploader thread, never in
+#   append(), so a slow disk does not stall the caller (the ingest event loop).
+# - SpoolWriter is a drop-in for BatchedWriter. Its thread reads the records after
+#   ACKED, merges up to BATCH_RECORDS of them into one multi-location update() and
+#   moves ACKED only after the update succeeded. While the database is unreachable
+#   it backs off and the records wait on disk; the read loop never blocks.
+# - Records are path -> value writes keyed by timestamp, so uploading one twice (a
+#   crash between update() and ACKED) leaves the same data behind.
+# - Disk use is bounded by MAX_BYTES (checked when a segment fills up): past it the
+#   oldest segments are deleted, uploaded or not, and counted as dropped.
+# - A torn last line (crash mid-write) fails its checksum and is cut off at start;
+#   records left by an earlier run are uploaded before new ones, and the time to
+#   drain a backlog is reported as the replay rate.
+
+SPOOL_DIR = "spool"
+SEGMENT_BYTES = 4 * 1024 * 1024    # Segment size before a new one is started
+MAX_BYTES = 256 * 1024 * 1024      # Disk budget for all segments
+FSYNC_EVERY = 0.2                  # Seconds of appends that share one fsync
+FSYNC_BATCH = 256                  # ... or this many records, whichever comes first
+BATCH_RECORDS = 200                # Records merged into one update()
+ACKED_FILE = "ACKED"
+LOCK_FILE = "LOCK"
+SEGMENT_SUFFIX = ".log"
+
+
+class SpoolBusy(RuntimeError):
+    pass
+
+
+def spool_dir(name):
+    # Default directory for one writer, e.g. spool_dir("room01") -> spool/room01
+    return os.path.join(SPOOL_DIR, name)
+
+
+def encode_record(seq, updates):
+    payload = json.dumps(updates, separators=(",", ":")).encode()
+    return b"%d %08x %s\n" % (seq, zlib.crc32(payload), payload)
+
+
+def decode_record(line):
+    # -> (seq, updates), or None for a torn or corrupt line
+    if not line.endswith(b"\n"):
+        return None
+    try:
+        seq, crc, payload = line[:-1].split(b" ", 2)
+        if int(crc, 16) != zlib.crc32(payload):
+            return None
+        return int(seq), json.loads(payload)
+    except ValueError:
+        return None
+
+
+# --- Segment files ---
+class Spool:
+    def __init__(self, directory=SPOOL_DIR, segment_bytes=SEGMENT_BYTES, max_bytes=MAX_BYTES,
+                 fsync_every=FSYNC_EVERY, fsync_batch=FSYNC_BATCH):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.max_bytes = max_bytes
+        self.fsync_every = fsync_every
+        self.fsync_batch = fsync_batch
+
+        self.lock = threading.Lock()
+        self.segments = []        # [first_seq, last_seq, bytes], oldest first; the last one is open
+        self.file = None
+        self.retired = []         # Full segment files written but not yet fsynced
+        self.sync_lock = threading.Lock()
+        self.unsynced = 0
+        self.synced_at = time.monotonic()
+        self.cursor = None        # (segment first_seq, byte offset) just past the last acked record
+        self.stats = {"appended": 0, "fsyncs": 0, "dropped": 0, "torn": 0, "recovered": 0}
+
+        os.makedirs(directory, exist_ok=True)
+        self.lock_file = self._take_lock()
+        try:
+            self.acked = self._read_acked()
+            self._recover()
+        except BaseException:
+            self.lock_file.close()
+            raise
+
+    def _take_lock(self):
+        # Released by close() or when the process exits, however it exits
+        lock_file = open(os.path.join(self.directory, LOCK_FILE), "a+")
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.seek(0)
+            owner = lock_file.read().strip() or "?"
+            lock_file.close()
+            raise SpoolBusy(f"Spool {self.directory}/ is in use by another process (pid {owner})")
+        lock_file.seek(0)
+        lock_file.truncate()
+        lock_file.write(f"{os.getpid()}\n")
+        lock_file.flush()
+        return lock_file
+
+    def _path(self, first_seq):
+        return os.path.join(self.directory, f"{first_seq:016d}{SEGMENT_SUFFIX}")
+
+    def _read_acked(self):
+        try:
+            with open(os.path.join(self.directory, ACKED_FILE)) as f:
+                return int(f.read().strip() or 0)
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def _write_acked(self):
+        # Not fsynced: after a crash ACKED may lag, which only re-uploads a few records
+        tmp_path = os.path.join(self.directory, f".{ACKED_FILE}.{uuid.uuid4().hex[:8]}")
+        with open(tmp_path, "w") as f:
+            f.write(f"{self.acked}\n")
+        os.replace(tmp_path, os.path.join(self.directory, ACKED_FILE))
+
+    def _recover(self):
+        names = sorted(name for name in os.listdir(self.directory)
+                       if name.endswith(SEGMENT_SUFFIX) and name[:-len(SEGMENT_SUFFIX)].isdigit())
+        for name in names:
+            path = os.path.join(self.directory, name)
+            first_seq = int(name[:-len(SEGMENT_SUFFIX)])
+            last_seq, good_bytes = first_seq - 1, 0
+            with open(path, "rb") as f:
+                for line in f:
+                    record = decode_record(line)
+                    if record is None:
+                        break
+                    last_seq = record[0]
+                    good_bytes += len(line)
+            if good_bytes < os.path.getsize(path):
+                # Everything after the last intact record goes
+                self.stats["torn"] += 1
+                with open(path, "r+b") as f:
+                    f.truncate(good_bytes)
+            if last_seq < first_seq:
+                os.remove(path)
+                continue
+            self.segments.append([first_seq, last_seq, good_bytes])
+
+        self.next_seq = max(self.segments[-1][1] + 1 if self.segments else 1, self.acked + 1)
+        self._remove_acked()
+        self.stats["recovered"] = self.pending()
+        self._open_segment()
+
+    def _open_segment(self):
+        # Unbuffered: every record is one write() straight to the OS
+        self.file = open(self._path(self.next_seq), "ab", buffering=0)
+        self.segments.append([self.next_seq, self.next_seq - 1, 0])
+
+    def _remove_acked(self):
+        closed = self.segments[:-1] if self.file is not None else list(self.segments)
+        for segment in closed:
+            if segment[1] <= self.acked:
+                self.segments.remove(segment)
+                try:
+                    os.remove(self._path(segment[0]))
+                except FileNotFoundError:
+                    pass
+
+    def _enforce_budget(self):
+        total = sum(segment[2] for segment in self.segments)
+        dropped = 0
+        while total > self.max_bytes and len(self.segments) > 1:
+            first_seq, last_seq, size = self.segments.pop(0)
+            try:
+                os.remove(self._path(first_seq))
+            except FileNotFoundError:
+                pass
+            total -= size
+            lost = last_seq - max(first_seq - 1, self.acked)
+            if lost > 0:
+                dropped += lost
+                self.acked = last_seq
+                self.cursor = None
+        if dropped:
+            self.stats["dropped"] += dropped
+            self._write_acked()
+            print(f"⚠️ Spool over {self.max_bytes / 2**20:.0f} MB, dropped {dropped} oldest records not yet uploaded")
+
+    def append(self, updates):
+        # -> sequence number of the new record
+        with self.lock:
+            seq = self.next_seq
+            line = encode_record(seq, updates)
+            self.file.write(line)
+            self.next_seq += 1
+            segment = self.segments[-1]
+            segment[1] = seq
+            segment[2] += len(line)
+            self.unsynced += 1
+            self.stats["appended"] += 1
+
+            if segment[2] >= self.segment_bytes:
+                # Closed by the next sync(), after its fsync
+                self.retired.append(self.file)
+                self._open_segment()
+                self._enforce_budget()
+        return seq
+
+    def sync_due(self):
+        return self.unsynced >= self.fsync_batch or time.monotonic() - self.synced_at >= self.fsync_every
+
+    def sync(self, force=True):
+        # force=False only syncs after FSYNC_BATCH records or FSYNC_EVERY seconds.
+        # The fsync runs outside self.lock, so appends go on while the disk catches up.
+        with self.sync_lock:
+            with self.lock:
+                if self.file is None or not (force or self.sync_due()):
+                    return
+                retired, self.retired = self.retired, []
+                current = self.file if self.unsynced else None
+                self.unsynced = 0
+                self.synced_at = time.monotonic()
+            for f in retired + ([current] if current else []):
+                os.fsync(f.fileno())
+                self.stats["fsyncs"] += 1
+            for f in retired:
+                f.close()
+
+    def read(self, limit):
+        # -> ([(seq, updates)] oldest first after ACKED, position to pass to ack())
+        with self.lock:
+            records, position = [], self.cursor
+            for first_seq, last_seq, size in self.segments:
+                if last_seq <= self.acked:
+                    continue
+                offset = position[1] if position and position[0] == first_seq else 0
+                with open(self._path(first_seq), "rb") as f:
+                    f.seek(offset)
+                    while len(records) < limit and offset < size:
+                        line = f.readline()
+                        record = decode_record(line)
+                        if record is None:
+                            break
+                        offset += len(line)
+                        if record[0] > self.acked:
+                            records.append(record)
+                position = (first_seq, offset)
+                if len(records) >= limit:
+                    break
+            return records, position
+
+    def ack(self, seq, position=None):
+        # The database has everything up to `seq`; uploaded segments are deleted
+        with self.lock:
+            if seq <= self.acked:
+                return
+            self.acked = seq
+            self.cursor = position
+            self._write_acked()
+            self._remove_acked()
+
+    def pending(self):
+        return self.next_seq - 1 - self.acked
+
+    def disk_bytes(self):
+        with self.lock:
+            return sum(segment[2] for segment in self.segments)
+
+    def close(self):
+        self.sync()
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+            if not self.lock_file.closed:
+                self.lock_file.close()
+
+
+# --- Uploader ---
+class SpoolWriter:
+    def __init__(self, database, spool=None, flush_interval=FLUSH_INTERVAL, batch_records=BATCH_RECORDS,
+                 backoff_base=BACKOFF_BASE, backoff_max=BACKOFF_MAX):
+        self.database = database
+        self.spool = spool if spool is not None else Spool(spool_dir("default"))
+        self.flush_interval = flush_interval
+        self.batch_records = batch_records
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self.condition = threading.Condition()
+        self.stopping = False
+        self.thread = None
+        self.failing_since = None   # monotonic time of the first failed upload of an outage
+        self.replay = None          # [started, records uploaded] while a backlog drains
+        self.counts = {
+            "queued": 0,
+            "written": 0,
+            "uploaded_records": 0,
+            "flushes": 0,
+            "failed_attempts": 0,
+            "replays": 0,
+            "last_flush_ms": 0.0,
+        }
+        self.last_replay = None
+
+        if self.spool.pending():
+            print(f"📼 {self.spool.pending()} records spooled by an earlier run, uploading them first")
+            self.replay = [time.monotonic(), 0]
+
+    @property
+    def stats(self):
+        return {
+            **self.counts,
+            **self.spool.stats,
+            "pending": self.spool.pending(),
+            "spool_bytes": self.spool.disk_bytes(),
+            "last_replay": self.last_replay,
+        }
+
+    # --- Producer side (local disk only) ---
+    def write_paths(self, updates):
+        if not updates:
+            return
+        self.spool.append(updates)
+        self.counts["queued"] += len(updates)
+        if self.spool.unsynced >= self.spool.fsync_batch or (
+                self.failing_since is None and self.spool.pending() >= self.batch_records):
+            with self.condition:
+                self.condition.notify()
+
+    def write_point(self, room_id, session_id, timestamp_key, data_point, live=True, session=True):
+        self.write_paths(point_updates(room_id, session_id, timestamp_key, data_point, live, session))
+
+    def pending(self):
+        return self.spool.pending()
+
+    # --- Consumer side ---
+    def flush(self):
+        # One upload of up to batch_records records -> False if the database refused it
+        records, position = self.spool.read(self.batch_records)
+        if not records:
+            return True
+        batch = {}
+        for _, updates in records:
+            for path, value in updates.items():
+                # Later writes to the same path win, like sequential set() calls would
+                batch.pop(path, None)
+                batch[path] = value
+
+        start = time.perf_counter()
+        try:
+            # Replayed points are usually behind the rollup watermark: mark their minutes
+            self.database.reference("/").update({**batch, **dirty_marks(batch)})
+        except Exception as e:
+            self.counts["failed_attempts"] += 1
+            if self.failing_since is None:
+                self.failing_since = time.monotonic()
+                print(f"⚠️ Upload failed, spooling to {self.spool.directory}/ until the database is back: {e}")
+            return False
+        elapsed = time.perf_counter() - start
+        self.spool.ack(records[-1][0], position)
+        self.counts["last_flush_ms"] = elapsed * 1000
+        self.counts["written"] += len(batch)
+        self.counts["uploaded_records"] += len(records)
+        self.counts["flushes"] += 1
+
+        if self.failing_since is not None:
+            print(f"✅ Database back after {time.monotonic() - self.failing_since:.0f}s, "
+                  f"replaying {self.spool.pending() + len(records)} records")
+            self.failing_since = None
+            self.replay = [time.monotonic() - elapsed, 0]
+        if self.replay is not None:
+            self.replay[1] += len(records)
+            if not self.spool.pending():
+                self._end_replay()
+        return True
+
+    def _end_replay(self):
+        started, records = self.replay
+        seconds = time.monotonic() - started
+        self.replay = None
+        self.counts["replays"] += 1
+        self.last_replay = {"records": records, "seconds": round(seconds, 3),
+                            "per_s": round(records / seconds) if seconds > 0 else None}
+        print(f"📼 Replayed {records} records in {seconds:.1f}s ({self.last_replay['per_s']}/s)")
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name="spool-uploader", daemon=True)
+            self.thread.start()
+        return self
+
+    def stop(self, timeout=10.0):
+        # Upload what the database takes; the rest stays spooled for the next start
+        with self.condition:
+            self.stopping = True
+            self.condition.notify()
+        if self.thread is not None:
+            self.thread.join(timeout)
+            self.thread = None
+        else:
+            while self.pending() and self.flush():
+                pass
+        self.spool.close()
+        if self.pending():
+            print(f"📼 {self.pending()} records left in {self.spool.directory}/, uploaded on the next start")
+
+    def _run(self):
+        delay = self.backoff_base
+        next_attempt = 0.0
+        while True:
+            # Wakes at least every FSYNC_EVERY so a lone record does not wait for the next one to be synced
+            with self.condition:
+                if not self.stopping:
+                    self.condition.wait(self.spool.fsync_every)
+                stopping = self.stopping
+            self.spool.sync(force=False)
+
+            now = time.monotonic()
+            due = now >= next_attempt or (self.failing_since is None and self.pending() >= self.batch_records)
+            if not stopping and not due:
+                continue
+
+            ok = True
+            while ok and self.pending():
+                ok = self.flush()
+            if stopping:
+                return
+            if ok:
+                delay = self.backoff_base
+                next_attempt = now + self.flush_interval
+            else:
+                next_attempt = now + delay * random.uniform(0.5, 1.0)
+                delay = min(delay * 2, self.backoff_max)
+
+
+# --- CLI ---
+# python spool.py [status] | drain <name>     (name: a directory under spool/, e.g. room01)
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "status"
+    if command == "status":
+        names = sorted(os.listdir(SPOOL_DIR)) if os.path.isdir(SPOOL_DIR) else []
+        for name in names:
+            try:
+                spool = Spool(spool_dir(name))
+            except SpoolBusy as e:
+                print(f"🔒 {e}")
+                continue
+            print(f"📼 {spool.directory}/: {spool.pending()} records pending, {len(spool.segments)} segments, "
+                  f"{spool.disk_bytes() / 1024:.1f} KB, acked up to {spool.acked}")
+            spool.close()
+        if not names:
+            print(f"ℹ️ Nothing spooled in {SPOOL_DIR}/")
+    elif command == "drain" and len(sys.argv) > 2:
+        import storage
+
+        try:
+            spool = Spool(spool_dir(sys.argv[2]))
+        except SpoolBusy as e:
+            sys.exit(f"❌ {e}")
+        writer = SpoolWriter(storage.connect(), spool)
+        while writer.pending() and writer.flush():
+            pass
+        writer.stop()
+        print(f"📤 {writer.stats}")
+    else:
+        print("Usage: python spool.py [status] | drain <name>")
+        sys.exit(1)
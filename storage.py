@@ -0,0 +1,202 @@
+import json
+import os
+import sqlite3
+import threading
+
+import local_db
+from local_db import ListenerRegistration, Reference, _prune, apply_query, shallow, split_path
+
+# One place that decides which database the scripts talk to. Every backend exposes
+# reference(path) with the firebase_admin.db Reference API (get/set/update/delete/
+# push/listen, order_by_key/child/value queries):
+#
+#   SPACESCOUT_DB=firebase   Realtime Database (default), credentials from
+#                            SPACESCOUT_CREDENTIALS or serviceAccountKey.json
+#   SPACESCOUT_DB=memory     local_db, in-process only — tests and benchmarks
+#   SPACESCOUT_DB=sqlite     SqliteDatabase below, persisted in SPACESCOUT_DB_PATH
+#                            (spacescout.db) and shared between processes on one
+#                            machine, e.g. an edge gateway running ingest + dashboard
+#
+#   import storage
+#   db = storage.connect()
+#   db.reference("rooms").get()
+
+BACKEND_ENV = "SPACESCOUT_DB"
+DATABASE_URL = os.environ.get(
+    "SPACESCOUT_DB_URL", "https://campus-spacescout-default-rtdb.europe-west1.firebasedatabase.app/"
+)
+CREDENTIALS_PATH = os.environ.get("SPACESCOUT_CREDENTIALS", "serviceAccountKey.json")
+SQLITE_PATH = os.environ.get("SPACESCOUT_DB_PATH", "spacescout.db")
+POLL_INTERVAL = 0.25        # Seconds between checks for writes from other processes
+BACKENDS = ("firebase", "memory", "sqlite")
+
+_connections = {}
+_connect_lock = threading.Lock()
+
+
+def backend_name(backend=None):
+    name = (backend or os.environ.get(BACKEND_ENV) or "firebase").lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown {BACKEND_ENV} backend {name!r}, expected one of {', '.join(BACKENDS)}")
+    return name
+
+
+def connect(backend=None, credentials=None, url=None, path=None):
+    # credentials: service account path or dict (firebase only); path: SQLite file
+    name = backend_name(backend)
+    with _connect_lock:
+        if name == "firebase":
+            import firebase_admin
+            from firebase_admin import credentials as firebase_credentials, db
+
+            if not firebase_admin._apps:
+                cred = firebase_credentials.Certificate(credentials or CREDENTIALS_PATH)
+                firebase_admin.initialize_app(cred, {"databaseURL": url or DATABASE_URL})
+            return db
+        if name == "memory":
+            return local_db.default_database
+
+        path = path or SQLITE_PATH
+        key = (name, os.path.abspath(path))
+        if key not in _connections:
+            _connections[key] = SqliteDatabase(path)
+        return _connections[key]
+
+
+# --- SQLite backend ---
+# One row per leaf value: nodes(path, value) with path "a/b/c" and value as JSON.
+# A subtree is the range path >= "a/b/" and < "a/b0" ("0" sorts right after "/"),
+# so reads and writes touch only the rows under the referenced path.
+def _leaves(prefix, value, out):
+    if isinstance(value, dict):
+        for key, child in value.items():
+            _leaves(f"{prefix}/{key}" if prefix else key, child, out)
+    elif value is not None:
+        out.append((prefix, json.dumps(value)))
+    return out
+
+
+class SqliteDatabase:
+    def __init__(self, path=SQLITE_PATH, poll_interval=POLL_INTERVAL):
+        self.path = path
+        self.poll_interval = poll_interval
+        self.lock = threading.RLock()
+        self.ops = {"get": 0, "set": 0, "update": 0, "delete": 0}
+        self.listeners = []
+        self.writes = 0
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS nodes (path TEXT PRIMARY KEY, value TEXT NOT NULL) WITHOUT ROWID")
+
+    def reference(self, path="/"):
+        return Reference(self, split_path(path))
+
+    def close(self):
+        for listener in list(self.listeners):
+            listener.close()
+        with self.lock:
+            self.conn.close()
+
+    def _rows(self, prefix):
+        if not prefix:
+            return self.conn.execute("SELECT path, value FROM nodes")
+        return self.conn.execute(
+            "SELECT path, value FROM nodes WHERE path = ? OR (path >= ? AND path < ?)",
+            (prefix, prefix + "/", prefix + "0"),
+        )
+
+    def _get(self, parts):
+        prefix = "/".join(parts)
+        root = {}
+        for path, value in self._rows(prefix):
+            if path == prefix:
+                return json.loads(value)
+            rel = path[len(prefix) + 1:] if prefix else path
+            *branches, leaf = rel.split("/")
+            node = root
+            for branch in branches:
+                node = node.setdefault(branch, {})
+            node[leaf] = json.loads(value)
+        return root or None
+
+    def _delete_rows(self, parts):
+        prefix = "/".join(parts)
+        if not prefix:
+            self.conn.execute("DELETE FROM nodes")
+            return
+        self.conn.execute(
+            "DELETE FROM nodes WHERE path = ? OR (path >= ? AND path < ?)",
+            (prefix, prefix + "/", prefix + "0"),
+        )
+        # A leaf above the path is replaced by the branch being written
+        ancestors = ["/".join(parts[:i]) for i in range(1, len(parts))]
+        if ancestors:
+            self.conn.executemany("DELETE FROM nodes WHERE path = ?", [(a,) for a in ancestors])
+
+    def _set(self, parts, value):
+        value = _prune(value)
+        if not parts and not isinstance(value, dict):
+            value = None
+        self._delete_rows(parts)
+        rows = _leaves("/".join(parts), value, [])
+        if rows:
+            self.conn.executemany("INSERT INTO nodes (path, value) VALUES (?, ?)", rows)
+
+    def _write(self, op, writes):
+        with self.lock:
+            self.ops[op] += 1
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                for parts, value in writes:
+                    self._set(parts, value)
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.writes += 1
+            listeners = list(self.listeners)
+        paths = [parts for parts, _ in writes]
+        for listener in listeners:
+            if any(local_db.overlaps(listener.parts, path) for path in paths):
+                listener.notify()
+
+    # --- Interface used by local_db.Reference / Query ---
+    def get(self, parts, shallow_only=False):
+        with self.lock:
+            self.ops["get"] += 1
+            value = self._get(parts)
+        return shallow(value) if shallow_only else value
+
+    def query(self, parts, **params):
+        with self.lock:
+            self.ops["get"] += 1
+            node = self._get(parts)
+        return apply_query(node, **params)
+
+    def set(self, parts, value):
+        self._write("set", [(parts, value)])
+
+    def update(self, parts, values):
+        if not isinstance(values, dict) or not values:
+            raise ValueError("update() needs a non-empty dict")
+        self._write("update", [(parts + split_path(key), value) for key, value in values.items()])
+
+    def delete(self, parts):
+        self._write("delete", [(parts, None)])
+
+    def listen(self, parts, callback):
+        registration = ListenerRegistration(self, parts, callback, self.poll_interval)
+        with self.lock:
+            self.listeners.append(registration)
+        return registration
+
+    def remove_listener(self, registration):
+        with self.lock:
+            if registration in self.listeners:
+                self.listeners.remove(registration)
+
+    def change_token(self):
+        # Own commits bump self.writes; data_version changes when another process commits
+        with self.lock:
+            return (self.writes, self.conn.execute("PRAGMA data_version").fetchone()[0])
@@ -0,0 +1,52 @@
+import threading
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from app_cache import DataCache  # noqa: E402
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def stuck_load(cache, release, started):
+    def loader():
+        started.set()
+        release.wait(5)
+        return "new"
+
+    thread = threading.Thread(target=cache.get, args=("live_data", "live_data", loader))
+    thread.start()
+    started.wait(5)
+    return thread
+
+
+def test_waiter_gets_the_stale_value_when_the_load_hangs():
+    clock = Clock()
+    cache = DataCache({"live_data": 3.0}, clock=clock, wait_timeout=0.05)
+    cache.get("live_data", "live_data", lambda: "old")
+    clock.now = 10.0
+
+    release, started = threading.Event(), threading.Event()
+    leader = stuck_load(cache, release, started)
+    assert cache.get("live_data", "live_data", lambda: "unused") == "old"
+    assert cache.stats["stale"] == 1
+    release.set()
+    leader.join(5)
+    assert cache.get("live_data", "live_data", lambda: "unused") == "new"
+
+
+def test_waiter_without_a_stale_value_times_out():
+    cache = DataCache(wait_timeout=0.05)
+    release, started = threading.Event(), threading.Event()
+    leader = stuck_load(cache, release, started)
+    with pytest.raises(TimeoutError):
+        cache.get("live_data", "live_data", lambda: "unused")
+    release.set()
+    leader.join(5)
@@ -0,0 +1,26 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("streamlit")
+
+import app_rooms  # noqa: E402
+from occupancy_summary import OFFLINE_AFTER  # noqa: E402
+from spatial_index import RoomIndex  # noqa: E402
+
+NOW = datetime(2026, 3, 2, 12, 0, 0)
+
+
+def test_rooms_with_stale_live_data_are_offline():
+    rooms = {room_id: {"room_name": room_id, "location": {"lat": 53.565, "lng": 9.985}}
+             for room_id in ("fresh", "stale", "missing")}
+    live = {
+        "fresh": {"crowdiness_index": 0.4, "timestamp": (NOW - timedelta(seconds=60)).isoformat()},
+        "stale": {"crowdiness_index": 0.4, "timestamp": (NOW - timedelta(seconds=OFFLINE_AFTER + 1)).isoformat()},
+    }
+    entries = app_rooms.build_room_entries(rooms, live, {}, RoomIndex(rooms), [53.565, 9.985], now=NOW)
+    crowdiness = {entry["id"]: entry["crowdiness"] for entry in entries}
+    assert crowdiness == {"fresh": 0.4, "stale": -1, "missing": -1}
+    stale = next(entry for entry in entries if entry["id"] == "stale")
+    assert "⚫ Offline" in app_rooms.room_row_html(stale)
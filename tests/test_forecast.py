@@ -0,0 +1,91 @@
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pd = pytest.importorskip("pandas")
+
+import forecast  # noqa: E402
+from forecast import FEATURE_NAMES, Profiles, slot_of, split_by_time  # noqa: E402
+from local_db import LocalDatabase  # noqa: E402
+
+
+def history(start, periods, freq):
+    timestamps = pd.date_range(start, periods=periods, freq=freq)
+    return pd.DataFrame({"room": "r1", "timestamp": timestamps, "crowdiness_index": 0.5})
+
+
+def test_holdout_is_the_most_recent_week():
+    frame = history("2026-01-05", 60 * 24, "h")   # 60 days, hourly
+    train, test = split_by_time(frame)
+    assert train["timestamp"].max() < test["timestamp"].min()
+    assert test["timestamp"].min() == frame["timestamp"].max() - pd.Timedelta(days=7)
+
+
+def test_short_history_holds_out_its_newest_samples():
+    frame = history("2026-01-05 09:00", 300, "min")
+    train, test = split_by_time(frame)
+    assert train["timestamp"].max() < test["timestamp"].min()
+    assert len(test) == pytest.approx(0.2 * len(frame), abs=1)
+
+
+def test_profiles_only_know_the_training_period():
+    frame = history("2026-01-05 08:00", 10, "h")
+    train, test = split_by_time(frame)
+    profiles = Profiles.from_frame(train)
+    late = test["timestamp"].max().to_pydatetime()
+    assert pd.isna(profiles.rooms["r1"][slot_of(late)])
+
+
+class ProfileModel:
+    # Stand-in for the random forest: predicts the room's hour-of-week profile, which
+    # is exact for a history that repeats every day, at the horizons in `exact` and
+    # the opposite elsewhere
+    def __init__(self, exact):
+        self.exact = exact
+
+    def predict(self, X):
+        horizon = X[:, FEATURE_NAMES.index("horizon")]
+        profile = X[:, FEATURE_NAMES.index("profile")]
+        return np.where(np.isin(horizon, self.exact), profile, 1 - profile)
+
+    def set_params(self, **params):
+        return self
+
+
+def train_with(monkeypatch, tmp_path, exact):
+    pytest.importorskip("sklearn")
+    pytest.importorskip("joblib")
+    timestamps = pd.date_range("2026-01-05", periods=20 * 24 * 12, freq="5min")
+    busy = (timestamps.hour >= 9) & (timestamps.hour < 17)
+    csv_path = tmp_path / "history.csv"
+    pd.DataFrame({"timestamp": timestamps.strftime("%Y-%m-%dT%H:%M:%S"),
+                  "crowdiness_index": np.where(busy, 0.8, 0.1)}).to_csv(csv_path, index=False)
+    monkeypatch.setattr(forecast, "fit_model", lambda X, y, n_estimators: ProfileModel(exact))
+    model_path = str(tmp_path / "model.joblib")
+    return model_path, lambda: forecast.train(str(csv_path), model_path)
+
+
+def test_model_worse_than_no_change_is_not_published(monkeypatch, tmp_path):
+    model_path, run = train_with(monkeypatch, tmp_path, exact=[])
+    with pytest.raises(ValueError):
+        run()
+    assert not os.path.exists(model_path)
+
+
+def test_horizons_losing_to_no_change_fall_back_to_the_current_value(monkeypatch, tmp_path):
+    model_path, run = train_with(monkeypatch, tmp_path, exact=[15, 30])
+    artifact = run()
+    assert (artifact["horizons"], artifact["baseline_horizons"]) == ([15, 30], [45, 60])
+    assert os.path.exists(model_path)
+
+    class Recent:
+        def window(self, room_id, minutes, now=None):
+            return "s1", [{"timestamp": (now - timedelta(minutes=2)).isoformat(), "crowdiness_index": 0.4}]
+
+    db = LocalDatabase()
+    forecast.ForecastJob(db, Recent(), model_path).run(["r1"], now=datetime(2026, 2, 2, 8, 50))
+    values = db.reference("forecasts/r1/crowdiness_index").get()
+    assert (values["15m"], values["30m"]) == (0.8, 0.8)
+    assert (values["45m"], values["60m"]) == (0.4, 0.4)
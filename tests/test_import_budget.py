@@ -0,0 +1,18 @@
+import argparse
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("streamlit")
+
+import benchmark  # noqa: E402
+
+
+def test_dashboard_cold_start_stays_in_budget():
+    # Fresh interpreters: the leading imports of app.py and app_*.py, then the page's whole first run
+    args = argparse.Namespace(repeat=3, import_budget=benchmark.IMPORT_BUDGET_MS,
+                              first_run_budget=benchmark.FIRST_RUN_BUDGET_MS)
+    result = benchmark.bench_imports(args)
+    assert result["failures"] == []
+    assert result["eager_lazy_modules"] == []
+    assert result["first_run_lazy_modules"] == []
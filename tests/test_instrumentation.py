@@ -0,0 +1,12 @@
+import instrumentation
+
+
+def test_one_profiler_at_a_time():
+    first = instrumentation.profile_start()
+    assert first is not None
+    assert instrumentation.profile_start() is None
+    assert "function calls" in instrumentation.profile_stop(first)
+
+    again = instrumentation.profile_start()
+    assert again is not None
+    instrumentation.profile_stop(again)
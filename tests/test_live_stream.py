@@ -0,0 +1,57 @@
+import time
+
+from live_stream import LiveFeed
+from local_db import LocalDatabase
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_dead_listener_is_unhealthy_and_restarted():
+    db = LocalDatabase({"live_data": {"r1": {"crowdiness_index": 0.1}}})
+    feed = LiveFeed(db, watch_every=0.05).start()
+    try:
+        assert wait_until(lambda: feed.ready) and feed.healthy
+
+        # The stream thread exits without telling the feed
+        feed.registration.closed = True
+        feed.registration.wakeup.set()
+        feed.registration.thread.join(5)
+        assert wait_until(lambda: feed.restarts == 1)
+        assert wait_until(lambda: feed.healthy)
+
+        db.reference("live_data/r1/crowdiness_index").set(0.5)
+        assert wait_until(lambda: feed.snapshot()["r1"]["crowdiness_index"] == 0.5)
+    finally:
+        feed.close()
+
+
+def test_feed_without_events_goes_stale():
+    db = LocalDatabase({"live_data": {"r1": {"crowdiness_index": 0.1}}})
+    feed = LiveFeed(db, stale_after=0.2, watch_every=60).start()
+    try:
+        assert wait_until(lambda: feed.ready) and feed.healthy
+        assert wait_until(lambda: not feed.healthy)
+        feed.restart()
+        assert wait_until(lambda: feed.healthy)
+    finally:
+        feed.close()
+
+
+def test_restarts_back_off_while_nothing_changes():
+    class Unreachable(LocalDatabase):
+        def listen(self, parts, callback):
+            raise ConnectionError("database unreachable")
+
+    feed = LiveFeed(Unreachable(), stale_after=0.16, watch_every=0.01).start()
+    try:
+        time.sleep(1.0)
+        # 0.01, 0.02, 0.04, 0.08, then every 0.16 s instead of every 0.01 s check
+        assert 3 <= feed.restarts <= 12
+        assert feed.restart_delay == 0.16
+    finally:
+        feed.close()
@@ -0,0 +1,16 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from load_simulator import LoadGenerator  # noqa: E402
+from serial_protocol import FrameParser  # noqa: E402
+
+
+def test_dropout_leaves_a_sequence_gap():
+    generator = LoadGenerator(["r1"], lambda moment: np.array([0.5]), np.random.default_rng(0), framed=True)
+    parser = FrameParser()
+    parser.feed(generator.sample(None, 0.0, 1.0, 5, 1.0)[0].decode())
+    generator.dropout_until[0] = 10.0
+    assert generator.sample(None, 5.0, 1.0, 4, 1.0) == [b""]
+    parser.feed(generator.sample(None, 10.0, 1.0, 5, 1.0)[0].decode())
+    assert parser.dropped == generator.stats["dropped_samples"] == 4
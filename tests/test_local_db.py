@@ -0,0 +1,28 @@
+import pytest
+
+from local_db import LocalDatabase
+
+
+def test_etag_reads_follow_the_content():
+    db = LocalDatabase({"rooms": {"r1": {"capacity": 10}}})
+    value, etag = db.reference("rooms/r1").get(etag=True)
+    assert value == {"capacity": 10}
+    assert db.reference("rooms/r1").get(etag=True)[1] == etag
+
+    db.reference("rooms/r1/capacity").set(12)
+    assert db.reference("rooms/r1").get(etag=True)[1] != etag
+    assert db.reference("rooms/missing").get(etag=True)[0] is None
+    with pytest.raises(ValueError):
+        db.reference("rooms").get(etag=True, shallow=True)
+
+
+def test_update_rejects_overlapping_paths():
+    db = LocalDatabase({"a": {"b": {"c": 1}}})
+    for values in ({"b": {"x": 1}, "b/c": 2}, {"b/c": 2, "b": 3}, {"b/c/d": 1, "b/c": {"e": 2}}):
+        with pytest.raises(ValueError):
+            db.reference("a").update(values)
+    assert db.reference("/").get() == {"a": {"b": {"c": 1}}}
+
+    # Siblings and look-alike prefixes are fine
+    db.reference("a").update({"b/c": 2, "b/cd": 3, "bc": 4})
+    assert db.reference("a").get() == {"b": {"c": 2, "cd": 3}, "bc": 4}
@@ -0,0 +1,26 @@
+import pytest
+
+pytest.importorskip("folium")
+
+import map_layer  # noqa: E402
+from folium.plugins import FastMarkerCluster  # noqa: E402
+
+
+def rooms(n):
+    return [{"id": f"r{i}", "name": f"Room <{i}>", "lat": 53.56 + i * 1e-4, "lng": 9.98,
+             "crowdiness": -1 if i == 0 else 0.5, "distance": 0.1} for i in range(n)]
+
+
+def room_rows(layer, kind):
+    return next(child for child in layer._children.values() if isinstance(child, kind)).data
+
+
+def test_rooms_are_one_data_array():
+    rows = room_rows(map_layer.room_layer(rooms(3), [53.56, 9.98]), map_layer.RoomMarkers)
+    assert [row[2] for row in rows] == ["gray", "orange", "orange"]
+    assert "Room &lt;1&gt;" in rows[1][3] and "Offline" in rows[0][3]
+
+
+def test_many_rooms_are_clustered():
+    layer = map_layer.room_layer(rooms(map_layer.CLUSTER_THRESHOLD + 1), [53.56, 9.98])
+    assert len(room_rows(layer, FastMarkerCluster)) == map_layer.CLUSTER_THRESHOLD + 1
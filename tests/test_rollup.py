@@ -0,0 +1,65 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from history import timestamp_key
+from local_db import LocalDatabase
+from rollup import RollupJob, dirty_marks, pick_resolution
+
+T0 = datetime(2026, 3, 2, 10, 0, 0)
+# The dashboard's history windows in minutes (app_history.HISTORY_WINDOWS)
+WINDOWS = {"Last 10 min": 10, "Last 30 min": 30, "Last 24 h": 24 * 60, "Last 7 days": 7 * 24 * 60}
+
+
+def test_windows_up_to_30_minutes_chart_raw_points():
+    assert pick_resolution(WINDOWS["Last 10 min"] * 60) is None
+    assert pick_resolution(WINDOWS["Last 30 min"] * 60) is None
+
+
+def test_long_windows_use_rollups():
+    assert pick_resolution(WINDOWS["Last 24 h"] * 60) == "15m"
+    assert pick_resolution(WINDOWS["Last 7 days"] * 60) == "1h"
+
+
+def test_windows_match_the_dashboard():
+    pytest.importorskip("streamlit")
+    from app_history import HISTORY_WINDOWS
+
+    assert {label: HISTORY_WINDOWS[label] for label in WINDOWS} == WINDOWS
+
+
+def raw_updates(start, minutes, value):
+    # One raw point every 10 s for `minutes` minutes from `start`
+    updates = {}
+    for i in range(minutes * 6):
+        at = start + timedelta(seconds=10 * i)
+        updates[f"sessions/r1/s1/data/{timestamp_key(at)}"] = {"timestamp": at.isoformat(), "crowdiness_index": value}
+    return updates
+
+
+def test_fresh_points_are_not_marked_late():
+    assert dirty_marks(raw_updates(T0, 1, 0.1), now=T0 + timedelta(seconds=65)) == {}
+    marks = dirty_marks(raw_updates(T0, 1, 0.1), now=T0 + timedelta(seconds=95))
+    assert marks == {f"rollups/r1/_dirty/{timestamp_key(T0)}": True}
+
+
+def test_late_points_rebuild_their_closed_buckets():
+    db = LocalDatabase()
+    db.reference("/").update(raw_updates(T0, 2, 0.1))
+    db.reference("/").update(raw_updates(T0 + timedelta(minutes=3), 13, 0.1))
+    job = RollupJob(db)
+    job.run_room("r1", now=T0 + timedelta(minutes=16))
+    before = db.reference(f"rollups/r1/15m/{timestamp_key(T0)}").get()["crowdiness_index"]
+
+    # Minute 10:02 is replayed from a spool after both its 1m and 15m buckets closed
+    arrived = T0 + timedelta(minutes=17)
+    late = raw_updates(T0 + timedelta(minutes=2), 1, 0.9)
+    db.reference("/").update({**late, **dirty_marks(late, now=arrived)})
+    job.run_room("r1", now=arrived)
+
+    minute = db.reference(f"rollups/r1/1m/{timestamp_key(T0 + timedelta(minutes=2))}").get()
+    assert minute["crowdiness_index"] == 0.9 and minute["count"] == 6
+    quarter = db.reference(f"rollups/r1/15m/{timestamp_key(T0)}").get()
+    assert quarter["count"] == 15 * 6 and quarter["crowdiness_index"] > before
+    assert db.reference("rollups/r1/_dirty").get() is None
+    assert job.stats["late_minutes"] == 1
@@ -0,0 +1,29 @@
+from serial_protocol import MAX_SEQ_GAP, SEQ_MODULO, FrameParser, encode_frame
+
+
+def feed_seqs(seqs, bulk=True):
+    parser = FrameParser()
+    lines = [encode_frame(1, 40.0, 500.0, seq=seq) + "\n" for seq in seqs]
+    if bulk:
+        parser.feed("".join(lines))
+    else:
+        for line in lines:
+            parser.feed(line + "M:1;S:40.0;C:500.0*00\n")  # A bad checksum forces the line path
+    return parser
+
+
+def test_gaps_count_missing_samples_across_the_wrap():
+    for bulk in (True, False):
+        parser = feed_seqs([SEQ_MODULO - 2, SEQ_MODULO - 1, 2, 3], bulk)
+        assert (parser.dropped, parser.resyncs) == (2, 0)
+
+
+def test_reboot_backwards_and_repeat_are_resyncs():
+    for bulk in (True, False):
+        parser = feed_seqs([5000, 5001, 0, 1, 1, 0, 2], bulk)
+        assert (parser.dropped, parser.resyncs) == (1, 3)
+
+
+def test_gap_above_the_limit_is_a_resync():
+    parser = feed_seqs([10, 11 + MAX_SEQ_GAP, 12 + MAX_SEQ_GAP + MAX_SEQ_GAP + 1])
+    assert (parser.dropped, parser.resyncs) == (MAX_SEQ_GAP, 1)
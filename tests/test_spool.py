@@ -0,0 +1,154 @@
+import os
+import subprocess
+import sys
+
+import threading
+
+import pytest
+
+from conftest import ROOT
+from local_db import LocalDatabase
+from spool import Spool, SpoolBusy, SpoolWriter
+
+# A second process appending to the spool of the one below, then exiting
+HOLDER = """
+import sys
+from spool import Spool
+spool = Spool(sys.argv[1])
+spool.append({"a/1": 1})
+print("ready", flush=True)
+sys.stdin.readline()
+spool.append({"a/2": 2})
+spool.close()
+"""
+
+
+def start_holder(directory):
+    process = subprocess.Popen([sys.executable, "-c", HOLDER, directory], cwd=ROOT, text=True,
+                               stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+    assert process.stdout.readline().strip() == "ready"
+    return process
+
+
+def test_second_process_cannot_open_a_spool_in_use(tmp_path):
+    directory = str(tmp_path / "room01")
+    holder = start_holder(directory)
+    try:
+        with pytest.raises(SpoolBusy, match=str(holder.pid)):
+            Spool(directory)
+    finally:
+        holder.communicate("\n", timeout=30)
+    assert holder.returncode == 0
+
+    # Nothing the holder wrote was lost or renumbered
+    spool = Spool(directory)
+    records, _ = spool.read(10)
+    spool.close()
+    assert records == [(1, {"a/1": 1}), (2, {"a/2": 2})]
+
+
+def test_lock_is_released_when_the_holder_dies(tmp_path):
+    directory = str(tmp_path / "room01")
+    holder = start_holder(directory)
+    holder.kill()
+    holder.wait(timeout=30)
+
+    spool = Spool(directory)
+    assert spool.pending() == 1
+    assert spool.append({"b/1": 1}) == 2
+    spool.close()
+
+
+def test_same_process_cannot_open_it_twice(tmp_path):
+    spool = Spool(str(tmp_path))
+    with pytest.raises(SpoolBusy):
+        Spool(str(tmp_path))
+    spool.close()
+    Spool(str(tmp_path)).close()
+
+
+class FlakyDatabase(LocalDatabase):
+    # Refuses every update while down; records the ones it took
+    down = True
+
+    def __init__(self):
+        super().__init__()
+        self.uploads = []
+
+    def update(self, parts, values):
+        if self.down:
+            raise ConnectionError("database unreachable")
+        super().update(parts, values)
+        self.uploads.append(list(values))
+
+
+def test_records_survive_an_outage_and_replay_in_order(tmp_path):
+    database = FlakyDatabase()
+    writer = SpoolWriter(database, Spool(str(tmp_path)), batch_records=3)
+    for i in range(7):
+        writer.write_paths({f"log/{i}": i, "live_data/r1": i})
+    assert not writer.flush()
+    assert (writer.spool.acked, writer.pending()) == (0, 7)
+
+    database.down = False
+    acked = []
+    while writer.pending():
+        assert writer.flush()
+        acked.append(writer.spool.acked)
+    assert acked == [3, 6, 7]
+    assert [path for upload in database.uploads for path in upload if path.startswith("log/")] == \
+        [f"log/{i}" for i in range(7)]
+    assert database.reference("live_data/r1").get() == 6
+    assert writer.stats["failed_attempts"] == 1
+    writer.stop()
+
+    # ACKED is on disk: a restart has nothing left to upload
+    spool = Spool(str(tmp_path))
+    assert (spool.acked, spool.pending()) == (7, 0)
+    spool.close()
+
+
+def test_torn_last_line_is_cut_off_on_reopen(tmp_path):
+    spool = Spool(str(tmp_path))
+    for i in range(3):
+        spool.append({f"log/{i}": i})
+    spool.close()
+    segment = next(path for path in tmp_path.iterdir() if path.suffix == ".log")
+    segment.write_bytes(segment.read_bytes()[:-5])   # Crash halfway through the last record
+
+    spool = Spool(str(tmp_path))
+    assert (spool.stats["torn"], spool.pending()) == (1, 2)
+    assert spool.append({"log/3": 3}) == 3
+    records, _ = spool.read(10)
+    spool.close()
+    assert records == [(1, {"log/0": 0}), (2, {"log/1": 1}), (3, {"log/3": 3})]
+
+
+def test_disk_budget_drops_the_oldest_records(tmp_path):
+    spool = Spool(str(tmp_path), segment_bytes=200, max_bytes=600)
+    for i in range(100):
+        spool.append({f"log/{i:03d}": "x" * 40})
+    dropped = spool.stats["dropped"]
+    assert dropped > 0
+    assert spool.disk_bytes() <= 600 + 200
+    assert spool.pending() == 100 - dropped
+    records, _ = spool.read(200)
+    assert [seq for seq, _ in records] == list(range(dropped + 1, 101))
+    spool.close()
+
+
+def test_append_leaves_the_fsync_to_the_uploader(tmp_path, monkeypatch):
+    synced_on = []
+    real_fsync = os.fsync
+    monkeypatch.setattr(os, "fsync", lambda fd: (synced_on.append(threading.current_thread().name), real_fsync(fd)))
+    spool = Spool(str(tmp_path), segment_bytes=200, fsync_batch=2)
+    for i in range(20):
+        spool.append({f"log/{i}": "x" * 40})   # Past the batch size and several segment rollovers
+    assert synced_on == []
+
+    sync = threading.Thread(target=spool.sync, kwargs={"force": False}, name="spool-uploader")
+    sync.start()
+    sync.join()
+    assert synced_on and set(synced_on) == {"spool-uploader"}
+    assert not spool.retired
+    spool.close()
@@ -1,55 +1,251 @@
+import argparse
+import json
+import os
+import resource
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
 import pandas as pd
+import pyarrow.compute as pc
 import matplotlib.pyplot as plt
+from sklearn.base import clone
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.model_selection import train_test_split, cross_val_score
 from sklearn.metrics import mean_squared_error, r2_score
-import joblib
-
-# === Load Data ===
-df = pd.read_csv("crowdiness_dataset.csv")
-X = df[["motion_rate", "avg_sound", "avg_co2"]]
-y = df["crowdiness_index"]
-
-# === Train-Test Split ===
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-
-# === Train Model ===
-model = RandomForestRegressor(n_estimators=100, random_state=42)
-model.fit(X_train, y_train)
-
-# === Evaluation ===
-y_pred = model.predict(X_test)
-mse = mean_squared_error(y_test, y_pred)
-r2 = r2_score(y_test, y_pred)
-print(f"\n✅ Model Trained")
-print(f"MSE: {mse:.4f}")
-print(f"R² Score: {r2:.4f}")
-
-# === Cross-Validation ===
-cv_scores = cross_val_score(model, X, y, cv=5, scoring="r2")
-print(f"CV R²: {cv_scores.mean():.4f} ± {cv_scores.std():.4f}")
-
-# === Save Model ===
-joblib.dump(model, "owl_model.pkl")
-print("📦 Model saved as owl_model.pkl")
-
-# === Feature Importances ===
-importances = model.feature_importances_
-plt.figure(figsize=(5, 4))
-plt.bar(X.columns, importances, color="teal")
-plt.title("Feature Importances")
-plt.tight_layout()
-plt.savefig("feature_importance.png")
-print("📊 Saved feature_importance.png")
-
-# === Actual vs Predicted ===
-plt.figure(figsize=(5, 5))
-plt.scatter(y_test, y_pred, alpha=0.6)
-plt.plot([0, 1], [0, 1], 'r--')
-plt.xlabel("Actual")
-plt.ylabel("Predicted")
-plt.title("Actual vs Predicted Crowdiness")
-plt.grid()
-plt.tight_layout()
-plt.savefig("prediction_vs_actual.png")
-print("📈 Saved prediction_vs_actual.png")
+
+import dataset_store
+from inference import FEATURES
+from model_registry import REGISTRY_ROOT, ModelRegistry
+
+# Training pipeline for the crowdiness model.
+# - Data comes from the columnar store in dataset/ (see dataset_store.py), reading
+#   only the feature columns and, with --rooms or --incremental, only matching
+#   partitions/row groups. A legacy CSV (--data file.csv) is read in chunks of
+#   CHUNK_ROWS. Either way rows go straight into float32 arrays (sklearn's trees
+#   work on float32, which also saves the conversion copy in fit()).
+# - Fitting and cross-validation use all cores.
+# - --incremental N adds N trees to the current model, fitted only on rows newer than
+#   the ones it has seen (warm_start), instead of retraining from scratch.
+# - The result is published as a new version in the model registry (models/, see
+#   model_registry.py) and made current; running ingest processes switch to it.
+# - Every stage records wall time and peak memory; the report is printed and saved
+#   in the version directory as profile.json.
+
+DATA_PATH = dataset_store.DATASET_ROOT
+LEGACY_CSV = "crowdiness_dataset.csv"
+TARGET = "crowdiness_index"
+CHUNK_ROWS = 100_000
+N_ESTIMATORS = 100
+CV_FOLDS = 5
+RANDOM_STATE = 42
+
+
+# --- Stage profiling ---
+class StageProfiler:
+    def __init__(self):
+        self.stages = []
+        tracemalloc.start()
+
+    @contextmanager
+    def stage(self, name):
+        # Peak traced allocations (Python + NumPy) within the stage, and the process
+        # high-water mark, which also covers native allocations in sklearn's trees
+        tracemalloc.reset_peak()
+        start_traced = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            self.stages.append({
+                "stage": name,
+                "wall_s": round(wall, 3),
+                "peak_traced_mb": round(max(peak - start_traced, 0) / 1e6, 1),
+                "max_rss_mb": round(max_rss_mb(), 1),
+            })
+
+    def report(self):
+        print(f"\n{'stage':<16}{'wall s':>10}{'peak MB':>10}{'max RSS MB':>12}")
+        for s in self.stages:
+            print(f"{s['stage']:<16}{s['wall_s']:>10.3f}{s['peak_traced_mb']:>10.1f}{s['max_rss_mb']:>12.1f}")
+
+
+def max_rss_mb():
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1e6 if os.uname().sysname == "Darwin" else rss / 1e3
+
+
+# --- Data ---
+def load_dataset(path, since=None, chunk_rows=CHUNK_ROWS, rooms=None):
+    # -> (X float32 [n, 3], y float32 [n], last timestamp), rows with timestamp > since
+    if path.endswith(".csv"):
+        return load_csv(path, since, chunk_rows)
+
+    table = dataset_store.read_table(path, columns=["timestamp"] + FEATURES + [TARGET], rooms=rooms, start=since)
+    mask = None
+    for name in FEATURES + [TARGET]:
+        valid = table[name].is_valid()
+        mask = valid if mask is None else pc.and_(mask, valid)
+    if mask is not None and table.num_rows:
+        table = table.filter(mask)
+    if not table.num_rows:
+        return np.empty((0, len(FEATURES)), dtype=np.float32), np.empty(0, dtype=np.float32), since
+
+    X = np.column_stack([table[name].to_numpy() for name in FEATURES]).astype(np.float32, copy=False)
+    y = table[TARGET].to_numpy().astype(np.float32, copy=False)
+    last_timestamp = pc.max(table["timestamp"]).as_py().isoformat()
+    return X, y, last_timestamp
+
+
+def load_csv(path, since=None, chunk_rows=CHUNK_ROWS):
+    X_parts, y_parts = [], []
+    last_timestamp = since
+    columns = ["timestamp"] + FEATURES + [TARGET]
+    dtypes = {name: np.float32 for name in FEATURES + [TARGET]}
+    for chunk in pd.read_csv(path, usecols=columns, dtype=dtypes, chunksize=chunk_rows):
+        if since is not None:
+            # ISO timestamps compare correctly as strings
+            chunk = chunk[chunk["timestamp"] > since]
+        chunk = chunk.dropna(subset=FEATURES + [TARGET])
+        if chunk.empty:
+            continue
+        X_parts.append(chunk[FEATURES].to_numpy(dtype=np.float32))
+        y_parts.append(chunk[TARGET].to_numpy(dtype=np.float32))
+        chunk_last = chunk["timestamp"].max()
+        if last_timestamp is None or chunk_last > last_timestamp:
+            last_timestamp = chunk_last
+
+    if not X_parts:
+        return np.empty((0, len(FEATURES)), dtype=np.float32), np.empty(0, dtype=np.float32), last_timestamp
+    return np.concatenate(X_parts), np.concatenate(y_parts), last_timestamp
+
+
+# --- Plots ---
+def save_plots(model, y_test, y_pred):
+    importances = model.feature_importances_
+    plt.figure(figsize=(5, 4))
+    plt.bar(FEATURES, importances, color="teal")
+    plt.title("Feature Importances")
+    plt.tight_layout()
+    plt.savefig("feature_importance.png")
+    plt.close()
+    print("📊 Saved feature_importance.png")
+
+    plt.figure(figsize=(5, 5))
+    plt.scatter(y_test, y_pred, alpha=0.6)
+    plt.plot([0, 1], [0, 1], 'r--')
+    plt.xlabel("Actual")
+    plt.ylabel("Predicted")
+    plt.title("Actual vs Predicted Crowdiness")
+    plt.grid()
+    plt.tight_layout()
+    plt.savefig("prediction_vs_actual.png")
+    plt.close()
+    print("📈 Saved prediction_vs_actual.png")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the crowdiness model")
+    parser.add_argument("--data", default=DATA_PATH, help="dataset store directory or a legacy .csv file")
+    parser.add_argument("--rooms", nargs="*", help="only train on these rooms (dataset store only)")
+    parser.add_argument("--registry", default=REGISTRY_ROOT, help="model registry directory")
+    parser.add_argument("--no-activate", action="store_true", help="publish without making it the current version")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--trees", type=int, default=N_ESTIMATORS)
+    parser.add_argument("--incremental", type=int, metavar="N", default=0,
+                        help="add N trees to the current model, fitted on rows it has not seen")
+    parser.add_argument("--cv", type=int, default=CV_FOLDS, help="cross-validation folds, 0 to skip")
+    parser.add_argument("--jobs", type=int, default=-1)
+    parser.add_argument("--no-plots", action="store_true")
+    args = parser.parse_args()
+
+    if args.data == DATA_PATH and not os.path.isdir(DATA_PATH) and os.path.exists(LEGACY_CSV):
+        print(f"ℹ️ No {DATA_PATH}/ store yet, reading {LEGACY_CSV} "
+              f"(migrate with: python dataset_store.py import {LEGACY_CSV} <room_id>)")
+        args.data = LEGACY_CSV
+
+    profiler = StageProfiler()
+    registry = ModelRegistry(args.registry)
+    base_version = registry.current_version() if args.incremental else None
+    if args.incremental and base_version is None:
+        parser.error(f"--incremental needs a published model in {args.registry}/")
+    meta = registry.meta(base_version) if args.incremental else {}
+    since = meta.get("trained_until")
+
+    # === Load Data ===
+    with profiler.stage("load"):
+        X, y, last_timestamp = load_dataset(args.data, since=since, chunk_rows=args.chunk_rows, rooms=args.rooms)
+    print(f"📥 Loaded {len(y)} rows" + (f" newer than {since}" if since else ""))
+    if len(y) < 2:
+        print("ℹ️ No new data to train on.")
+        profiler.report()
+        return
+
+    # === Train-Test Split ===
+    with profiler.stage("split"):
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=RANDOM_STATE)
+
+    # === Train Model ===
+    with profiler.stage("fit"):
+        if args.incremental:
+            model = registry.load_model(base_version, mmap_mode=None)
+            model.set_params(warm_start=True, n_estimators=model.n_estimators + args.incremental, n_jobs=args.jobs)
+            model.fit(X_train, y_train)
+            model.set_params(warm_start=False)
+        else:
+            model = RandomForestRegressor(n_estimators=args.trees, random_state=RANDOM_STATE, n_jobs=args.jobs)
+            model.fit(X_train, y_train)
+
+    # === Evaluation ===
+    with profiler.stage("evaluate"):
+        y_pred = model.predict(X_test)
+        mse = mean_squared_error(y_test, y_pred)
+        r2 = r2_score(y_test, y_pred)
+    print(f"\n✅ Model Trained ({model.n_estimators} trees)")
+    print(f"MSE: {mse:.4f}")
+    print(f"R² Score: {r2:.4f}")
+
+    # === Cross-Validation ===
+    # Folds run in parallel, so each fold's forest is single-threaded to avoid
+    # oversubscribing the cores. Skipped for --incremental: a warm-started forest
+    # has no from-scratch equivalent to validate.
+    cv_scores = None
+    if args.cv > 1 and not args.incremental:
+        with profiler.stage("cross_validate"):
+            cv_model = clone(model).set_params(n_jobs=1)
+            cv_scores = cross_val_score(cv_model, X, y, cv=args.cv, scoring="r2", n_jobs=args.jobs)
+        print(f"CV R²: {cv_scores.mean():.4f} ± {cv_scores.std():.4f}")
+
+    # === Publish Model ===
+    meta = {
+        "trained_until": last_timestamp,
+        "rows": meta.get("rows", 0) + len(y),
+        "n_estimators": model.n_estimators,
+        "trained_at": datetime.now().isoformat(),
+        "base_version": base_version,
+        "test_mse": round(float(mse), 6),
+        "test_r2": round(float(r2), 6),
+        "cv_r2": None if cv_scores is None else round(float(cv_scores.mean()), 6),
+    }
+    with profiler.stage("save"):
+        model.set_params(n_jobs=None)
+        # The flattened copy for the batched inference engine is exported with it
+        version = registry.publish(model, meta, activate=not args.no_activate)
+    print(f"📦 Model published as {registry.path(version)}" + ("" if args.no_activate else " (current)"))
+
+    if not args.no_plots:
+        with profiler.stage("plots"):
+            save_plots(model, y_test, y_pred)
+
+    profiler.report()
+    with open(registry.path(version, "profile.json"), "w") as f:
+        json.dump(profiler.stages, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()